@@ -0,0 +1,256 @@
+"""
+エンドポイントのベンチマーク。
+
+app.main.app をプロセス内で動かし、httpxの非同期クライアントから
+シーディングしたSQLiteデータベースに対してリクエストを送る。
+エンドポイントごとに p50/p95/p99 のレイテンシ、スループット、1リクエストあたりのSQL文の数を計測する。
+
+    # 計測してベースラインとして保存する (データベースは初回だけ作る)
+    python -m bench run --out bench/baselines/main.json
+    # ベースラインと比べ、閾値を超えて悪化していれば終了コード1
+    python -m bench run --out /tmp/new.json
+    python -m bench compare bench/baselines/main.json /tmp/new.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+SRC_DIR = ROOT_DIR / "src"
+
+
+def prepare_database(args) -> None:
+    """
+    データベースがなければマイグレーションして生成器でデータを入れる。
+    """
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(SRC_DIR), str(ROOT_DIR)]),
+        "DATABASE_URL": f"sqlite:///{Path(args.db).resolve()}",
+    }
+    if Path(args.db).exists():
+        return
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=ROOT_DIR,
+        env=env,
+        check=True,
+    )
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "seed.generator",
+            "--todos",
+            str(args.todos),
+            "--tags",
+            str(args.tags),
+            "--seed",
+            str(args.seed),
+            "--base-date",
+            "2026-01-01",
+        ],
+        cwd=ROOT_DIR,
+        env=env,
+        check=True,
+    )
+
+
+def configure_environment(args) -> None:
+    # app.settings は読み込み時に環境変数を読むので、appをimportする前に設定する
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(args.db).resolve()}"
+    os.environ.setdefault("PROJECT_NAME", "bench")
+    os.environ.setdefault("API_VER_STR", "/v1")
+    os.environ.setdefault("LOGGING_CONF", str(BENCH_DIR / "logging.json"))
+    if not args.with_cache:
+        # 読み取りキャッシュのヒットではなくクエリの経路を測る
+        os.environ["READ_CACHE_MAX_ENTRIES"] = "0"
+    sys.path.insert(0, str(SRC_DIR))
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_scenarios(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import async_engine, read_async_engine
+    from app.main import app
+    from bench.scenarios import SCENARIOS, Context
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    engines = {async_engine.sync_engine, read_async_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+
+    with sqlite3.connect(args.db) as conn:
+        todo_ids = [row[0] for row in conn.execute("SELECT id FROM todo")]
+        tag_ids = [row[0] for row in conn.execute("SELECT id FROM tags")]
+    ctx = Context(
+        todo_ids=todo_ids,
+        tag_ids=tag_ids,
+        run_id=datetime.now().strftime("%H%M%S%f"),
+        rng=random.Random(args.seed),
+    )
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            for scenario in SCENARIOS:
+                if args.only and scenario.name not in args.only:
+                    continue
+                if scenario.read_only:
+                    for i in range(args.warmup):
+                        await scenario.send(client, ctx, i)
+
+                latencies = []
+                errors = 0
+                statements = 0
+                started = time.perf_counter()
+                for i in range(args.requests):
+                    begin = time.perf_counter()
+                    response = await scenario.send(client, ctx, i)
+                    latencies.append((time.perf_counter() - begin) * 1000)
+                    if response.status_code != scenario.expected_status:
+                        errors += 1
+                elapsed = time.perf_counter() - started
+
+                latencies.sort()
+                results[scenario.name] = {
+                    "requests": args.requests,
+                    "errors": errors,
+                    "p50_ms": round(percentile(latencies, 0.50), 3),
+                    "p95_ms": round(percentile(latencies, 0.95), 3),
+                    "p99_ms": round(percentile(latencies, 0.99), 3),
+                    "mean_ms": round(statistics.fmean(latencies), 3),
+                    "throughput_rps": round(args.requests / elapsed, 1),
+                    "statements_per_request": round(statements / args.requests, 2),
+                }
+                print_result(scenario.name, results[scenario.name])
+
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", count)
+    return results
+
+
+def print_result(name: str, result: dict) -> None:
+    print(
+        f"{name:<20} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>8.1f} req/s  "
+        f"{result['statements_per_request']:>5.1f} SQL/req  errors {result['errors']}"
+    )
+
+
+def run(args) -> int:
+    prepare_database(args)
+    configure_environment(args)
+    results = asyncio.run(run_scenarios(args))
+    with sqlite3.connect(args.db) as conn:
+        todos = conn.execute("SELECT count(*) FROM todo").fetchone()[0]
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "todos": todos,
+            "requests": args.requests,
+            "with_cache": args.with_cache,
+            "db_profile": os.environ.get("DB_PROFILE") or "default",
+            "fast_json": os.environ.get("FAST_JSON") or "false",
+            "group_commit": os.environ.get("GROUP_COMMIT") or "false",
+        },
+        "results": results,
+    }
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"saved {args.out}")
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+def compare(args) -> int:
+    """
+    p95レイテンシとスループットが threshold (割合) を超えて悪化したもの、
+    SQL文の数が増えたものを回帰として表示する。
+    """
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))["results"]
+
+    regressions = 0
+    for name in [name for name in baseline if name in current]:
+        base, new = baseline[name], current[name]
+        problems = []
+        if new["p95_ms"] > base["p95_ms"] * (1 + args.threshold):
+            problems.append(f"p95 {base['p95_ms']:.2f}ms -> {new['p95_ms']:.2f}ms")
+        if new["throughput_rps"] < base["throughput_rps"] * (1 - args.threshold):
+            problems.append(
+                f"throughput {base['throughput_rps']:.1f}"
+                f" -> {new['throughput_rps']:.1f} req/s"
+            )
+        if new["statements_per_request"] > base["statements_per_request"]:
+            problems.append(
+                f"SQL/req {base['statements_per_request']}"
+                f" -> {new['statements_per_request']}"
+            )
+        change = (new["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+        status = "REGRESSION" if problems else "ok"
+        print(f"{status:<10} {name:<20} p95 {change:+6.1f}%  {'; '.join(problems)}")
+        regressions += bool(problems)
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{'missing':<10} {name}")
+    print(f"{regressions} regression(s) (threshold {args.threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Endpoint benchmark")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="計測する")
+    run_parser.add_argument("--db", default=str(BENCH_DIR / "bench.db"))
+    run_parser.add_argument("--todos", type=int, default=20000)
+    run_parser.add_argument("--tags", type=int, default=500)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--requests", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--with-cache", action="store_true")
+    run_parser.add_argument("--only", nargs="*", help="計測するシナリオ名")
+    run_parser.add_argument("--out", help="結果を保存するJSONファイル")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="ベースラインと比べる")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
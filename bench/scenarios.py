@@ -0,0 +1,116 @@
+"""
+ベンチマークで計測するリクエスト。
+
+書き込み系は todo_create で作ったToDoだけを対象にし、元のデータは変えない。
+上から順に実行するので、todo_create より後ろに更新・削除を置く。
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import httpx
+
+from crud.pagination import encode_cursor
+
+
+@dataclass
+class Context:
+    todo_ids: list[int]
+    tag_ids: list[int]
+    run_id: str
+    rng: random.Random
+    created_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class Scenario:
+    name: str
+    send: Callable[[httpx.AsyncClient, Context, int], Awaitable[httpx.Response]]
+    expected_status: int = 200
+    # 読み取りだけのシナリオは計測前にウォームアップする
+    read_only: bool = True
+
+
+async def todo_list(client, ctx, i):
+    # 毎回違うページを読む (読み取りキャッシュが有効でもヒットしにくくする)
+    cursor = encode_cursor(ctx.rng.choice(ctx.todo_ids))
+    return await client.get("/v1/todo/", params={"limit": 100, "cursor": cursor})
+
+
+async def todo_list_filtered(client, ctx, i):
+    return await client.get(
+        "/v1/todo/",
+        params={
+            "limit": 50,
+            "completed": "false",
+            "order_by": "deadline",
+            "tag_ids": ctx.rng.choice(ctx.tag_ids),
+        },
+    )
+
+
+async def todo_detail(client, ctx, i):
+    return await client.get(f"/v1/todo/{ctx.rng.choice(ctx.todo_ids)}")
+
+
+async def tag_list(client, ctx, i):
+    cursor = encode_cursor(ctx.rng.choice(ctx.tag_ids))
+    return await client.get("/v1/tag/", params={"limit": 20, "cursor": cursor})
+
+
+async def tag_detail(client, ctx, i):
+    return await client.get(f"/v1/tag/{ctx.rng.choice(ctx.tag_ids)}")
+
+
+async def todo_create(client, ctx, i):
+    response = await client.post(
+        "/v1/todo/",
+        json={"content": f"bench {ctx.run_id} {i}", "deadline": "2030-01-01"},
+    )
+    if response.status_code == 200:
+        ctx.created_ids.append(response.json()["id"])
+    return response
+
+
+async def todo_update(client, ctx, i):
+    todo_id = ctx.created_ids[i % len(ctx.created_ids)]
+    return await client.put(f"/v1/todo/{todo_id}", json={"completed": i % 2 == 0})
+
+
+async def tag_attach(client, ctx, i):
+    todo_id = ctx.created_ids[i % len(ctx.created_ids)]
+    return await client.post(f"/v1/todo/{todo_id}/tags/{_tag_for(ctx, i)}")
+
+
+async def tag_detach(client, ctx, i):
+    todo_id = ctx.created_ids[i % len(ctx.created_ids)]
+    return await client.delete(f"/v1/todo/{todo_id}/tags/{_tag_for(ctx, i)}")
+
+
+def _tag_for(ctx, i):
+    # attach と detach で同じ組み合わせになるよう、乱数ではなく i から決める
+    return ctx.tag_ids[(i // len(ctx.created_ids)) % len(ctx.tag_ids)]
+
+
+async def todo_delete(client, ctx, i):
+    return await client.delete(f"/v1/todo/{ctx.created_ids[i]}")
+
+
+async def index_page(client, ctx, i):
+    return await client.get("/")
+
+
+SCENARIOS = [
+    Scenario("todo_list", todo_list),
+    Scenario("todo_list_filtered", todo_list_filtered),
+    Scenario("todo_detail", todo_detail),
+    Scenario("tag_list", tag_list),
+    Scenario("tag_detail", tag_detail),
+    Scenario("index_page", index_page),
+    Scenario("todo_create", todo_create, read_only=False),
+    Scenario("todo_update", todo_update, read_only=False),
+    Scenario("tag_attach", tag_attach, read_only=False),
+    Scenario("tag_detach", tag_detach, read_only=False),
+    Scenario("todo_delete", todo_delete, read_only=False),
+]
@@ -8,6 +8,9 @@ from app.database import Base
 from app.settings import DATABASE_URL
 from models.todo import TodoModel
 from models.tag import Tag
+from models.data_version import data_version_table
+from models.stats import tag_stats_table, todo_deadline_stats_table, todo_stats_table
+from models.change_log import change_log_state_table, change_log_table
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -32,6 +35,14 @@ target_metadata = Base.metadata
 config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # FTS5の仮想テーブルとその内部テーブルはマイグレーションで直接管理しているので
+    # autogenerateの比較対象から外す
+    if type_ == "table" and name.startswith("todo_fts"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -48,6 +59,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -71,7 +83,10 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata, render_as_batch=True
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=True,
         )
 
         with context.begin_transaction():
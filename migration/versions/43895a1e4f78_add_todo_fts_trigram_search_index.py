@@ -0,0 +1,52 @@
+"""Add todo_fts trigram full-text search index
+
+Revision ID: 43895a1e4f78
+Revises: 812cc5c55434
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "43895a1e4f78"
+down_revision = "812cc5c55434"
+branch_labels = None
+depends_on = None
+
+
+# todo.content を外部コンテンツとして参照するFTS5テーブル。
+# trigramトークナイザーなので、形態素解析なしで日本語の部分一致検索ができる (SQLite 3.34以上)。
+# ※ todo テーブルを batch_alter_table で作り直すとトリガーが消えるので、その場合は再作成すること。
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE todo_fts USING fts5("
+        "content, content='todo', content_rowid='id', tokenize='trigram')"
+    )
+    op.execute(
+        "CREATE TRIGGER todo_fts_after_insert AFTER INSERT ON todo BEGIN "
+        "INSERT INTO todo_fts (rowid, content) VALUES (new.id, new.content); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER todo_fts_after_delete AFTER DELETE ON todo BEGIN "
+        "INSERT INTO todo_fts (todo_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER todo_fts_after_update AFTER UPDATE OF content ON todo BEGIN "
+        "INSERT INTO todo_fts (todo_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "INSERT INTO todo_fts (rowid, content) VALUES (new.id, new.content); "
+        "END"
+    )
+    # 既存のToDoを索引に取り込む
+    op.execute("INSERT INTO todo_fts (todo_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS todo_fts_after_update")
+    op.execute("DROP TRIGGER IF EXISTS todo_fts_after_delete")
+    op.execute("DROP TRIGGER IF EXISTS todo_fts_after_insert")
+    op.execute("DROP TABLE IF EXISTS todo_fts")
@@ -0,0 +1,46 @@
+"""Add data_version counter and triggers
+
+Revision ID: 812cc5c55434
+Revises: 1419a283d960
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "812cc5c55434"
+down_revision = "1419a283d960"
+branch_labels = None
+depends_on = None
+
+WATCHED_TABLES = ("todo", "tags", "todo_tags")
+EVENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "data_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("INSERT INTO data_version (id, version) VALUES (1, 0)")
+
+    for table in WATCHED_TABLES:
+        for event in EVENTS:
+            op.execute(
+                f"CREATE TRIGGER {table}_{event.lower()}_bump_data_version "
+                f"AFTER {event} ON {table} "
+                "BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END"
+            )
+
+
+def downgrade() -> None:
+    for table in WATCHED_TABLES:
+        for event in EVENTS:
+            op.execute(
+                f"DROP TRIGGER IF EXISTS {table}_{event.lower()}_bump_data_version"
+            )
+    op.drop_table("data_version")
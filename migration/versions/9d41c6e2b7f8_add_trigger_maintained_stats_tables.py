@@ -0,0 +1,129 @@
+"""Add trigger-maintained stats tables
+
+Revision ID: 9d41c6e2b7f8
+Revises: 5b2e7d9c0a13
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "9d41c6e2b7f8"
+down_revision = "5b2e7d9c0a13"
+branch_labels = None
+depends_on = None
+
+# 未完了かつ締切ありのToDoを締切日の件数に足す
+ADD_OPEN_DEADLINE = (
+    "INSERT INTO todo_deadline_stats (deadline_date, open_count) "
+    "SELECT date(new.deadline), 1 "
+    "WHERE new.deadline IS NOT NULL AND new.completed IS NOT 1 "
+    "ON CONFLICT (deadline_date) DO UPDATE SET open_count = open_count + 1; "
+)
+REMOVE_OPEN_DEADLINE = (
+    "UPDATE todo_deadline_stats SET open_count = open_count - 1 "
+    "WHERE deadline_date = date(old.deadline) AND old.completed IS NOT 1; "
+)
+
+TRIGGERS = {
+    "todo_stats_after_insert": (
+        "AFTER INSERT ON todo BEGIN "
+        "UPDATE todo_stats SET total = total + 1, "
+        "completed = completed + (new.completed = 1) WHERE id = 1; "
+        + ADD_OPEN_DEADLINE
+        + "END"
+    ),
+    "todo_stats_after_delete": (
+        "AFTER DELETE ON todo BEGIN "
+        "UPDATE todo_stats SET total = total - 1, "
+        "completed = completed - (old.completed = 1) WHERE id = 1; "
+        + REMOVE_OPEN_DEADLINE
+        + "END"
+    ),
+    "todo_stats_after_update": (
+        "AFTER UPDATE OF completed, deadline ON todo BEGIN "
+        "UPDATE todo_stats SET completed = completed "
+        "+ (new.completed = 1) - (old.completed = 1) WHERE id = 1; "
+        + REMOVE_OPEN_DEADLINE
+        + ADD_OPEN_DEADLINE
+        + "END"
+    ),
+    "tag_stats_after_tag_insert": (
+        "AFTER INSERT ON tags BEGIN "
+        "INSERT OR IGNORE INTO tag_stats (tag_id, todo_count) VALUES (new.id, 0); "
+        "END"
+    ),
+    "tag_stats_after_tag_delete": (
+        "AFTER DELETE ON tags BEGIN "
+        "DELETE FROM tag_stats WHERE tag_id = old.id; "
+        "END"
+    ),
+    "tag_stats_after_link_insert": (
+        "AFTER INSERT ON todo_tags BEGIN "
+        "INSERT INTO tag_stats (tag_id, todo_count) VALUES (new.tag_id, 1) "
+        "ON CONFLICT (tag_id) DO UPDATE SET todo_count = todo_count + 1; "
+        "END"
+    ),
+    "tag_stats_after_link_delete": (
+        "AFTER DELETE ON todo_tags BEGIN "
+        "UPDATE tag_stats SET todo_count = todo_count - 1 WHERE tag_id = old.tag_id; "
+        "END"
+    ),
+}
+
+
+# ※ todo / tags / todo_tags を batch_alter_table で作り直すとトリガーが消えるので、その場合は再作成すること。
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table(
+        "tag_stats",
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.Column("todo_count", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("tag_id"),
+    )
+    op.create_table(
+        "todo_deadline_stats",
+        sa.Column("deadline_date", sa.Date(), nullable=False),
+        sa.Column("open_count", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("deadline_date"),
+    )
+    op.create_table(
+        "todo_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("completed", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # ### end Alembic commands ###
+
+    # 既存のデータから集計する
+    op.execute(
+        "INSERT INTO todo_stats (id, total, completed) "
+        "SELECT 1, count(*), count(*) FILTER (WHERE completed = 1) FROM todo"
+    )
+    op.execute(
+        "INSERT INTO tag_stats (tag_id, todo_count) "
+        "SELECT tags.id, count(todo_tags.todo_id) FROM tags "
+        "LEFT JOIN todo_tags ON todo_tags.tag_id = tags.id GROUP BY tags.id"
+    )
+    op.execute(
+        "INSERT INTO todo_deadline_stats (deadline_date, open_count) "
+        "SELECT date(deadline), count(*) FROM todo "
+        "WHERE deadline IS NOT NULL AND completed IS NOT 1 GROUP BY date(deadline)"
+    )
+
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {body}")
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table("todo_stats")
+    op.drop_table("todo_deadline_stats")
+    op.drop_table("tag_stats")
+    # ### end Alembic commands ###
@@ -0,0 +1,286 @@
+"""
+性能測定用の大量データを生成してデータベースに直接書き込む。
+
+同じ引数 (--seed と --base-date を含む) なら常に同じデータになる。
+タグの人気はZipf分布、締切は基準日の前後に散らばり、締切を過ぎたものほど完了している。
+
+    PYTHONPATH=./src python -m seed.generator --todos 1000000 --tags 20000
+"""
+
+import argparse
+import bisect
+import itertools
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, select
+
+from app.settings import DATABASE_URL
+from models.tag import Tag
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+
+# content の上限 (TodoModel.content の String(30))
+CONTENT_MAX_LENGTH = 30
+# 書き込み中のページキャッシュ (KiB単位の負数)
+CACHE_SIZE = -262144
+
+JAPANESE_TASKS = [
+    "ミルクを買う",
+    "宿題をする",
+    "借りた本を返す",
+    "会議の資料を作る",
+    "請求書を送る",
+    "部屋を掃除する",
+    "歯医者を予約する",
+    "洗濯物を取り込む",
+    "企画書をレビューする",
+    "経費を精算する",
+    "週報を書く",
+    "引っ越しの見積もりを取る",
+    "年賀状を準備する",
+    "ゴミを出す",
+    "電気代を払う",
+    "家族に電話する",
+    "健康診断を受ける",
+    "傘を修理する",
+    "議事録をまとめる",
+    "新人の研修を準備する",
+    "植木に水をやる",
+    "パスワードを変更する",
+]
+ASCII_TASKS = [
+    "Fix login bug",
+    "Review PR",
+    "Write release notes",
+    "Update dependencies",
+    "Deploy to staging",
+    "Refactor parser",
+    "Call the bank",
+    "Book flights",
+    "Prepare slides",
+    "Renew passport",
+    "Backup laptop",
+    "Clean inbox",
+    "Plan sprint",
+    "Read paper",
+    "Reply to emails",
+    "Benchmark queries",
+]
+JAPANESE_TAGS = [
+    "仕事",
+    "家事",
+    "買い物",
+    "重要",
+    "急ぎ",
+    "待ち",
+    "個人",
+    "健康",
+    "お金",
+    "学習",
+    "家族",
+    "旅行",
+    "趣味",
+    "会議",
+    "書類",
+]
+ASCII_TAGS = [
+    "work",
+    "home",
+    "urgent",
+    "waiting",
+    "someday",
+    "errand",
+    "backend",
+    "frontend",
+    "infra",
+    "review",
+    "bug",
+    "idea",
+    "reading",
+    "finance",
+    "travel",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--todos", type=int, default=100000, help="ToDoの件数")
+    parser.add_argument("--tags", type=int, default=2000, help="タグの件数")
+    parser.add_argument("--seed", type=int, default=42, help="乱数のシード")
+    parser.add_argument(
+        "--zipf",
+        type=float,
+        default=1.1,
+        help="タグの人気のZipf指数 (大きいほど一部のタグに集中する)",
+    )
+    parser.add_argument(
+        "--tags-per-todo", type=float, default=1.5, help="1件のToDoに付くタグの平均数"
+    )
+    parser.add_argument(
+        "--deadline-ratio", type=float, default=0.7, help="締切があるToDoの割合"
+    )
+    parser.add_argument(
+        "--deadline-spread-days",
+        type=int,
+        default=60,
+        help="締切の基準日からのばらつき (標準偏差、日)",
+    )
+    parser.add_argument(
+        "--completed-ratio",
+        type=float,
+        default=0.4,
+        help="完了済みのToDoの割合 (締切を過ぎたものほど高くなる)",
+    )
+    parser.add_argument(
+        "--japanese-ratio", type=float, default=0.7, help="日本語のcontentの割合"
+    )
+    parser.add_argument(
+        "--base-date",
+        type=date.fromisoformat,
+        default=date.today(),
+        help="締切の基準日 (YYYY-MM-DD、省略時は今日)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=10000, help="1トランザクションで書き込む行数"
+    )
+    return parser.parse_args()
+
+
+def tag_names(rng, count, start_id):
+    words = JAPANESE_TAGS + ASCII_TAGS
+    rng.shuffle(words)
+    for tag_id in range(start_id, start_id + count):
+        # idを付けて一意にする (nameの一意制約)
+        yield tag_id, f"{rng.choice(words)}-{tag_id}"
+
+
+def content_of(rng, todo_id, japanese_ratio):
+    """
+    末尾にidを付けて一意にし、全体を30文字以内に収める。
+    """
+    suffix = f" #{todo_id:x}"
+    tasks = JAPANESE_TASKS if rng.random() < japanese_ratio else ASCII_TASKS
+    text = rng.choice(tasks)
+    if rng.random() < 0.3:
+        text += " " + rng.choice(JAPANESE_TASKS + ASCII_TASKS)
+    return text[: CONTENT_MAX_LENGTH - len(suffix)] + suffix
+
+
+def deadline_of(rng, args):
+    if rng.random() >= args.deadline_ratio:
+        return None
+    # 少し先の締切が多く、過去の締切は少なめ
+    offset = round(rng.gauss(args.deadline_spread_days / 4, args.deadline_spread_days))
+    return datetime.combine(
+        args.base_date + timedelta(days=offset), datetime.min.time()
+    )
+
+
+def completed_of(rng, deadline, args):
+    ratio = args.completed_ratio
+    if deadline is not None:
+        past = deadline.date() < args.base_date
+        ratio = min(0.95, ratio * 1.5) if past else ratio * 0.5
+    return rng.random() < ratio
+
+
+def tag_count_of(rng, mean):
+    # 平均 mean の幾何分布 (0個もある)
+    p = 1 / (mean + 1)
+    count = 0
+    while rng.random() >= p:
+        count += 1
+    return count
+
+
+def zipf_cum_weights(count, exponent):
+    return list(
+        itertools.accumulate(1 / (rank**exponent) for rank in range(1, count + 1))
+    )
+
+
+def generate_todos(rng, args, start_id, tag_ids, cum_weights):
+    total = cum_weights[-1] if cum_weights else 0
+    for todo_id in range(start_id, start_id + args.todos):
+        deadline = deadline_of(rng, args)
+        todo = {
+            "id": todo_id,
+            "content": content_of(rng, todo_id, args.japanese_ratio),
+            "completed": completed_of(rng, deadline, args),
+            "deadline": deadline,
+        }
+        links = set()
+        if tag_ids:
+            for _ in range(tag_count_of(rng, args.tags_per_todo)):
+                rank = bisect.bisect(cum_weights, rng.random() * total)
+                links.add(tag_ids[min(rank, len(tag_ids) - 1)])
+        yield todo, sorted(links)
+
+
+def print_progress(label, done, total, started):
+    rate = done / max(time.perf_counter() - started, 1e-9)
+    print(f"\r{label}: {done}/{total} {rate:.0f} rows/sec", end="", file=sys.stderr)
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    engine = create_engine(DATABASE_URL)
+    todo_table = TodoModel.__table__
+    tag_table = Tag.__table__
+
+    with engine.connect() as conn:
+        # インデックス (content の一意制約・FTS) の更新で読むページをメモリに置く
+        conn.exec_driver_sql(f"PRAGMA cache_size = {CACHE_SIZE}")
+        # 既存のデータの後ろに追加する
+        tag_start = (conn.scalar(select(func.max(tag_table.c.id))) or 0) + 1
+        todo_start = (conn.scalar(select(func.max(todo_table.c.id))) or 0) + 1
+        conn.commit()
+
+        started = time.perf_counter()
+        tags = list(tag_names(rng, args.tags, tag_start))
+        for offset in range(0, len(tags), args.chunk_size):
+            with conn.begin():
+                conn.execute(
+                    insert(tag_table),
+                    [
+                        {"id": tag_id, "name": name}
+                        for tag_id, name in tags[offset : offset + args.chunk_size]
+                    ],
+                )
+            print_progress(
+                "tags", min(offset + args.chunk_size, len(tags)), len(tags), started
+            )
+        print(file=sys.stderr)
+
+        # 人気順 (Zipfの順位) はidの順とは無関係にする
+        tag_ids = [tag_id for tag_id, _ in tags]
+        rng.shuffle(tag_ids)
+        cum_weights = zipf_cum_weights(len(tag_ids), args.zipf)
+
+        started = time.perf_counter()
+        done = 0
+        rows = generate_todos(rng, args, todo_start, tag_ids, cum_weights)
+        while chunk := list(itertools.islice(rows, args.chunk_size)):
+            with conn.begin():
+                conn.execute(insert(todo_table), [todo for todo, _ in chunk])
+                links = [
+                    {"todo_id": todo["id"], "tag_id": tag_id}
+                    for todo, tag_ids_of_todo in chunk
+                    for tag_id in tag_ids_of_todo
+                ]
+                if links:
+                    conn.execute(insert(todo_tag_association_table), links)
+            done += len(chunk)
+            print_progress("todos", done, args.todos, started)
+        print(file=sys.stderr)
+
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import argparse
+import asyncio
 import os
+import sys
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -9,8 +11,49 @@ from app.settings import DATABASE_URL
 
 parser = argparse.ArgumentParser()
 
-parser.add_argument('revision')
+parser.add_argument('revision', nargs='?')
+# 大量データ用: NDJSON (/v1/todo/export の形式) を少しずつ読んで取り込む
+parser.add_argument('--import-ndjson', metavar='PATH')
 args = parser.parse_args()
+if (args.revision is None) == (args.import_ndjson is None):
+    parser.error('revision か --import-ndjson のどちらか一方を指定してください')
+
+READ_BYTES = 1024 * 1024
+
+
+async def read_file(path):
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_BYTES):
+            yield chunk
+
+
+def print_progress(result):
+    print(
+        f'\r{result.rows} rows ({result.created} created, {result.skipped} skipped, '
+        f'{result.invalid} invalid) {result.rows_per_second:.0f} rows/sec',
+        end='',
+        file=sys.stderr,
+    )
+
+
+async def import_ndjson(path):
+    from app.database import AsyncSessionLocal, async_engine
+    from crud import importer
+
+    async with AsyncSessionLocal() as db:
+        result = await importer.import_ndjson(
+            db, read_file(path), on_progress=print_progress
+        )
+    await async_engine.dispose()
+    print(file=sys.stderr)
+    for error in result.errors:
+        print(f'line {error.line}: {error.detail}', file=sys.stderr)
+    return result
+
+
+if args.import_ndjson:
+    asyncio.run(import_ndjson(args.import_ndjson))
+    sys.exit()
 
 engine = create_engine(DATABASE_URL)
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+
+from app.cache import response_cache
+
+router = APIRouter()
+
+
+@router.get("/stats")
+async def read_stats():
+    """
+    Retrieve read cache hit/miss counters.
+    """
+    return response_cache.stats()
@@ -0,0 +1,34 @@
+from fastapi import Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import data_version
+
+# ブラウザにもキャッシュさせつつ、毎回 If-None-Match で再検証させる
+CACHE_CONTROL = "no-cache"
+
+
+async def get_etag(db: AsyncSession) -> str:
+    return f'"v{await data_version.get(db)}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def json_response(body: bytes, etag: str, headers: dict | None = None) -> Response:
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, **(headers or {})},
+    )
@@ -0,0 +1,49 @@
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app import settings
+from app.events import KEEPALIVE_FRAME, RETRY_FRAME, Subscriber, event_bus
+
+router = APIRouter()
+
+
+async def _stream(subscriber: Subscriber) -> AsyncIterator[bytes]:
+    try:
+        yield RETRY_FRAME
+        while True:
+            await subscriber.wait(settings.EVENTS_HEARTBEAT_SECONDS)
+            if subscriber.overflowed:
+                subscriber.overflowed = False
+                yield event_bus.reset_frame()
+                continue
+            frames = subscriber.drain()
+            # 待っている間にたまったイベントは1回の送信にまとめる
+            yield b"".join(frames) if frames else KEEPALIVE_FRAME
+    finally:
+        # クライアントが切断するとここに来る
+        event_bus.unsubscribe(subscriber)
+
+
+@router.get("")
+async def stream_events(last_event_id: Optional[str] = Header(None)):
+    """
+    Stream todo/tag changes as Server-Sent Events.
+
+    イベントは todo.created / todo.updated / todo.deleted / todo.tag_added /
+    todo.tag_removed / tag.created / tag.updated / tag.deleted で、data は変更された項目だけ。
+    reset を受け取ったら、取りこぼしがあるので一覧を読み直す。
+    """
+    if event_bus.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="接続数が上限に達しています。",
+        )
+    subscriber = event_bus.subscribe(last_event_id)
+    return StreamingResponse(
+        _stream(subscriber),
+        media_type="text/event-stream",
+        # プロキシにバッファさせず、届いたイベントをすぐ流させる
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 from fastapi import Request
 
-from fastapi.responses import HTMLResponse
-
-from sqlalchemy.orm import Session
+from markupsafe import Markup
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from app import database
-from app.templating import templates
+from app.cache import response_cache, tag_dep, todo_dep
+from app.templating import stream_env, templates
 from crud import todo
+from crud.pagination import decode_id_cursor, encode_cursor
 
 from app.database import get_db
 
@@ -19,54 +21,121 @@ router = APIRouter(
 )
 
 
+# トップページと無限スクロールで1回に送るToDoの件数
+INDEX_PAGE_SIZE = 100
+# まとめて送る行数
+ROW_BATCH_SIZE = 20
+
+
+class _Page:
+    """
+    行を送り終えた後で決まる次ページのカーソルを、テンプレートの末尾へ渡す。
+    """
+
+    def __init__(self):
+        self.next_cursor = None
+
+
+def _render_row(todo_row: dict, version: int) -> Markup:
+    # (id, updated_at) が同じなら同じ描画結果になる。
+    # updated_at は秒単位なので、同じ秒の更新やタグ名の変更は deps の無効化で捨てる
+    key = ("todo-row", todo_row["id"], todo_row["updated_at"])
+    html = response_cache.get(key)
+    if html is None:
+        html = Markup(templates.get_template("_todo_row.html").render(todo=todo_row))
+        deps = {todo_dep(todo_row["id"])}
+        deps.update(tag_dep(tag["id"]) for tag in todo_row["tags"])
+        response_cache.set(key, html, deps, version)
+    return html
+
+
+async def _rows(after_id: Optional[int], page: _Page):
+    version = response_cache.version
+    # リクエストのセッションはレスポンスの送信前に閉じられることがあるので、
+    # ストリームの間だけ使う読み取り用セッションをここで開く
+    async with database.ReadAsyncSessionLocal() as db:
+        count = 0
+        batch = []
+        async for todo_row in todo.index_rows(db, after_id, INDEX_PAGE_SIZE + 1):
+            if count == INDEX_PAGE_SIZE:
+                page.next_cursor = encode_cursor(after_id)
+                break
+            batch.append(_render_row(todo_row, version))
+            after_id = todo_row["id"]
+            count += 1
+            # 1行ずつ送ると小さな書き込みが増えるので、数行ずつまとめて送る
+            if len(batch) == ROW_BATCH_SIZE:
+                yield Markup("").join(batch)
+                batch = []
+        if batch:
+            yield Markup("").join(batch)
+
+
+def _stream_page(request: Request, name: str, cursor: Optional[str], context: dict):
+    """
+    テンプレートを generate で少しずつ送る。
+    行より前の部分は最初のSELECTの前に送るので、件数によらず最初の1バイトはすぐに届く。
+    カーソルは送り始める前に確かめる (送り始めた後はステータスを400にできない)。
+    """
+    after_id = decode_id_cursor(cursor) if cursor else None
+    page = _Page()
+    chunks = stream_env.get_template(name).generate_async(
+        request=request,
+        rows=_rows(after_id, page),
+        page=page,
+        cursor=cursor,
+        **context,
+    )
+    return StreamingResponse(chunks, media_type="text/html; charset=utf-8")
+
+
 @router.get("/", response_class=HTMLResponse)
-async def read_root(request: Request, db: Session = Depends(database.get_db)):
+async def read_root(request: Request, cursor: Optional[str] = None):
 
-    todos = todo.get(db=db, skip=0, limit=100)
+    return _stream_page(request, "index.html", cursor, {"page_title": "ToDoアプリ"})
+
+
+@router.get("/todo/rows", response_class=HTMLResponse)
+async def read_todo_rows(request: Request, cursor: Optional[str] = None):
+
+    # 無限スクロールで次のページの行 (と、さらに次のページへのリンク) だけを返す
+    return _stream_page(request, "_todo_rows.html", cursor, {})
 
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "todos": todos,
-            "page_title": "ToDoアプリ",
-        },
-    )
+
+@router.get("/todo/{todo_id}/row", response_class=HTMLResponse)
+async def read_todo_row(todo_id: int, db: AsyncSession = Depends(get_db)):
+
+    # 変更イベント (/v1/events) を受け取ったページが、その行だけを差し替えるのに使う
+    # 読んでいる間に書き込みがあれば古い行をキャッシュしないよう、読む前の version を使う
+    version = response_cache.version
+    todo_row = await todo.index_row(db, todo_id)
+    if todo_row is None:
+        raise HTTPException(status_code=404, detail="指定されたToDoが見つかりません。")
+    return HTMLResponse(_render_row(todo_row, version))
 
 @router.get("/todo/new", response_class=HTMLResponse)
 async def create_todo_form(request: Request):
 
     return templates.TemplateResponse(
+        request,
         "create_todo.html",
         {
-            "request": request,
             "page_title": "新しいToDoの作成",
         },
     )
 
-@router.get("/", response_class=HTMLResponse)
-async def read_root(request: Request):
-
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "page_title": "ToDoアプリのフロントエンド",
-        },
-    )
-
 @router.get("/todo/{todo_id}/edit", response_class=HTMLResponse)
-async def show_edit_todo_form(request: Request, todo_id: int, db: Session = Depends(get_db)):
+async def show_edit_todo_form(request: Request, todo_id: int, db: AsyncSession = Depends(get_db)):
 
-    todo_item = todo.get_by_id(db, todo_id=todo_id)
+    todo_item = await todo.get_by_id(db, todo_id=todo_id)
 
     if todo_item is None:
         raise HTTPException(status_code=404, detail="指定されたToDoが見つかりません。")
 
     return templates.TemplateResponse(
+        request,
         "edit_todo.html",
         {
-            "request": request,
             "page_title": f"ToDoの編集 (ID: {todo_id})",
             "todo": todo_item
         }
@@ -76,9 +145,9 @@ async def show_edit_todo_form(request: Request, todo_id: int, db: Session = Depe
 async def show_licenses_page(request: Request):
 
     return templates.TemplateResponse(
+        request,
         "licenses.html",
         {
-            "request": request,
             "page_title": "ライセンスについて",
         },
     )
\ No newline at end of file
@@ -0,0 +1,42 @@
+import logging
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from crud import importer
+from schemas.schema import ImportResultSchema
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+
+def _log_progress(result: ImportResultSchema) -> None:
+    logger.info(
+        "imported %d rows (%d created, %d skipped, %d invalid) %.1f rows/sec",
+        result.rows,
+        result.created,
+        result.skipped,
+        result.invalid,
+        result.rows_per_second,
+    )
+
+
+@router.post(
+    "",
+    response_model=ImportResultSchema,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+)
+async def import_todos(request: Request, db: AsyncSession = Depends(database.get_db)):
+    """
+    Import todos from NDJSON (the same format as /todo/export).
+
+    リクエストボディを読みながら取り込むので、全体をメモリに載せない。
+    """
+    return await importer.import_ndjson(db, request.stream(), on_progress=_log_progress)
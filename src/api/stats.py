@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from crud import stats
+from schemas.schema import StatsSchema, TagStatsSchema
+
+router = APIRouter()
+
+
+@router.get("", response_model=StatsSchema)
+async def read(db: AsyncSession = Depends(database.get_db)):
+    """
+    Retrieve todo counts (total, completed and overdue).
+    """
+    return await stats.get(db)
+
+
+@router.get("/tags", response_model=list[TagStatsSchema])
+async def read_tags(
+    response: Response,
+    db: AsyncSession = Depends(database.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Retrieve todo counts per tag.
+
+    タグのid順に返し、次ページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    """
+    tags, next_cursor = await stats.get_tags(db, cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return tags
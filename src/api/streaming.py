@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Callable
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# 1行ずつ送ると小さなチャンクが大量にできるので、この大きさまで貯めてから送る
+FLUSH_BYTES = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_line(row: dict) -> str:
+    return json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+
+
+def _csv_value(value):
+    # NDJSONと同じ表記にそろえる
+    if isinstance(value, (bool, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_row(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def _csv_line(row: dict) -> str:
+    return _csv_row([_csv_value(value) for value in row.values()])
+
+
+async def _encode(
+    rows: Callable[[AsyncSession], AsyncIterator[dict]], fields: list[str], format: str
+) -> AsyncIterator[bytes]:
+    # リクエストのセッションはレスポンスの送信前に閉じられることがあるので、
+    # ストリームの間だけ使う読み取り用セッションをここで開く
+    async with database.ReadAsyncSessionLocal() as db:
+        chunk = []
+        size = 0
+        if format == "csv":
+            chunk.append(_csv_row(fields))
+        encode_line = _csv_line if format == "csv" else _ndjson_line
+        async for row in rows(db):
+            line = encode_line(row)
+            chunk.append(line)
+            size += len(line)
+            if size >= FLUSH_BYTES:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+                size = 0
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
+
+
+def streaming_response(
+    rows: Callable[[AsyncSession], AsyncIterator[dict]],
+    fields: list[str],
+    format: str,
+    filename: str,
+) -> StreamingResponse:
+    """
+    rows(db) が返す行を NDJSON または CSV にして少しずつ送る。
+    行を全件メモリに載せないので、件数によらずメモリ使用量は一定。
+    """
+    return StreamingResponse(
+        _encode(rows, fields, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
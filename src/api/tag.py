@@ -1,48 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
 
-from app import database
+from api import conditional, streaming
+from app import database, serialization
 from crud import tag
-from schemas.schema import CreateTagSchema, TagSchema, UpdateTagSchema
+from schemas.schema import (
+    CreateTagSchema,
+    TagSchema,
+    TagSuggestionSchema,
+    UpdateTagSchema,
+)
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[TagSchema])
-def read(db: Session = Depends(database.get_db), skip: int = 0, limit: int = 100):
+async def read(
+    request: Request,
+    db: AsyncSession = Depends(database.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True),
+):
     """
     Retrieve tags.
+
+    次ページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    If-None-Match が現在のETagと一致すれば、行を読まずに304を返す。
+    skip は後方互換のためだけに残している。
     """
+    if skip is not None:
+        tags = await tag.get(db=db, skip=skip, limit=limit)
+        return serialization.respond(tags, serialization.dump_tags)
+
+    etag = await conditional.get_etag(db)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
 
-    tags = tag.get(db=db, skip=skip, limit=limit)
-    return tags
+    body, next_cursor, etag = await tag.get_page_json(
+        db=db, cursor=cursor, limit=limit, etag=etag
+    )
+    # キャッシュから返す本文には、保存したときのETagが付く
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return conditional.json_response(body, etag, headers)
+
+
+@router.get("/export")
+async def export(format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Export all tags as NDJSON or CSV.
+    """
+    return streaming.streaming_response(
+        tag.export_rows, tag.EXPORT_FIELDS, format, "tags"
+    )
+
+
+@router.get("/suggest", response_model=list[TagSuggestionSchema])
+async def suggest(
+    db: AsyncSession = Depends(database.get_db),
+    prefix: str = Query("", max_length=30),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """
+    Suggest tags whose name starts with the prefix.
+
+    大文字・小文字を区別せずに前方一致したタグを、紐づくToDoの多い順に返す。
+    メモリ上の索引から引くので、DBは読まない。別のワーカーやプロセスの書き込みは
+    TAG_SUGGEST_REFRESH_SECONDS ごとに data_version の1行だけを読んで確かめる。
+    """
+    return await tag.suggest(db, prefix, limit)
 
 
 @router.get("/{tag_id}", response_model=TagSchema)
-def read_by_id(tag_id: int, db: Session = Depends(database.get_db)):
-    tag_model = tag.get_by_id(db, tag_id)
-    if not tag_model:
+async def read_by_id(
+    tag_id: int, request: Request, db: AsyncSession = Depends(database.get_db)
+):
+    etag = await conditional.get_etag(db)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+
+    cached = await tag.get_by_id_json(db, tag_id, etag)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Tag not found")
-    return TagSchema.model_validate(tag_model)
+    body, etag = cached
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+    return conditional.json_response(body, etag)
 
 
 @router.post("/", response_model=TagSchema)
-def create(tag_schema: CreateTagSchema, db: Session = Depends(database.get_db)):
-    tag_model = tag.create(db, tag_schema)
-    return TagSchema.model_validate(tag_model)
+async def create(
+    tag_schema: CreateTagSchema, db: AsyncSession = Depends(database.get_write_db)
+):
+    tag_model = await tag.create(db, tag_schema)
+    return serialization.respond(tag_model, serialization.dump_model)
 
 
 @router.put("/{tag_id}")
-def update(
-    tag_id: int, tag_schema: UpdateTagSchema, db: Session = Depends(database.get_db)
+async def update(
+    tag_id: int,
+    tag_schema: UpdateTagSchema,
+    db: AsyncSession = Depends(database.get_write_db),
 ):
-    tag_model = tag.update(db, tag_id, tag_schema)
+    tag_model = await tag.update(db, tag_id, tag_schema)
     if not tag_model:
         raise HTTPException(status_code=404, detail="Tag not found")
     return Response(status_code=status.HTTP_200_OK)
 
 
 @router.delete("/{tag_id}")
-def delete(tag_id: int, db: Session = Depends(database.get_db)):
-    tag.delete(db, tag_id)
+async def delete(tag_id: int, db: AsyncSession = Depends(database.get_write_db)):
+    await tag.delete(db, tag_id)
     return Response(status_code=status.HTTP_200_OK)
@@ -1,50 +1,216 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-
-from app import database
-from crud import todo, tag
-from schemas.schema import CreateTodoSchema, TodoSchema, UpdateTodoSchema, TagSchema
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Literal, Optional
+
+from api import conditional, streaming
+from app import database, serialization
+from crud import changes, todo
+from schemas.schema import (
+    BulkCreateTodoSchema,
+    BulkDeleteTodoSchema,
+    BulkResultSchema,
+    BulkUpdateTodoSchema,
+    ChangesSchema,
+    CreateTodoSchema,
+    TodoFilterSchema,
+    TodoSchema,
+    UpdateTodoSchema,
+)
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[TodoSchema])
-def read(db: Session = Depends(database.get_db), skip: int = 0, limit: int = 100):
+async def read(
+    request: Request,
+    db: AsyncSession = Depends(database.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    order_by: Literal["id", "deadline"] = "id",
+    direction: Literal["asc", "desc"] = "asc",
+    completed: Optional[bool] = None,
+    deadline_from: Optional[date] = None,
+    deadline_to: Optional[date] = None,
+    tag_ids: List[int] = Query([]),
+    tags_all: List[int] = Query([]),
+    tags_any: List[int] = Query([]),
+    tags_none: List[int] = Query([]),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True),
+):
     """
     Retrieve todos.
+
+    completed / deadline_from / deadline_to / tag_ids (いずれかのタグ) で絞り込み、
+    order_by と direction で並び替える。
+    tags_all / tags_any / tags_none はタグ索引で解決する (id順のみ)。
+    次ページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    If-None-Match が現在のETagと一致すれば、行を読まずに304を返す。
+    skip は後方互換のためだけに残している (絞り込み・並び替えは効かない)。
+    """
+    if skip is not None:
+        todos = await todo.get(db=db, skip=skip, limit=limit)
+        return serialization.respond(todos, serialization.dump_todos)
+
+    etag = await conditional.get_etag(db)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+
+    filters = TodoFilterSchema(
+        completed=completed,
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+        tag_ids=tuple(sorted(set(tag_ids))),
+        tags_all=tuple(sorted(set(tags_all))),
+        tags_any=tuple(sorted(set(tags_any))),
+        tags_none=tuple(sorted(set(tags_none))),
+    )
+    body, next_cursor, etag = await todo.get_page_json(
+        db=db,
+        cursor=cursor,
+        limit=limit,
+        order_by=order_by,
+        direction=direction,
+        filters=filters,
+        etag=etag,
+    )
+    # キャッシュから返す本文には、保存したときのETagが付く
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return conditional.json_response(body, etag, headers)
+
+
+# /{todo_id} より先に定義しないと "search" や "bulk" がtodo_idとして解釈される
+@router.get("/search", response_model=list[TodoSchema])
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=30),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(database.get_db),
+):
     """
-    todos = todo.get(db=db, skip=skip, limit=limit)
-    return todos
+    Search todos by content.
+
+    関連度の高い順に返し、次ページがある場合は X-Next-Cursor ヘッダーにカーソルを返す。
+    """
+    etag = await conditional.get_etag(db)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+
+    todos, next_cursor = await todo.search(db, q=q, cursor=cursor, limit=limit)
+    body = serialization.dump_todos(todos)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return conditional.json_response(body, etag, headers)
+
+
+@router.get("/export")
+async def export(format: Literal["ndjson", "csv"] = "ndjson"):
+    """
+    Export all todos as NDJSON or CSV.
+
+    行を少しずつ読みながら送るので、件数によらずメモリ使用量は一定。
+    """
+    return streaming.streaming_response(
+        todo.export_rows, todo.EXPORT_FIELDS, format, "todos"
+    )
+
+
+@router.get("/changes", response_model=ChangesSchema)
+async def read_changes(
+    since: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """
+    Retrieve todos, tags and todo-tag links changed since a token.
+
+    作成・更新されたものは現在の値、削除されたものはidだけ (トゥームストーン) を返す。
+    最初は since なしで全件を取得し、以降は前回の next_token を since に渡す。
+    has_more が true の間は続きを取得する。トークンが古すぎる場合は410を返すので、
+    since なしで取得し直す。
+    """
+    return await changes.get(db, since=since, limit=limit)
+
+
+@router.post("/bulk", response_model=BulkResultSchema)
+async def bulk_create(
+    bulk_schema: BulkCreateTodoSchema, db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Create todos in bulk.
+    """
+    results = await todo.bulk_create(db, bulk_schema.items)
+    return BulkResultSchema(results=results)
+
+
+@router.patch("/bulk", response_model=BulkResultSchema)
+async def bulk_update(
+    bulk_schema: BulkUpdateTodoSchema, db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Update todos in bulk.
+
+    contentの重複は全体を適用した後の状態で判定するので、contentの入れ替えもできる。
+    """
+    results = await todo.bulk_update(db, bulk_schema.items)
+    return BulkResultSchema(results=results)
+
+
+@router.delete("/bulk", response_model=BulkResultSchema)
+async def bulk_delete(
+    bulk_schema: BulkDeleteTodoSchema, db: AsyncSession = Depends(database.get_db)
+):
+    """
+    Delete todos in bulk.
+
+    全体を1つのトランザクションで削除するので、失敗した場合はどのToDoも削除されない。
+    """
+    results = await todo.bulk_delete(db, bulk_schema.ids)
+    return BulkResultSchema(results=results)
 
 
 @router.get("/{todo_id}", response_model=TodoSchema)
-def read_by_id(todo_id: int, db: Session = Depends(database.get_db)):
-    todo_model = todo.get_by_id(db, todo_id)
-    if not todo_model:
+async def read_by_id(
+    todo_id: int, request: Request, db: AsyncSession = Depends(database.get_db)
+):
+    etag = await conditional.get_etag(db)
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+
+    cached = await todo.get_by_id_json(db, todo_id, etag)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    return todo_model
+    body, etag = cached
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified_response(etag)
+    return conditional.json_response(body, etag)
 
 
 @router.post("/", response_model=TodoSchema)
-def create(todo_schema: CreateTodoSchema, db: Session = Depends(database.get_db)):
-    todo_model = todo.create(db, todo_schema)
-    return todo_model
+async def create(
+    todo_schema: CreateTodoSchema, db: AsyncSession = Depends(database.get_write_db)
+):
+    todo_model = await todo.create(db, todo_schema)
+    return serialization.respond(todo_model, serialization.dump_model)
 
 
 @router.put("/{todo_id}", response_model=TodoSchema)
-def update(
-    todo_id: int, todo_schema: UpdateTodoSchema, db: Session = Depends(database.get_db)
+async def update(
+    todo_id: int,
+    todo_schema: UpdateTodoSchema,
+    db: AsyncSession = Depends(database.get_write_db),
 ):
-    todo_model = todo.update(db, todo_id, todo_schema)
+    todo_model = await todo.update(db, todo_id, todo_schema)
     if not todo_model:
         raise HTTPException(status_code=404, detail="Todo not found")
-    return todo_model
+    return serialization.respond(todo_model, serialization.dump_model)
 
 
 @router.delete("/{todo_id}")
-def delete(todo_id: int, db: Session = Depends(database.get_db)):
-    deleted_id = todo.delete(db, todo_id)
+async def delete(todo_id: int, db: AsyncSession = Depends(database.get_write_db)):
+    deleted_id = await todo.delete(db, todo_id)
     if deleted_id is None:
         raise HTTPException(status_code=404, detail="Todo not found")
     return Response(status_code=status.HTTP_200_OK)
@@ -56,35 +222,30 @@ def delete(todo_id: int, db: Session = Depends(database.get_db)):
     summary="ToDoにタグを紐付ける",
     description="指定されたtodo_idのToDoに、指定されたtag_idのタグを紐付けます。",
 )
-def add_tag_to_todo_endpoint(
+async def add_tag_to_todo_endpoint(
     todo_id: int,
     tag_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_write_db),
 ):
-    db_todo = todo.get_by_id(db, todo_id=todo_id)
-    if db_todo is None:
-        raise HTTPException(status_code=404, detail="Todo not found")
-
-    db_tag = tag.get_by_id(db, tag_id=tag_id)
-    if db_tag is None:
-        raise HTTPException(status_code=404, detail="Tag not found")
-
-    updated_todo = todo.add_tag_to_todo(db=db, todo=db_todo, tag=db_tag)
+    # ToDo/Tagが存在しない場合は404、紐付け済みの場合は409をcrud側で返す
+    updated_todo = await todo.add_tag_to_todo(db=db, todo_id=todo_id, tag_id=tag_id)
 
-    return updated_todo
+    return serialization.respond(updated_todo, serialization.dump_model)
 
 
 @router.delete("/{todo_id}/tags/{tag_id}", response_model=TodoSchema)
-def remove_tag_from_todo_endpoint(
+async def remove_tag_from_todo_endpoint(
     todo_id: int,
     tag_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_write_db),
 ):
-    updated_todo = todo.remove_tag_from_todo(db=db, todo_id=todo_id, tag_id=tag_id)
+    updated_todo = await todo.remove_tag_from_todo(
+        db=db, todo_id=todo_id, tag_id=tag_id
+    )
     if updated_todo is None:
         raise HTTPException(
             status_code=404,
             detail="TodoまたはTagが見つかりません、または紐付いていません",
         )
 
-    return updated_todo
+    return serialization.respond(updated_todo, serialization.dump_model)
@@ -0,0 +1,100 @@
+import json
+import mimetypes
+from pathlib import Path
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+STATIC_DIR = BASE_DIR / "static"
+
+# tool.build_static の出力先 (static/ からの相対パス)
+DIST_DIR = "dist"
+MANIFEST_PATH = STATIC_DIR / DIST_DIR / "manifest.json"
+
+# ファイル名にハッシュが入っているので、内容が変わればURLも変わる
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 優先する順。接尾辞は tool.build_static が書き出す事前圧縮版のもの
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _load_manifest() -> dict[str, str]:
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+# 元のパス (js/main.js) → ハッシュ付きのパス (dist/js/main.3f9c2a1b7e.js)
+manifest = _load_manifest()
+
+
+def static_url(path: str) -> str:
+    """
+    テンプレートから静的ファイルを参照するURLを返す。
+    ビルド済みならハッシュ付きのファイル、未ビルドなら元のファイルを指す。
+    """
+    path = path.lstrip("/")
+    return "/static/" + manifest.get(path, path)
+
+
+def _accepted_encodings(scope) -> list[tuple[str, str]]:
+    offered = set()
+    for item in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = item.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            # q=0 は「受け付けない」の意味
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        offered.add(name.strip().lower())
+    return [
+        (encoding, suffix)
+        for encoding, suffix in ENCODINGS
+        if encoding in offered or "*" in offered
+    ]
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    dist/ 以下のハッシュ付きファイルには immutable のキャッシュヘッダーを付け、
+    Accept-Encoding に合う事前圧縮版 (.br/.gz) があればそれを返す。
+    それ以外のファイルは StaticFiles と同じ (毎回再検証する)。
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        if Path(path).parts[:1] != (DIST_DIR,) or scope["method"] not in (
+            "GET",
+            "HEAD",
+        ):
+            return await super().get_response(path, scope)
+
+        for encoding, suffix in _accepted_encodings(scope):
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffix
+            )
+            if stat_result is not None:
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["content-encoding"] = encoding
+                if "content-type" in response.headers:
+                    media_type = mimetypes.guess_type(path)[0] or "text/plain"
+                    response.headers["content-type"] = _with_charset(media_type)
+                break
+        else:
+            response = await super().get_response(path, scope)
+
+        response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
+def _with_charset(media_type: str) -> str:
+    # FileResponse と同じく text/* には charset を付ける
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        return f"{media_type}; charset=utf-8"
+    return media_type
@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Iterable
+
+from app import settings
+
+
+def todo_dep(todo_id: int) -> tuple:
+    return ("todo", todo_id)
+
+
+def tag_dep(tag_id: int) -> tuple:
+    return ("tag", tag_id)
+
+
+# 一覧の並びや件数が変わる変更 (作成・削除・締切や完了状態の変更) で無効化する
+TODO_LIST_DEP = ("todo-list",)
+TAG_LIST_DEP = ("tag-list",)
+
+
+class ResponseCache:
+    """
+    シリアライズ済みレスポンスを保持するLRU + TTLキャッシュ。
+
+    各エントリは自分の内容が依存するキー (todo_dep/tag_dep など) を持ち、
+    書き込み側は変更したキーを invalidate するだけで、
+    多対多の反対側(タグに埋め込まれたToDoなど)も含めて該当エントリが消える。
+
+    キャッシュはプロセス内なので、ワーカーが複数の場合は他ワーカーの書き込みは
+    TTLが切れるまで反映されない。そのためETagを返すレスポンスは、本文と一緒に
+    保存したときのETagを返し、古い本文が新しいETagで返らないようにする。
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any, frozenset]] = (
+            OrderedDict()
+        )
+        self._keys_by_dep: dict[Hashable, set] = {}
+        self._lock = Lock()
+        # 無効化のたびに進める。読み込み開始時の値と比べ、古い結果の保存を防ぐ
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, deps = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self, key: Hashable, value: Any, deps: Iterable[Hashable], version: int
+    ) -> None:
+        """
+        version には読み込みを始める前の self.version を渡す。
+        その間に無効化があった場合は、古いかもしれない値なので保存しない。
+        """
+        if not self.enabled:
+            return
+        deps = frozenset(deps)
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, deps)
+            for dep in deps:
+                self._keys_by_dep.setdefault(dep, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *deps: Hashable) -> None:
+        with self._lock:
+            self.version += 1
+            for dep in deps:
+                for key in self._keys_by_dep.pop(dep, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._keys_by_dep.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, deps = self._entries.pop(key)
+        for dep in deps:
+            keys = self._keys_by_dep.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_dep[dep]
+
+
+response_cache = ResponseCache(
+    max_entries=settings.READ_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.READ_CACHE_TTL_SECONDS,
+)
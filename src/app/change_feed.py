@@ -0,0 +1,90 @@
+"""
+プロセス内の索引 (タグ索引・タグ名の索引) を、他のワーカーやプロセスの書き込みに追従させる。
+
+data_version (todo / tags / todo_tags が変わるたびにトリガーで進む) の1行を読めば変更の有無が分かり、
+変わっていれば change_log (差分同期用の変更履歴) から前回の続きだけを読んで索引に当てる。
+change_log は対象ごとに最後の状態の1行だけを持つので、同じ変更を2回当てても結果は変わらない。
+(自分のプロセスの書き込みはcommit後に索引へ反映済みだが、もう一度当てても害はない)
+"""
+
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.change_log import change_log_state_table, change_log_table
+from models.data_version import data_version_table
+
+# 追いつくために読む変更の件数の上限。超えた場合は索引を作り直す方が速い
+CATCH_UP_MAX_ROWS = 10000
+
+
+class FeedState(NamedTuple):
+    data_version: int
+    # change_log の最後の seq
+    seq: int
+    # 圧縮で消したトゥームストーンの seq の上限
+    compacted_seq: int
+
+
+async def read_state(db: AsyncSession) -> FeedState:
+    """
+    data_version と change_log の位置を、同じスナップショットから1回のSELECTで読む。
+    索引を作る読み込みと同じトランザクションで呼べば、索引がどこまでの変更を含むかが分かる。
+    """
+    row = (
+        await db.execute(
+            select(
+                select(data_version_table.c.version)
+                .where(data_version_table.c.id == 1)
+                .scalar_subquery(),
+                select(func.max(change_log_table.c.seq)).scalar_subquery(),
+                select(change_log_state_table.c.compacted_seq)
+                .where(change_log_state_table.c.id == 1)
+                .scalar_subquery(),
+            )
+        )
+    ).one()
+    return FeedState(*(value or 0 for value in row))
+
+
+async def read_data_version(db: AsyncSession) -> int:
+    version = await db.scalar(
+        select(data_version_table.c.version).where(data_version_table.c.id == 1)
+    )
+    return version or 0
+
+
+async def read_changes(
+    db: AsyncSession, after: int, state: FeedState, entities: Iterable[str]
+) -> list | None:
+    """
+    seq が after より後で state.seq 以下の、entities の変更を seq の順に返す。
+
+    Returns:
+        list | None: change_log の行。after 以降のトゥームストーンが圧縮で消えている場合や、
+            変更が CATCH_UP_MAX_ROWS 件を超える場合は、作り直すべきなので None。
+    """
+    if after < state.compacted_seq:
+        return None
+    rows = (
+        await db.execute(
+            select(
+                change_log_table.c.seq,
+                change_log_table.c.entity,
+                change_log_table.c.todo_id,
+                change_log_table.c.tag_id,
+                change_log_table.c.deleted,
+            )
+            .where(
+                change_log_table.c.seq > after,
+                change_log_table.c.seq <= state.seq,
+                change_log_table.c.entity.in_(list(entities)),
+            )
+            .order_by(change_log_table.c.seq)
+            .limit(CATCH_UP_MAX_ROWS + 1)
+        )
+    ).all()
+    if len(rows) > CATCH_UP_MAX_ROWS:
+        return None
+    return rows
@@ -1,19 +1,128 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.settings import DATABASE_URL
+from app import metrics, settings
+from app.group_commit import GroupCommitter
+from app.settings import ASYNC_DATABASE_URL, DATABASE_URL
 
-from typing import Generator
+from typing import AsyncGenerator
 
 
+# 同期エンジンはAlembicとシーダーなどのスクリプト用に残す
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+SQLITE_WAL_PROFILE = "sqlite-wal"
+READ_METHODS = ("GET", "HEAD")
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
+
+def _sqlite_pragmas(read_only: bool) -> list[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}",
+        "PRAGMA foreign_keys = ON",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # journal_modeはデータベースファイルに永続化されるのでライター側だけで設定する
+        pragmas.insert(0, "PRAGMA journal_mode = WAL")
+    return pragmas
+
+
+def _apply_sqlite_profile(async_engine, read_only: bool) -> None:
+    """
+    接続ごとにPRAGMAを設定する。
+    ライターは BEGIN IMMEDIATE で最初から書き込みロックを取り、
+    読み取りトランザクションからの昇格で "database is locked" になるのを防ぐ。
+    """
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # pysqlite/aiosqliteの暗黙のBEGINを止め、下のbeginイベントで発行する
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(async_engine.sync_engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+
+if settings.DB_PROFILE == SQLITE_WAL_PROFILE:
+    # 書き込みは1接続に直列化し、読み取りは専用プールで並行させる
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=30,
+        poolclass=metrics.timed_pool_class("write"),
+    )
+    read_async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        poolclass=metrics.timed_pool_class("read"),
+    )
+    _apply_sqlite_profile(async_engine, read_only=False)
+    _apply_sqlite_profile(read_async_engine, read_only=True)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=metrics.timed_pool_class("default")
+    )
+    read_async_engine = async_engine
+
+# SQLの数と時間をリクエストごとに集計する (同じエンジンに二重に登録しない)
+for _engine in {async_engine.sync_engine, read_async_engine.sync_engine}:
+    metrics.instrument_engine(_engine)
+
+# commit後に属性を失効させると、以降のアクセスで暗黙のIOが発生してしまうため無効にする
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+ReadAsyncSessionLocal = async_sessionmaker(
+    bind=read_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    GET/HEADは読み取り専用プール、それ以外は単一ライターのセッションを渡す。
+    """
+    if request.method in READ_METHODS:
+        session_factory = ReadAsyncSessionLocal
+    else:
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as db:
+        yield db
+
+
+group_committer = GroupCommitter(
+    AsyncSessionLocal,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+    window=settings.GROUP_COMMIT_WINDOW_MS / 1000,
+)
+
+
+async def get_write_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    commitが1回だけの単発の書き込み用のセッションを渡す。
+    GROUP_COMMIT が有効なら、同時に来た書き込みと1つのトランザクションにまとめてcommitする。
+    一括操作やインポートのように何度もcommitする処理には get_db を使う。
+    """
+    if not settings.GROUP_COMMIT:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    async with group_committer.session() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,165 @@
+import asyncio
+import collections
+import json
+import os
+import time
+from datetime import date, datetime
+
+from app import metrics, settings
+
+# サーバーを再起動すると通し番号は1からやり直しになるので、
+# イベントIDにプロセスごとの値を付け、前のプロセスのIDでの再開を見分ける
+_EPOCH = f"{int(time.time()):x}{os.getpid():x}"
+
+# EventSourceが切断後に再接続するまでの待ち時間 (ミリ秒)
+RETRY_FRAME = b"retry: 3000\n\n"
+KEEPALIVE_FRAME = b": keepalive\n\n"
+# 取りこぼしがあったので、全体を読み直してほしいことを伝えるイベント
+RESET = "reset"
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _frame(event_id: int, type: str, data: dict) -> bytes:
+    payload = json.dumps(
+        data, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    )
+    return f"id: {_EPOCH}-{event_id}\nevent: {type}\ndata: {payload}\n\n".encode()
+
+
+class Subscriber:
+    """
+    1接続ぶんの受信キュー。
+
+    待っていない間はフューチャーもタスクも持たないので、
+    何もしていない接続が数千あっても、1つあたり小さなオブジェクト1つで済む。
+    """
+
+    __slots__ = ("frames", "max_frames", "overflowed", "_waiter")
+
+    def __init__(self, max_frames: int):
+        self.frames: collections.deque[bytes] = collections.deque()
+        self.max_frames = max_frames
+        self.overflowed = False
+        self._waiter: asyncio.Future | None = None
+
+    def push(self, frame: bytes) -> None:
+        if self.overflowed:
+            return
+        if len(self.frames) >= self.max_frames:
+            # 送信が追いつかない接続のためにイベントをため込まない。
+            # たまった分は捨て、次に読み出したときに reset を送って読み直させる
+            self.frames.clear()
+            self.overflowed = True
+            metrics.EVENT_OVERFLOWS.inc()
+        else:
+            self.frames.append(frame)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def wait(self, timeout: float) -> None:
+        """
+        イベントが届くか、timeout 秒たつまで待つ。
+        """
+        if self.frames or self.overflowed:
+            return
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiter = None
+
+    def drain(self) -> list[bytes]:
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+
+class EventBus:
+    """
+    書き込み (crud) が発行した変更イベントを、接続中のクライアントに配る。
+
+    イベントはSSEの1フレームに一度だけエンコードし、同じバイト列を全購読者のキューに入れる。
+    発行側は購読者を待たない (キューが一杯の購読者は reset に切り替える) ので、
+    遅いクライアントが書き込みを遅らせることはない。
+    イベントループのスレッドから呼ぶこと。
+
+    プロセス内のバスなので、ワーカーが複数の場合は同じワーカーで起きた変更だけが届く。
+    """
+
+    def __init__(self, queue_size: int, history_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.last_id = 0
+        self._history: collections.deque[tuple[int, bytes]] = collections.deque(
+            maxlen=history_size
+        )
+        self._subscribers: set[Subscriber] = set()
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def publish(self, type: str, data: dict) -> None:
+        """
+        変更イベントを発行する。data は変更された項目だけの小さな辞書にする。
+
+        Args:
+            type (str): "todo.updated" のような "<対象>.<操作>"。
+            data (dict): JSONにできる値 (日付・日時は ISO 8601 になる)。
+        """
+        self.last_id += 1
+        frame = _frame(self.last_id, type, data)
+        self._history.append((self.last_id, frame))
+        metrics.EVENTS_PUBLISHED.inc(type)
+        for subscriber in self._subscribers:
+            subscriber.push(frame)
+
+    def subscribe(self, last_event_id: str | None = None) -> Subscriber:
+        """
+        購読を始める。last_event_id (EventSourceが再接続時に送るLast-Event-ID) が
+        あれば、それより後のイベントを再送する。覚えている範囲より古ければ reset にする。
+        """
+        subscriber = Subscriber(self.queue_size)
+        if last_event_id:
+            self._replay(subscriber, last_event_id)
+        self._subscribers.add(subscriber)
+        metrics.EVENT_SUBSCRIBERS.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.discard(subscriber)
+            metrics.EVENT_SUBSCRIBERS.dec()
+
+    def _replay(self, subscriber: Subscriber, last_event_id: str) -> None:
+        epoch, _, sequence = last_event_id.rpartition("-")
+        if epoch != _EPOCH or not sequence.isdigit():
+            subscriber.overflowed = True
+            return
+        after = int(sequence)
+        if after >= self.last_id:
+            return
+        if not self._history or self._history[0][0] > after + 1:
+            subscriber.overflowed = True
+            return
+        for event_id, frame in self._history:
+            if event_id > after:
+                subscriber.push(frame)
+
+    def reset_frame(self) -> bytes:
+        # 読み直した後は、このIDより後のイベントを受け取ればよい
+        return _frame(self.last_id, RESET, {})
+
+
+event_bus = EventBus(
+    settings.EVENTS_QUEUE_SIZE,
+    settings.EVENTS_HISTORY_SIZE,
+    settings.EVENTS_MAX_SUBSCRIBERS,
+)
@@ -0,0 +1,221 @@
+"""
+単発の書き込み (作成・更新・削除・タグの付け外し) を1つのトランザクションにまとめてcommitする。
+
+同時に来た書き込みのリクエストは順番待ちの列に並び、1つずつ番を受け取る。
+番が来たリクエストは、バッチの共有トランザクションの中の SAVEPOINT で crud の処理を実行する。
+crud の db.commit() は SAVEPOINT を解放して次のリクエストに番を渡し、
+バッチ全体の COMMIT を待ってから戻る。そのため commit の後のキャッシュの無効化や
+イベントの発行は、従来どおり実際にcommitされた後に行われる。
+
+SQLiteではcommitのたびにfsyncするので、N件の書き込みがfsync1回で済む。
+一意制約違反などで失敗したリクエストは自分の SAVEPOINT まで戻すだけなので、
+同じバッチの他のリクエストには影響しない。
+"""
+
+import asyncio
+import collections
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncSessionTransaction
+
+from app import metrics
+
+
+class _Batch:
+    __slots__ = ("session", "committed", "deadline", "size")
+
+    def __init__(self, session: AsyncSession, committed: asyncio.Future, deadline):
+        self.session = session
+        self.committed = committed
+        self.deadline = deadline
+        self.size = 0
+
+
+class BatchSession:
+    """
+    バッチの中の1リクエスト分のセッション。AsyncSession の代わりに crud に渡す。
+
+    commit / rollback 以外は共有の AsyncSession にそのまま委ねる。
+    commit で番を渡した後は、次のリクエストが同じ接続を使っているので操作できない。
+    """
+
+    __slots__ = ("_committer", "_batch", "_savepoint", "_released")
+
+    def __init__(
+        self,
+        committer: "GroupCommitter",
+        batch: _Batch,
+        savepoint: AsyncSessionTransaction,
+    ):
+        self._committer = committer
+        self._batch = batch
+        self._savepoint = savepoint
+        self._released = False
+
+    def __getattr__(self, name: str):
+        if self._released:
+            raise RuntimeError("commit した後のセッションは使えません。")
+        return getattr(self._batch.session, name)
+
+    async def commit(self) -> None:
+        """
+        SAVEPOINT を解放して次のリクエストに番を渡し、バッチのCOMMITを待つ。
+        """
+        if self._released:
+            raise RuntimeError(
+                "グループコミットでは1リクエストに1回だけ commit できます。"
+            )
+        await self._savepoint.commit()
+        self._released = True
+        await self._committer._release()
+        # 待っているリクエストがキャンセルされても、共有のフューチャーはキャンセルしない
+        await asyncio.shield(self._batch.committed)
+
+    async def rollback(self) -> None:
+        """
+        このリクエストの変更だけを取り消す。番は渡さないので、続けて読み書きできる。
+        """
+        await self._savepoint.rollback()
+        self._savepoint = await self._batch.session.begin_nested()
+
+    async def _finish(self) -> None:
+        # commit せずに終わった (エラー・404など) リクエストの変更は取り消す
+        if self._released:
+            return
+        self._released = True
+        try:
+            await self._savepoint.rollback()
+        finally:
+            await self._committer._release()
+
+
+class GroupCommitter:
+    """
+    書き込みのリクエストに順番に SAVEPOINT を渡し、まとめてcommitする。
+
+    番は終わったリクエストから待っている次のリクエストへ直接渡す。
+    待っているリクエストがなくなったら、バッチの開始から window 秒たつまで後続を待ち、
+    来なければ (または max_batch 件になったら) 最後のリクエストがcommitする。
+    window が0なら待たずに、その時点で並んでいる分だけをまとめる。
+    """
+
+    def __init__(self, session_factory, max_batch: int, window: float):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.window = window
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+        self._arrival: asyncio.Future | None = None
+        self._batch: _Batch | None = None
+        # いずれかのリクエストが番を持っている (またはcommit中)
+        self._busy = False
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[BatchSession]:
+        """
+        自分の番が来るまで待ち、バッチの中のセッションを渡す。
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # TestClient などでイベントループが替わった
+            self._loop = loop
+            self._waiters.clear()
+            self._batch = None
+            self._busy = False
+
+        if self._busy:
+            turn = loop.create_future()
+            self._waiters.append(turn)
+            if self._arrival is not None and not self._arrival.done():
+                self._arrival.set_result(None)
+            try:
+                await turn
+            except asyncio.CancelledError:
+                # 番を受け取った直後にキャンセルされた場合は、次に渡す
+                if not turn.cancelled():
+                    await self._release()
+                raise
+        else:
+            self._busy = True
+
+        try:
+            db = await self._begin()
+        except BaseException:
+            await self._release()
+            raise
+        try:
+            yield db
+        finally:
+            await db._finish()
+
+    async def _begin(self) -> BatchSession:
+        if self._batch is None:
+            loop = asyncio.get_running_loop()
+            self._batch = _Batch(
+                self.session_factory(), loop.create_future(), loop.time() + self.window
+            )
+        batch = self._batch
+        savepoint = await batch.session.begin_nested()
+        batch.size += 1
+        return BatchSession(self, batch, savepoint)
+
+    def _pass_turn(self) -> bool:
+        while self._waiters:
+            turn = self._waiters.popleft()
+            # 待っている間にキャンセルされたリクエストは飛ばす
+            if not turn.done():
+                turn.set_result(None)
+                return True
+        return False
+
+    async def _release(self) -> None:
+        """
+        番を持っているリクエストが、SAVEPOINT を解放または取り消した後に呼ぶ。
+        """
+        batch = self._batch
+        if (batch is None or batch.size < self.max_batch) and self._pass_turn():
+            return
+        # 呼び出したリクエストがキャンセルされても、バッチは最後まで閉じる
+        await asyncio.shield(self._close_batch())
+
+    async def _close_batch(self) -> None:
+        batch = self._batch
+        if batch is not None and batch.size < self.max_batch:
+            await self._wait_for_arrival(batch.deadline)
+            if self._pass_turn():
+                return
+
+        self._batch = None
+        try:
+            if batch is not None:
+                await self._commit(batch)
+        finally:
+            if not self._pass_turn():
+                self._busy = False
+
+    async def _wait_for_arrival(self, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            return
+        self._arrival = loop.create_future()
+        try:
+            await asyncio.wait_for(self._arrival, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._arrival = None
+
+    async def _commit(self, batch: _Batch) -> None:
+        try:
+            await batch.session.commit()
+        except Exception as e:
+            batch.committed.set_exception(e)
+            # commit を待っているリクエストがなくても警告を出さない
+            batch.committed.exception()
+        else:
+            batch.committed.set_result(None)
+        finally:
+            await batch.session.close()
+        metrics.GROUP_COMMIT_BATCH_SIZE.observe(batch.size)
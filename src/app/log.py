@@ -0,0 +1,238 @@
+import atexit
+import json
+import logging
+import random
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging import config
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
+
+from app import metrics
+
+# リクエストの外 (起動時やスクリプト) では None
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+# 受け取ったリクエストIDをそのまま使う長さの上限 (それより長ければ振り直す)
+REQUEST_ID_MAX_LENGTH = 128
+
+# LogRecordが最初から持つ属性。これ以外は extra= で渡された値として出力する
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "request_id",
+    # uvicornがアクセスログに付ける色付きのメッセージ
+    "color_message",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    1レコードを1行のJSONにする。extra= で渡した値もキーとして出力する。
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    実行中のリクエストのIDをレコードに付ける。
+    ContextVarはリクエストを処理しているスレッドでしか読めないので、キューに入れる前に付ける。
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class _Rule:
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float | None = None):
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        # 1秒分までためられるトークンバケット
+        self.tokens = rate_limit or 0.0
+        self.updated_at = time.monotonic()
+
+    def allow(self) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate_limit is None:
+            return True
+        now = time.monotonic()
+        self.tokens = min(
+            self.rate_limit, self.tokens + (now - self.updated_at) * self.rate_limit
+        )
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    ロガー名ごとにレコードを間引く。
+
+    rules はロガー名 (その子孫も含む) → {"sample_rate": 残す割合, "rate_limit": 1秒あたりの上限}。
+    一番長く一致した名前の規則を使う。WARNING以上は間引かない。
+
+        "filters": {
+            "sampling": {
+                "()": "app.log.SamplingFilter",
+                "rules": {"sqlalchemy.engine": {"sample_rate": 0.01, "rate_limit": 50}}
+            }
+        }
+    """
+
+    def __init__(self, rules: dict[str, dict] | None = None):
+        super().__init__()
+        self._rules = {name: _Rule(**rule) for name, rule in (rules or {}).items()}
+        # ロガー名 → 規則 (なければ None) の対応を覚えておく
+        self._rule_of: dict[str, _Rule | None] = {}
+        self._lock = Lock()
+
+    def _find(self, name: str) -> "_Rule | None":
+        rule = self._rule_of.get(name, False)
+        if rule is False:
+            candidates = [
+                key for key in self._rules if name == key or name.startswith(key + ".")
+            ]
+            rule = self._rules[max(candidates, key=len)] if candidates else None
+            self._rule_of[name] = rule
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rule = self._find(record.name)
+        if rule is None:
+            return True
+        with self._lock:
+            allowed = rule.allow()
+        if not allowed:
+            metrics.LOG_RECORDS_DROPPED.inc(record.name)
+        return allowed
+
+
+class _EnqueueHandler(QueueHandler):
+    """
+    レコードをそのままキューに入れる。
+
+    標準の QueueHandler.prepare はここでメッセージを組み立てる (書式化する) が、
+    同じプロセス内のキューなのでその必要はなく、書式化もリスナーのスレッドに任せる。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listeners: list[QueueListener] = []
+
+
+def _enqueue_handlers() -> None:
+    """
+    設定したハンドラーをそれぞれキューの後ろに移し、専用のスレッドで書式化と出力をする。
+    ハンドラーのフィルター (リクエストID・間引き) はリクエスト側のスレッドで先に通す。
+    """
+    loggers = [logging.getLogger()] + [
+        logger
+        for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    replacements: dict[logging.Handler, QueueHandler] = {}
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                continue
+            if handler not in replacements:
+                queue = SimpleQueue()
+                front = _EnqueueHandler(queue)
+                front.setLevel(handler.level)
+                for handler_filter in handler.filters:
+                    front.addFilter(handler_filter)
+                handler.filters = []
+                listener = QueueListener(queue, handler, respect_handler_level=True)
+                listener.start()
+                _listeners.append(listener)
+                replacements[handler] = front
+            logger.removeHandler(handler)
+            logger.addHandler(replacements[handler])
+
+
+def _stop_listeners() -> None:
+    # キューに残ったレコードを出力してから終わる
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure(path: str) -> None:
+    """
+    JSONのログ設定 (logging.config.dictConfig の形式) を読み込み、
+    出力をキュー経由にする。
+    """
+    _stop_listeners()
+    with open(path, encoding="utf-8") as f:
+        config.dictConfig(json.load(f))
+    _enqueue_handlers()
+
+
+atexit.register(_stop_listeners)
+
+
+class RequestIdMiddleware:
+    """
+    リクエストごとにIDを決めてログに付け、X-Request-ID ヘッダーで返す。
+    クライアントやプロキシが X-Request-ID を付けてきた場合はそれを引き継ぐ。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"")
+        try:
+            value = value.decode("ascii")
+        except UnicodeDecodeError:
+            value = ""
+        if not value or len(value) > REQUEST_ID_MAX_LENGTH:
+            value = uuid.uuid4().hex
+        token = request_id.set(value)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, value.encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
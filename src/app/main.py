@@ -1,11 +1,9 @@
-import json
-from logging import config
+from contextlib import asynccontextmanager
 # import os
 from pathlib import Path
 
 from fastapi import FastAPI
 
-from fastapi.staticfiles import StaticFiles
 # from fastapi import Request
 # from fastapi.templating import Jinja2Templates
 # from fastapi.responses import HTMLResponse
@@ -13,18 +11,33 @@ from fastapi.staticfiles import StaticFiles
 from fastapi_route_logger_middleware import RouteLoggerMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
-from app import settings
+from app import database, log, settings
+from app.assets import PrecompressedStaticFiles
+from app.metrics import MetricsMiddleware
 from app.router import api_router
-from api import frontend
+from app.tag_index import tag_index
+from app.tag_names import tag_names
+from api import frontend, metrics
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # タグ索引は最初のリクエストより前に構築しておく
+    async with database.ReadAsyncSessionLocal() as db:
+        await tag_index.rebuild(db)
+        await tag_names.rebuild(db)
+    yield
+
+
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_VER_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_VER_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
-with open(settings.LOGGING_CONF, encoding="utf-8") as f:
-    config.dictConfig(json.load(f))
+log.configure(settings.LOGGING_CONF)
 
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -33,10 +46,18 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "X-Request-ID"],
     )
 
-app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+# 最後に追加したものが一番外側になるので、CORSなども含めた時間を計測する
+app.add_middleware(MetricsMiddleware)
+# メトリクスが出すログにもリクエストIDが付くよう、さらに外側に置く
+app.add_middleware(log.RequestIdMiddleware)
+
+app.mount("/static", PrecompressedStaticFiles(directory=BASE_DIR / "static"), name="static")
 
 app.include_router(frontend.router)
 
+app.include_router(metrics.router)
+
 app.include_router(api_router, prefix=settings.API_VER_STR)
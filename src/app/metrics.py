@@ -0,0 +1,371 @@
+import collections
+import logging
+import re
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import settings
+
+logger = logging.getLogger(__name__)
+
+# 秒単位のバケット (Prometheusのクライアントライブラリの既定値に近いもの)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# N+1判定のために文を正規化する (IN (?, ?, ...) の個数と空白の違いを無視する)
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(statement: str) -> str:
+    return _SPACES.sub(" ", _IN_LIST.sub("(?)", statement)).strip()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """
+    ラベルごとの累積カウンター。
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_format(value)}"
+
+
+class Gauge(Counter):
+    """
+    ラベルごとの、増えも減りもする値。
+    """
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """
+    ラベルごとのヒストグラム。バケットは上限値の昇順で、+Inf は自動で足す。
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels → (バケットごとの件数, 合計, 件数)
+        self._values: dict[tuple[str, ...], list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {
+                labels: (list(counts), total, count)
+                for labels, (counts, total, count) in self._values.items()
+            }
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                label_text = _labels(self.labels, labels, le=_format(bound))
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_format(total)}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    ("method", "route"),
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total",
+    "SQL statements executed while handling HTTP requests.",
+    ("method", "route"),
+)
+N_PLUS_ONE = Counter(
+    "db_n_plus_one_total",
+    "HTTP requests that repeated the same SQL statement "
+    "N_PLUS_ONE_THRESHOLD times or more.",
+    ("method", "route"),
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check out a connection from the pool.",
+    ("pool",),
+    buckets=POOL_WAIT_BUCKETS,
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped by sampling or rate limits.",
+    ("logger",),
+)
+EVENTS_PUBLISHED = Counter(
+    "events_published_total",
+    "Change events published to the in-process event bus.",
+    ("type",),
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers",
+    "Clients currently connected to the change event stream.",
+)
+EVENT_OVERFLOWS = Counter(
+    "event_subscriber_overflows_total",
+    "Times a subscriber fell behind, had its queue dropped and was told to resync.",
+)
+GROUP_COMMIT_BATCH_SIZE = Histogram(
+    "db_group_commit_batch_size",
+    "Write requests committed together in one group-commit transaction.",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+METRICS = (
+    REQUEST_DURATION,
+    REQUEST_DB_DURATION,
+    DB_STATEMENTS,
+    N_PLUS_ONE,
+    POOL_CHECKOUT_WAIT,
+    LOG_RECORDS_DROPPED,
+    EVENTS_PUBLISHED,
+    EVENT_SUBSCRIBERS,
+    EVENT_OVERFLOWS,
+    GROUP_COMMIT_BATCH_SIZE,
+)
+
+
+def render() -> str:
+    """
+    全メトリクスをPrometheusのテキスト形式 (version 0.0.4) にする。
+    """
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestStats:
+    """
+    1リクエストの間に実行したSQLの集計。
+    """
+
+    statements: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    by_statement: collections.Counter = field(default_factory=collections.Counter)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.by_statement.most_common()
+            if count >= threshold
+        ]
+
+
+# リクエストの外 (起動時の索引構築やスクリプト) では None で、集計しない
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+def timed_pool_class(name: str) -> type:
+    """
+    接続の取り出しにかかった時間を計測するプールのクラスを返す。
+    空きがなく待たされた時間と、新しい接続を作る時間を含む。
+    dispose() でプールが作り直されても計測が続くよう、インスタンスではなくクラスで持つ。
+    """
+
+    class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                elapsed = time.perf_counter() - started
+                POOL_CHECKOUT_WAIT.observe(elapsed, name)
+                stats = current_request.get()
+                if stats is not None:
+                    stats.pool_wait_seconds += elapsed
+
+    return TimedAsyncAdaptedQueuePool
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    実行したSQLの数と時間を、実行中のリクエストの RequestStats に足す。
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started = conn.info["metrics_started"].pop()
+        stats = current_request.get()
+        if stats is None:
+            return
+        stats.statements += 1
+        stats.db_seconds += time.perf_counter() - started
+        stats.by_statement[_normalize(statement)] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # 失敗した文は after_cursor_execute が呼ばれないので、開始時刻だけ捨てる
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+
+
+def _route_of(scope) -> str:
+    """
+    パスそのものではなくルートのテンプレート (/v1/todo/{todo_id}) でまとめる。
+    include_router したルートの path は接頭辞を含まないことがあるので、
+    実際のパスからパラメーターを埋めた部分を除いた残りを接頭辞として付ける。
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "other"
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route.path
+    path = scope["path"]
+    if not path.endswith(rendered):
+        return route.path
+    return path[: len(path) - len(rendered)] + route.path
+
+
+def _server_timing(stats: RequestStats, total_seconds: float) -> bytes:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} statements", '
+        f"pool;dur={stats.pool_wait_seconds * 1000:.2f}, "
+        f"app;dur={total_seconds * 1000:.2f}"
+    ).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    リクエストごとのレイテンシ・SQLの数と時間・プールの待ち時間を集計し、
+    Server-Timing ヘッダーで返す。同じSQLを繰り返すリクエスト (N+1) は警告する。
+
+    ヘッダーはレスポンスの開始時点の値なので、本文を流しながら読む
+    ストリーミングのレスポンスでは、それまでに実行した分だけになる。
+    全体はメトリクス (/metrics) のほうに記録する。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        _server_timing(stats, time.perf_counter() - started),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            self._record(scope, stats, status, time.perf_counter() - started)
+
+    @staticmethod
+    def _record(scope, stats: RequestStats, status: int, seconds: float) -> None:
+        method, route = scope["method"], _route_of(scope)
+        REQUEST_DURATION.observe(seconds, method, route, str(status))
+        REQUEST_DB_DURATION.observe(stats.db_seconds, method, route)
+        DB_STATEMENTS.inc(method, route, amount=stats.statements)
+
+        repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            N_PLUS_ONE.inc(method, route)
+            for statement, count in repeated:
+                logger.warning(
+                    "Possible N+1: %s %s ran the same statement %d times: %s",
+                    method,
+                    route,
+                    count,
+                    statement,
+                )
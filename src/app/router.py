@@ -2,8 +2,16 @@ from fastapi import APIRouter
 
 from api import todo
 from api import tag
+from api import cache
+from api import stats
+from api import importer
+from api import events
 
 api_router = APIRouter()
 
 api_router.include_router(todo.router, prefix="/todo", tags=["todo"])
-api_router.include_router(tag.router, prefix="/tag", tags=["tag"])
\ No newline at end of file
+api_router.include_router(tag.router, prefix="/tag", tags=["tag"])
+api_router.include_router(cache.router, prefix="/cache", tags=["cache"])
+api_router.include_router(stats.router, prefix="/stats", tags=["stats"])
+api_router.include_router(importer.router, prefix="/import", tags=["import"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
@@ -0,0 +1,178 @@
+"""
+ToDo・タグのレスポンスをJSONのバイト列にする。
+
+FAST_JSON が無効なら、DBから読んだレコードを TodoSchema / TagSchema で検証してからJSONにする。
+有効なら、DBから読んだ値は検証済みとみなして属性をそのまま辞書に詰め、
+orjson (なければ事前に作った TypeAdapter) で直接バイト列にする。
+どちらでも出力は同じになる。
+"""
+
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, List, Optional
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+
+from app import settings
+from schemas.schema import TagSchema, TodoSchema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pydanticと同じく、UTCのdatetimeは +00:00 ではなく Z で出力する
+ORJSON_OPTIONS = orjson.OPT_UTC_Z if orjson is not None else 0
+
+
+# キーの順序はスキーマ (schemas/schema.py) のフィールドの順序に合わせる
+class TagForTodoDict(TypedDict):
+    name: str
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class TodoDict(TypedDict):
+    content: str
+    deadline: Optional[date]
+    id: int
+    completed: bool
+    created_at: datetime
+    updated_at: datetime
+    tags: List[TagForTodoDict]
+
+
+class TodoForTagDict(TypedDict):
+    content: str
+    deadline: Optional[date]
+    id: int
+    completed: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+class TagDict(TypedDict):
+    name: str
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    todos: List[TodoForTagDict]
+
+
+# 検証してからJSONにする (FAST_JSON が無効なとき)
+_todo_adapter = TypeAdapter(TodoSchema)
+_todo_list_adapter = TypeAdapter(list[TodoSchema])
+_tag_adapter = TypeAdapter(TagSchema)
+_tag_list_adapter = TypeAdapter(list[TagSchema])
+
+# 検証せずにJSONにする (orjson がないとき)
+_todo_dict_adapter = TypeAdapter(TodoDict)
+_todo_dict_list_adapter = TypeAdapter(list[TodoDict])
+_tag_dict_adapter = TypeAdapter(TagDict)
+_tag_dict_list_adapter = TypeAdapter(list[TagDict])
+
+
+def _deadline(value: datetime | date | None) -> date | None:
+    # deadline列はDateTimeだが、スキーマ上は日付
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _tag_for_todo(tag) -> TagForTodoDict:
+    return {
+        "name": tag.name,
+        "id": tag.id,
+        "created_at": tag.created_at,
+        "updated_at": tag.updated_at,
+    }
+
+
+def _todo_for_tag(todo) -> TodoForTagDict:
+    return {
+        "content": todo.content,
+        "deadline": _deadline(todo.deadline),
+        "id": todo.id,
+        "completed": todo.completed,
+        "created_at": todo.created_at,
+        "updated_at": todo.updated_at,
+    }
+
+
+def todo_dict(todo) -> TodoDict:
+    """
+    ToDo (TodoRecord、またはタグを読み込み済みの TodoModel) を
+    TodoSchema と同じ形の辞書にする。
+    """
+    return {
+        **_todo_for_tag(todo),
+        "tags": [_tag_for_todo(tag) for tag in todo.tags],
+    }
+
+
+def tag_dict(tag) -> TagDict:
+    """
+    タグ (TagRecord、またはToDoを読み込み済みの Tag) を
+    TagSchema と同じ形の辞書にする。
+    """
+    return {
+        **_tag_for_todo(tag),
+        "todos": [_todo_for_tag(todo) for todo in tag.todos],
+    }
+
+
+def _dump(value: Any, adapter: TypeAdapter) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=ORJSON_OPTIONS)
+    return adapter.dump_json(value)
+
+
+def dump_todo(todo) -> bytes:
+    if settings.FAST_JSON:
+        return _dump(todo_dict(todo), _todo_dict_adapter)
+    return _todo_adapter.dump_json(
+        _todo_adapter.validate_python(todo, from_attributes=True)
+    )
+
+
+def dump_todos(todos: Iterable) -> bytes:
+    if settings.FAST_JSON:
+        return _dump([todo_dict(todo) for todo in todos], _todo_dict_list_adapter)
+    return _todo_list_adapter.dump_json(
+        _todo_list_adapter.validate_python(todos, from_attributes=True)
+    )
+
+
+def dump_tag(tag) -> bytes:
+    if settings.FAST_JSON:
+        return _dump(tag_dict(tag), _tag_dict_adapter)
+    return _tag_adapter.dump_json(
+        _tag_adapter.validate_python(tag, from_attributes=True)
+    )
+
+
+def dump_tags(tags: Iterable) -> bytes:
+    if settings.FAST_JSON:
+        return _dump([tag_dict(tag) for tag in tags], _tag_dict_list_adapter)
+    return _tag_list_adapter.dump_json(
+        _tag_list_adapter.validate_python(tags, from_attributes=True)
+    )
+
+
+def dump_model(model: BaseModel) -> bytes:
+    """
+    crudで組み立て済みのスキーマ (検証済み) をそのままJSONにする。
+    """
+    return model.__pydantic_serializer__.to_json(model)
+
+
+def respond(value: Any, dump: Callable[[Any], bytes]) -> Any:
+    """
+    FAST_JSON が有効なら dump でJSONにしたレスポンスを返す。
+    Responseを返すと FastAPI は response_model での検証と変換をしない
+    (response_model はOpenAPIのスキーマにだけ使われる)。
+    無効なら value をそのまま返し、従来どおり response_model で変換させる。
+    """
+    if not settings.FAST_JSON:
+        return value
+    return Response(content=dump(value), media_type="application/json")
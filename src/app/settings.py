@@ -10,9 +10,76 @@ load_dotenv(dotenv_path)
 
 PROJECT_NAME = os.environ.get("PROJECT_NAME") or ""
 
-# DATABASE_URL = os.environ.get("DATABASE_URL") or ""
-DATABASE_URL = "sqlite:///./todo.db"
+DATABASE_URL = os.environ.get("DATABASE_URL") or "sqlite:///./todo.db"
+
+# 同期ドライバーごとの非同期ドライバー
+# FTS5やトリガー、PRAGMAなどSQLite固有の機能を使っているので、SQLite以外には対応しない
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "sqlite+aiosqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    同期ドライバーのURLを、アプリケーション本体が使う非同期ドライバーのURLに変える。
+    """
+    driver, separator, rest = url.partition("://")
+    if not separator or driver not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"DATABASE_URL のドライバー {driver!r} には対応していません。"
+            " sqlite:///<データベースファイル名> の形で指定してください。"
+        )
+    return f"{ASYNC_DRIVERS[driver]}://{rest}"
+
+
+# アプリケーション本体はaiosqliteドライバーで非同期に接続する
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+# "default": 従来どおりの単一エンジン
+# "sqlite-wal": WAL + PRAGMA設定、読み取り専用プールと単一ライターに分離する
+DB_PROFILE = os.environ.get("DB_PROFILE") or "default"
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS") or "NORMAL"
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE") or 268435456)
+# 負の値はKiB単位 (-65536 = 64MiB)
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE") or -65536)
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS") or 5000)
+SQLITE_READ_POOL_SIZE = int(os.environ.get("SQLITE_READ_POOL_SIZE") or 8)
 
 API_VER_STR = os.environ.get("API_VER_STR") or ""
 BACKEND_CORS_ORIGINS = os.environ.get("BACKEND_CORS_ORIGINS") or ""
 LOGGING_CONF = os.environ.get("LOGGING_CONF") or ""
+
+# 読み取りキャッシュ (どちらかを0にすると無効)
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("READ_CACHE_MAX_ENTRIES") or 10000)
+READ_CACHE_TTL_SECONDS = float(os.environ.get("READ_CACHE_TTL_SECONDS") or 30)
+
+# 1リクエストで同じSQLをこの回数以上実行したらN+1として警告する
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD") or 10)
+
+# 有効にすると、ToDo・タグのレスポンスをDBの値の再検証なしにorjsonでJSONにする
+FAST_JSON = (os.environ.get("FAST_JSON") or "false").lower() in ("1", "true", "yes")
+
+# 変更イベントの配信 (/v1/events)
+# 購読者ごとにためておけるイベント数。超えたら捨てて、クライアントに再取得 (reset) させる
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE") or 256)
+# 再接続時に Last-Event-ID から再送できるよう、直近のイベントをこの件数だけ覚えておく
+EVENTS_HISTORY_SIZE = int(os.environ.get("EVENTS_HISTORY_SIZE") or 1000)
+EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS") or 10000)
+# イベントがなくても接続を保つためにコメント行を送る間隔
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS") or 15)
+
+# 差分同期 (/v1/todo/changes) の削除の記録 (トゥームストーン) を残しておく日数。
+# python -m tool.compact_changes で、これより古いものを消す
+CHANGE_LOG_RETENTION_DAYS = float(os.environ.get("CHANGE_LOG_RETENTION_DAYS") or 30)
+
+# 単発の書き込みを1つのトランザクションにまとめてcommitする (app.group_commit)。既定は無効
+GROUP_COMMIT = os.environ.get("GROUP_COMMIT", "").lower() in ("1", "true", "yes")
+# 待っている書き込みがなくなったとき、バッチの開始からこの時間 (ミリ秒) までは後続を待つ
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get("GROUP_COMMIT_WINDOW_MS") or 2)
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH") or 64)
+
+# タグ名の候補 (/v1/tag/suggest) で、別のワーカーやプロセスの書き込みを確かめる間隔 (秒)。
+# この間はDBを読まずにメモリ上の索引だけで答える (同じプロセスの書き込みはすぐに反映される)
+TAG_SUGGEST_REFRESH_SECONDS = float(os.environ.get("TAG_SUGGEST_REFRESH_SECONDS") or 1)
@@ -0,0 +1,341 @@
+import re
+from itertools import repeat
+from threading import Lock
+from typing import Iterable, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import change_feed
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+
+# 構築中に書き込みがあった場合に読み直す回数の上限
+LOAD_RETRIES = 3
+# タグのToDoの件数が id の上限のこの割合を超えたら、setをビットマップに切り替える。
+# setは1件あたり数十バイト、ビットマップは1idあたり1ビットなので、おおよそここで大きさが逆転する
+DENSE_RATIO = 1 / 512
+
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def _to_bitmap(todo_ids: Iterable[int]) -> int:
+    """
+    idの集合をビットマップにする。
+    整数の |= を繰り返すと毎回全体をコピーするため、bytearray上でビットを立てる。
+    """
+    todo_ids = list(todo_ids)
+    if not todo_ids:
+        return 0
+    buffer = bytearray(max(todo_ids) // 8 + 1)
+    for todo_id in todo_ids:
+        buffer[todo_id >> 3] |= 1 << (todo_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _iter_ids(bitmap: int, descending: bool, offset: int = 0) -> Iterator[int]:
+    """
+    ビットマップの立っているビット位置(=ToDoのid)を順に返す。
+    整数のままビットを1つずつ消すと毎回全体をコピーするため、
+    一度だけバイト列にして0でないバイトを正規表現(C実装)で飛ばし読みする。
+    """
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    if descending:
+        data = data[::-1]
+    last = len(data) - 1
+    for match in _NONZERO_BYTE.finditer(data):
+        position = match.start()
+        byte = data[position]
+        if descending:
+            base = (last - position) * 8 + offset
+            bits = range(7, -1, -1)
+        else:
+            base = position * 8 + offset
+            bits = range(8)
+        for bit in bits:
+            if byte >> bit & 1:
+                yield base + bit
+
+
+class TagBitmapIndex:
+    """
+    タグid → ToDoのidの集合を持ち、タグの条件をビット演算で解決する索引。
+
+    ToDoの少ないタグは set、多いタグは idをビット位置にした整数(ビットマップ)で持つ。
+    すべてのタグをビットマップにすると、ToDoが1件しかないタグでも id の上限/8 バイトを使うため。
+    問い合わせのときは set もビットマップにして AND/OR/NOT を整数のビット演算で行うので、
+    todo_tagsの自己結合や GROUP BY/HAVING なしで複数タグの条件を解決できる。
+    NOT のために存在する全ToDoのビットマップ (universe) も持つ。
+    ToDo → タグの逆引きも持ち、ToDoの削除では そのToDoのタグだけを更新する。
+
+    プロセス内の索引なので、構築時の data_version と change_log の seq を覚えておき、
+    ensure_loaded で data_version が変わっていれば change_log の続きを当てて
+    別のワーカーやプロセスの書き込みに追いつく。
+    """
+
+    def __init__(self):
+        self._postings: dict[int, set[int] | int] = {}
+        # タグid → 紐づくToDoの件数 (タグ名の候補を使われている順に並べるのに使う)
+        self._counts: dict[int, int] = {}
+        # ToDoのid → 紐づくタグのid (ToDoごとに数件なので、setより小さいtupleで持つ)
+        self._tags_by_todo: dict[int, tuple[int, ...]] = {}
+        self._universe = 0
+        self._lock = Lock()
+        self.loaded = False
+        # 変更のたびに進める。構築中に変更があったかの判定に使う
+        self.version = 0
+        # 索引に反映済みの data_version と change_log の seq
+        self.data_version = 0
+        self.seq = 0
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """
+        todo と todo_tags を読み直して索引を作り直す。
+        """
+        for _ in range(LOAD_RETRIES):
+            version = self.version
+            # 索引より先に読むので、この後の変更は索引に入っていても次の追従で当て直すだけになる
+            state = await change_feed.read_state(db)
+            universe = _to_bitmap(await db.scalars(select(TodoModel.id)))
+            members: dict[int, list[int]] = {}
+            tags_by_todo: dict[int, list[int]] = {}
+            rows = await db.execute(
+                select(
+                    todo_tag_association_table.c.tag_id,
+                    todo_tag_association_table.c.todo_id,
+                ).order_by(todo_tag_association_table.c.tag_id)
+            )
+            for tag_id, todo_id in rows:
+                members.setdefault(tag_id, []).append(todo_id)
+                tags_by_todo.setdefault(todo_id, []).append(tag_id)
+            threshold = self._dense_threshold(universe)
+            postings = {
+                tag_id: (
+                    _to_bitmap(todo_ids) if len(todo_ids) > threshold else set(todo_ids)
+                )
+                for tag_id, todo_ids in members.items()
+            }
+            counts = {tag_id: len(todo_ids) for tag_id, todo_ids in members.items()}
+            with self._lock:
+                if version == self.version:
+                    self._postings = postings
+                    self._counts = counts
+                    self._tags_by_todo = {
+                        todo_id: tuple(tag_ids)
+                        for todo_id, tag_ids in tags_by_todo.items()
+                    }
+                    self._universe = universe
+                    self.data_version = state.data_version
+                    self.seq = state.seq
+                    # 構築前の version で覚えた結果を使わせない
+                    self.version += 1
+                    self.loaded = True
+                    return
+        raise RuntimeError("タグ索引の構築中に更新が続いたため構築できませんでした。")
+
+    async def ensure_loaded(
+        self, db: AsyncSession, data_version: int | None = None
+    ) -> None:
+        """
+        索引を作っていなければ作り、data_version が変わっていれば change_log の続きを当てる。
+        change_log が圧縮されていたり変更が多すぎたりする場合は作り直す。
+        data_version は呼び出し側が読んでいれば渡す (複数の索引で1回の読み込みを共有する)。
+        """
+        if not self.loaded:
+            await self.rebuild(db)
+            return
+        if data_version is None:
+            data_version = await change_feed.read_data_version(db)
+        if data_version == self.data_version:
+            return
+
+        version = self.version
+        state = await change_feed.read_state(db)
+        rows = await change_feed.read_changes(
+            db, self.seq, state, ("todo", "tag", "todo_tag")
+        )
+        if rows is None:
+            await self.rebuild(db)
+            return
+        with self._lock:
+            # 読んでいる間に自分のプロセスの変更が入った場合、古い状態で上書きしないよう
+            # 当てずに次回に回す
+            if version != self.version or state.seq < self.seq:
+                return
+            self.version += 1
+            for _, entity, todo_id, tag_id, deleted in rows:
+                if entity == "todo":
+                    if deleted:
+                        self._remove_todos([todo_id])
+                    else:
+                        self._universe |= 1 << todo_id
+                elif entity == "tag":
+                    if deleted:
+                        self._remove_tag(tag_id)
+                elif deleted:
+                    self._remove_link(todo_id, tag_id)
+                else:
+                    self._add_link(todo_id, tag_id)
+            self.data_version = state.data_version
+            self.seq = state.seq
+
+    @staticmethod
+    def _dense_threshold(universe: int) -> int:
+        return int(universe.bit_length() * DENSE_RATIO)
+
+    def _discard(self, tag_id: int, todo_id: int) -> None:
+        # 逆引きは呼び出し側で更新する
+        posting = self._postings.get(tag_id)
+        if isinstance(posting, int):
+            if not posting >> todo_id & 1:
+                return
+            posting &= ~(1 << todo_id)
+        elif posting is not None and todo_id in posting:
+            posting.discard(todo_id)
+        else:
+            return
+
+        count = self._counts[tag_id] - 1
+        if not count:
+            del self._postings[tag_id]
+            del self._counts[tag_id]
+            return
+        # 切り替えの境目で行き来しないよう、半分まで減ってからsetに戻す
+        if (
+            isinstance(posting, int)
+            and count < self._dense_threshold(self._universe) // 2
+        ):
+            posting = set(_iter_ids(posting, False))
+        self._postings[tag_id] = posting
+        self._counts[tag_id] = count
+
+    def add_todos(self, todo_ids: Iterable[int]) -> None:
+        bitmap = _to_bitmap(todo_ids)
+        with self._lock:
+            self.version += 1
+            self._universe |= bitmap
+
+    def remove_todos(self, todo_ids: Iterable[int]) -> None:
+        with self._lock:
+            self.version += 1
+            self._remove_todos(todo_ids)
+
+    def add_link(self, todo_id: int, tag_id: int) -> None:
+        with self._lock:
+            self.version += 1
+            self._add_link(todo_id, tag_id)
+
+    def remove_link(self, todo_id: int, tag_id: int) -> None:
+        with self._lock:
+            self.version += 1
+            self._remove_link(todo_id, tag_id)
+
+    def remove_tag(self, tag_id: int) -> None:
+        with self._lock:
+            self.version += 1
+            self._remove_tag(tag_id)
+
+    # ↓ _lock を取った状態で呼ぶ。同じ変更を2回当てても結果は変わらない
+
+    def _remove_todos(self, todo_ids: Iterable[int]) -> None:
+        todo_ids = list(todo_ids)
+        self._universe &= ~_to_bitmap(todo_ids)
+        for todo_id in todo_ids:
+            for tag_id in self._tags_by_todo.pop(todo_id, ()):
+                self._discard(tag_id, todo_id)
+
+    def _add_link(self, todo_id: int, tag_id: int) -> None:
+        posting = self._postings.get(tag_id)
+        if isinstance(posting, int):
+            if posting >> todo_id & 1:
+                return
+            self._postings[tag_id] = posting | (1 << todo_id)
+        else:
+            if posting is None:
+                posting = self._postings[tag_id] = set()
+            elif todo_id in posting:
+                return
+            posting.add(todo_id)
+            if len(posting) > self._dense_threshold(self._universe):
+                self._postings[tag_id] = _to_bitmap(posting)
+        self._counts[tag_id] = self._counts.get(tag_id, 0) + 1
+        self._tags_by_todo[todo_id] = (*self._tags_by_todo.get(todo_id, ()), tag_id)
+
+    def _remove_link(self, todo_id: int, tag_id: int) -> None:
+        tag_ids = self._tags_by_todo.get(todo_id, ())
+        if tag_id not in tag_ids:
+            return
+        self._set_tags_of(todo_id, tuple(t for t in tag_ids if t != tag_id))
+        self._discard(tag_id, todo_id)
+
+    def _remove_tag(self, tag_id: int) -> None:
+        posting = self._postings.pop(tag_id, None)
+        self._counts.pop(tag_id, None)
+        if isinstance(posting, int):
+            posting = _iter_ids(posting, False)
+        for todo_id in posting or ():
+            tag_ids = self._tags_by_todo.get(todo_id, ())
+            self._set_tags_of(todo_id, tuple(t for t in tag_ids if t != tag_id))
+
+    def _set_tags_of(self, todo_id: int, tag_ids: tuple[int, ...]) -> None:
+        if tag_ids:
+            self._tags_by_todo[todo_id] = tag_ids
+        else:
+            self._tags_by_todo.pop(todo_id, None)
+
+    def _bitmap(self, tag_id: int) -> int:
+        posting = self._postings.get(tag_id, 0)
+        return posting if isinstance(posting, int) else _to_bitmap(posting)
+
+    def counts(self, tag_ids: Iterable[int]) -> list[int]:
+        """
+        タグごとの紐づくToDoの件数を、tag_ids の順に返す。
+        """
+        with self._lock:
+            return list(map(self._counts.get, tag_ids, repeat(0)))
+
+    def query(
+        self,
+        tags_all: Iterable[int] = (),
+        tags_any: Iterable[int] = (),
+        tags_none: Iterable[int] = (),
+    ) -> int:
+        """
+        条件に合うToDoのビットマップを返す。
+
+        Args:
+            tags_all (Iterable[int]): すべてが付いている。
+            tags_any (Iterable[int]): いずれかが付いている。
+            tags_none (Iterable[int]): どれも付いていない。
+        """
+        with self._lock:
+            result = self._universe
+            # 件数の少ないタグから AND すると、途中の結果が小さいまま進む
+            for tag_id in sorted(tags_all, key=lambda t: self._counts.get(t, 0)):
+                result &= self._bitmap(tag_id)
+                if not result:
+                    return 0
+            tags_any = list(tags_any)
+            if tags_any:
+                union = 0
+                for tag_id in tags_any:
+                    union |= self._bitmap(tag_id)
+                result &= union
+            for tag_id in tags_none:
+                result &= ~self._bitmap(tag_id)
+            return result
+
+    @staticmethod
+    def iter_ids(bitmap: int, after: int | None = None, descending: bool = False):
+        """
+        ビットマップのidを昇順(降順)に、after より後ろから返す。
+        """
+        if after is None:
+            return _iter_ids(bitmap, descending)
+        if descending:
+            return _iter_ids(bitmap & ((1 << after) - 1), descending)
+        # 昇順は after 以下のビットを捨てて、その分を offset で足し戻す
+        return _iter_ids(bitmap >> (after + 1), descending, offset=after + 1)
+
+
+tag_index = TagBitmapIndex()
@@ -0,0 +1,215 @@
+import heapq
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import change_feed
+from app.tag_index import TagBitmapIndex
+from models.tag import Tag
+
+# 構築中に書き込みがあった場合に読み直す回数の上限
+LOAD_RETRIES = 3
+
+# 候補がこの件数以上の (短い) 接頭辞は、どちらの索引も変わるまで結果を覚えておく
+MEMO_MIN_MATCHES = 1000
+# 覚えておく接頭辞の数の上限 (超えたら忘れる)
+MEMO_MAX_ENTRIES = 256
+
+# 前方一致の範囲の終わり。どの文字よりも後ろに並ぶ
+_MAX_CHAR = "\U0010ffff"
+
+
+def _key(name: str) -> str:
+    # 大文字・小文字 (全角・半角の英字も) を区別せずに前方一致させる
+    return name.casefold()
+
+
+class TagNameIndex:
+    """
+    タグ名を casefold した文字列の昇順に並べた索引 (タグ名の入力補完用)。
+
+    前方一致する範囲は二分探索で求めるので、タグの数によらずDBを読まずに候補を引ける。
+    名前のリストとidのリストを同じ順に並べて持ち、追加・削除はリストへの挿入・削除で行う。
+
+    TagBitmapIndex と同じく、ensure_loaded で data_version が変わっていれば
+    change_log のタグの変更を当てて、別のワーカーやプロセスの書き込みに追いつく。
+    """
+
+    def __init__(self):
+        self._keys: list[str] = []
+        self._ids: list[int] = []
+        self._names: dict[int, str] = {}
+        # (接頭辞, 件数) → (自分の version, 件数の索引の version, 結果)
+        self._memo: dict[tuple[str, int], tuple[int, int, list]] = {}
+        self._lock = Lock()
+        self.loaded = False
+        # 変更のたびに進める。構築中に変更があったかの判定に使う
+        self.version = 0
+        # 索引に反映済みの data_version と change_log の seq
+        self.data_version = 0
+        self.seq = 0
+        # refresh で最後に data_version を確かめた時刻 (time.monotonic)
+        self.checked_at = 0.0
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """
+        tags を読み直して索引を作り直す。
+        """
+        for _ in range(LOAD_RETRIES):
+            version = self.version
+            state = await change_feed.read_state(db)
+            rows = await db.execute(select(Tag.id, Tag.name))
+            names = dict(tuple(row) for row in rows)
+            entries = sorted((_key(name), tag_id) for tag_id, name in names.items())
+            with self._lock:
+                if version == self.version:
+                    self._keys = [key for key, _ in entries]
+                    self._ids = [tag_id for _, tag_id in entries]
+                    self._names = names
+                    self._memo.clear()
+                    self.data_version = state.data_version
+                    self.seq = state.seq
+                    # 構築前の version で覚えた結果を使わせない
+                    self.version += 1
+                    self.loaded = True
+                    return
+        raise RuntimeError(
+            "タグ名の索引の構築中に更新が続いたため構築できませんでした。"
+        )
+
+    async def ensure_loaded(
+        self, db: AsyncSession, data_version: int | None = None
+    ) -> None:
+        """
+        索引を作っていなければ作り、data_version が変わっていればタグの変更を当てる。
+        change_log には名前がないので、追加・変更されたタグは名前を読み直す。
+        data_version は呼び出し側が読んでいれば渡す (複数の索引で1回の読み込みを共有する)。
+        """
+        if not self.loaded:
+            await self.rebuild(db)
+            return
+        if data_version is None:
+            data_version = await change_feed.read_data_version(db)
+        if data_version == self.data_version:
+            return
+
+        version = self.version
+        state = await change_feed.read_state(db)
+        rows = await change_feed.read_changes(db, self.seq, state, ("tag",))
+        if rows is None:
+            await self.rebuild(db)
+            return
+        upserted = [row.tag_id for row in rows if not row.deleted]
+        names = {}
+        if upserted:
+            names = dict(
+                tuple(row)
+                for row in await db.execute(
+                    select(Tag.id, Tag.name).where(Tag.id.in_(upserted))
+                )
+            )
+        with self._lock:
+            # 読んでいる間に自分のプロセスの変更が入った場合は、当てずに次回に回す
+            if version != self.version or state.seq < self.seq:
+                return
+            self.version += 1
+            for row in rows:
+                self._remove(row.tag_id)
+                # 読み直すまでの間に消えたタグは名前がない (トゥームストーンは次回に読む)
+                name = names.get(row.tag_id)
+                if not row.deleted and name is not None:
+                    self._add(row.tag_id, name)
+            self.data_version = state.data_version
+            self.seq = state.seq
+
+    async def refresh(
+        self, db: AsyncSession, counts: TagBitmapIndex, interval: float
+    ) -> None:
+        """
+        前回から interval 秒以上たっていれば、data_version を1回だけ読んで、
+        この索引と counts (タグのビットマップ索引) を別のプロセスの書き込みに追いつかせる。
+        それまではDBを読まない (同じプロセスの書き込みは両方の索引に反映済み)。
+        """
+        now = time.monotonic()
+        if self.loaded and counts.loaded and now - self.checked_at < interval:
+            return
+        data_version = await change_feed.read_data_version(db)
+        await self.ensure_loaded(db, data_version)
+        await counts.ensure_loaded(db, data_version)
+        self.checked_at = now
+
+    def _remove(self, tag_id: int) -> None:
+        name = self._names.pop(tag_id, None)
+        if name is None:
+            return
+        key = _key(name)
+        # casefold すると同じになる名前があるので、同じキーの範囲からidで探す
+        position = bisect_left(self._keys, key)
+        while self._ids[position] != tag_id:
+            position += 1
+        del self._keys[position]
+        del self._ids[position]
+
+    def _add(self, tag_id: int, name: str) -> None:
+        key = _key(name)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, tag_id)
+        self._names[tag_id] = name
+
+    def add(self, tag_id: int, name: str) -> None:
+        """
+        タグを追加する。既にあるidなら名前を付け替える。
+        """
+        with self._lock:
+            self.version += 1
+            self._remove(tag_id)
+            self._add(tag_id, name)
+
+    def remove(self, tag_id: int) -> None:
+        with self._lock:
+            self.version += 1
+            self._remove(tag_id)
+
+    def suggest(
+        self, prefix: str, limit: int, counts: TagBitmapIndex
+    ) -> list[tuple[int, str, int]]:
+        """
+        名前が prefix で始まるタグを、紐づくToDoの多い順に limit 件まで返す。
+
+        件数は counts (タグのビットマップ索引) から引く。件数が同じなら名前の順に並べる。
+
+        Returns:
+            list[tuple[int, str, int]]: (id, 名前, 紐づくToDoの件数)。
+        """
+        key = _key(prefix)
+        with self._lock:
+            memo_key = (key, limit)
+            # 件数を読む前の version を覚えるので、読んでいる間の変更は次回に読み直す
+            version = (self.version, counts.version)
+            memo = self._memo.get(memo_key)
+            if memo is not None and memo[:2] == version:
+                return memo[2]
+
+            start = bisect_left(self._keys, key)
+            end = bisect_left(self._keys, key + _MAX_CHAR, start)
+            tag_ids = self._ids[start:end]
+            todo_counts = counts.counts(tag_ids)
+            # 候補は名前の順なので、件数だけで選べば同じ件数の中では名前の順が保たれる
+            top = heapq.nlargest(
+                limit, range(len(tag_ids)), key=todo_counts.__getitem__
+            )
+            result = [
+                (tag_ids[i], self._names[tag_ids[i]], todo_counts[i]) for i in top
+            ]
+            if len(tag_ids) >= MEMO_MIN_MATCHES:
+                if len(self._memo) >= MEMO_MAX_ENTRIES:
+                    self._memo.clear()
+                self._memo[memo_key] = (*version, result)
+            return result
+
+
+tag_names = TagNameIndex()
@@ -1,9 +1,23 @@
 import os
 
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.assets import static_url
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 
-templates = Jinja2Templates(directory=TEMPLATES_DIR)
\ No newline at end of file
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# 静的ファイルはビルド済みのハッシュ付きファイルを参照する
+templates.env.globals["static_url"] = static_url
+
+# 行を受け取りながら少しずつ描画するページ用 (テンプレートの中で async for を使う)
+stream_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(),
+    enable_async=True,
+)
+# url_for などは通常のテンプレートと同じものを使う
+stream_env.globals.update(templates.env.globals)
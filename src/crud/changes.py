@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete as sql_delete, func, select, update as sql_update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.pagination import decode_cursor, encode_cursor
+from models.change_log import change_log_state_table, change_log_table
+from models.tag import Tag
+from models.todo import TodoModel
+from schemas.schema import (
+    ChangesSchema,
+    TagForTodoResponse,
+    TodoForTagResponse,
+    TodoTagLinkSchema,
+)
+
+todo_table = TodoModel.__table__
+tag_table = Tag.__table__
+
+
+async def _compacted_seq(db: AsyncSession) -> int:
+    compacted_seq = await db.scalar(
+        select(change_log_state_table.c.compacted_seq).where(
+            change_log_state_table.c.id == 1
+        )
+    )
+    return compacted_seq or 0
+
+
+def _decode_token(token: str) -> tuple[int, int]:
+    seq, compacted_seq = decode_cursor(token, 2)
+    if not isinstance(seq, int) or not isinstance(compacted_seq, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="不正なトークンです。"
+        )
+    return seq, compacted_seq
+
+
+async def get(db: AsyncSession, since: str | None, limit: int) -> ChangesSchema:
+    """
+    since のトークンより後に作成・更新・削除されたToDo・タグ・紐づけを返す。
+
+    変更履歴 (change_log) は対象ごとに最後の変更だけを持つので、同じ対象は1回しか返らない。
+    作成・更新されたものは現在の値を、削除されたものはidだけを返す。
+    クライアントは作成・更新を反映してから削除を反映し、has_more が false になるまで
+    next_token で続きを取得する。
+
+    トークンは [読み終えた seq, 発行時の圧縮済み seq]。発行後に圧縮が進み、
+    まだ読んでいないトゥームストーンが消えていれば削除を取りこぼすので410を返す。
+    (since なしで取り直した途中のトークンは、圧縮が進まない限り古い seq でも有効)
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        since (str | None): 前回の next_token。省略時は最初から (全件) 返す。
+        limit (int): 1回に返す変更の最大件数。
+
+    Returns:
+        ChangesSchema: 変更されたToDo・タグ・紐づけと、次のトークン。
+
+    Raises:
+        HTTPException: トークンが壊れている場合は400、古すぎる場合は410を返す。
+    """
+    compacted_seq = await _compacted_seq(db)
+    after, issued_compacted_seq = _decode_token(since) if since else (0, compacted_seq)
+    if issued_compacted_seq != compacted_seq and after < compacted_seq:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="トークンが古すぎます。since を付けずに全件を取得し直してください。",
+        )
+
+    rows = (
+        await db.execute(
+            select(change_log_table)
+            .where(change_log_table.c.seq > after)
+            .order_by(change_log_table.c.seq)
+            .limit(limit + 1)
+        )
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    todo_ids, tag_ids = [], []
+    changes = ChangesSchema(
+        next_token=encode_cursor(rows[-1].seq if rows else after, compacted_seq),
+        has_more=has_more,
+    )
+    for row in rows:
+        if row.entity == "todo":
+            (changes.deleted_todos if row.deleted else todo_ids).append(row.todo_id)
+        elif row.entity == "tag":
+            (changes.deleted_tags if row.deleted else tag_ids).append(row.tag_id)
+        else:
+            link = TodoTagLinkSchema(todo_id=row.todo_id, tag_id=row.tag_id)
+            (changes.deleted_todo_tags if row.deleted else changes.todo_tags).append(
+                link
+            )
+
+    # 同じトランザクション内で読むので、履歴にある作成・更新は必ず現在の行がある
+    if todo_ids:
+        todos = await db.execute(
+            select(todo_table)
+            .where(todo_table.c.id.in_(todo_ids))
+            .order_by(todo_table.c.id)
+        )
+        changes.todos = [
+            TodoForTagResponse.model_validate(todo, from_attributes=True)
+            for todo in todos
+        ]
+    if tag_ids:
+        tags = await db.execute(
+            select(tag_table)
+            .where(tag_table.c.id.in_(tag_ids))
+            .order_by(tag_table.c.id)
+        )
+        changes.tags = [
+            TagForTodoResponse.model_validate(tag, from_attributes=True) for tag in tags
+        ]
+    return changes
+
+
+async def compact(db: AsyncSession, retention: timedelta) -> int:
+    """
+    retention より前に記録されたトゥームストーンを変更履歴から消す。
+
+    消したトゥームストーンの seq の上限を change_log_state に記録し、
+    それより前から同期しようとするクライアントには410を返して全件を取り直させる。
+    作成・更新の行は対象ごとに1行しかないので消さない。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        retention (timedelta): トゥームストーンを残しておく期間。
+
+    Returns:
+        int: 消したトゥームストーンの件数。
+    """
+    # changed_at は CURRENT_TIMESTAMP (UTC) なので、比較もSQLiteの現在時刻で行う
+    cutoff = func.datetime("now", f"-{int(retention.total_seconds())} seconds")
+    purged_seq = await db.scalar(
+        select(func.max(change_log_table.c.seq)).where(
+            change_log_table.c.deleted.is_(True),
+            change_log_table.c.changed_at < cutoff,
+        )
+    )
+    if purged_seq is None:
+        return 0
+
+    result = await db.execute(
+        sql_delete(change_log_table).where(
+            change_log_table.c.deleted.is_(True),
+            change_log_table.c.seq <= purged_seq,
+        )
+    )
+    await db.execute(
+        sql_update(change_log_state_table)
+        .where(change_log_state_table.c.id == 1)
+        .values(
+            compacted_seq=func.max(change_log_state_table.c.compacted_seq, purged_seq)
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,14 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.data_version import data_version_table
+
+
+async def get(db: AsyncSession) -> int:
+    """
+    todo / tags / todo_tags 全体の変更カウンターを返す (主キー1行を読むだけ)。
+    """
+    version = await db.scalar(
+        select(data_version_table.c.version).where(data_version_table.c.id == 1)
+    )
+    return version or 0
@@ -0,0 +1,219 @@
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import response_cache
+from app.events import RESET, event_bus
+from app.tag_index import tag_index
+from app.tag_names import tag_names
+from models.tag import Tag
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+from schemas.schema import ImportErrorSchema, ImportResultSchema, ImportTodoSchema
+
+# 1トランザクションで書き込む行数
+IMPORT_CHUNK_SIZE = 1000
+# タグ名の IN (...) に一度に渡す件数 (SQLiteのバインド変数の上限より十分小さくする)
+TAG_LOOKUP_BATCH_SIZE = 500
+# 結果に含めるエラーの件数の上限
+IMPORT_MAX_ERRORS = 100
+
+
+class TagNameCache:
+    """
+    タグ名 → id の対応をインポートの間だけ保持する。
+    見つからない名前はチャンクごとにまとめて1回のSELECTで引き、
+    それでもない名前はまとめてINSERTする。
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self.created = 0
+        # commit した後にタグ名の索引へ入れる、このチャンクで作成したタグ
+        self.new_tags: dict[str, int] = {}
+
+    async def resolve(self, db: AsyncSession, names: Iterable[str]) -> dict[str, int]:
+        table = Tag.__table__
+        missing = sorted(set(names) - self._ids.keys())
+        for start in range(0, len(missing), TAG_LOOKUP_BATCH_SIZE):
+            batch = missing[start : start + TAG_LOOKUP_BATCH_SIZE]
+            rows = await db.execute(
+                select(table.c.name, table.c.id).where(table.c.name.in_(batch))
+            )
+            self._ids.update(dict(tuple(row) for row in rows))
+
+            new_names = [name for name in batch if name not in self._ids]
+            if new_names:
+                rows = await db.execute(
+                    sqlite_insert(table)
+                    .values([{"name": name} for name in new_names])
+                    .on_conflict_do_nothing()
+                    .returning(table.c.name, table.c.id)
+                )
+                created = dict(tuple(row) for row in rows)
+                self.created += len(created)
+                self._ids.update(created)
+                self.new_tags.update(created)
+
+                # SELECTとINSERTの間に別の書き込みが同じ名前を作ると、
+                # ON CONFLICT DO NOTHING でその名前は RETURNING に返らないので引き直す
+                raced = [name for name in new_names if name not in created]
+                if raced:
+                    rows = await db.execute(
+                        select(table.c.name, table.c.id).where(table.c.name.in_(raced))
+                    )
+                    self._ids.update(dict(tuple(row) for row in rows))
+        return self._ids
+
+
+def _describe(e: ValidationError) -> str:
+    return "; ".join(
+        ": ".join(filter(None, [".".join(map(str, error["loc"])), error["msg"]]))
+        for error in e.errors()
+    )
+
+
+async def _iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    任意の位置で区切られたバイト列を、改行ごとの1行に組み直す。
+    """
+    rest = b""
+    async for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+async def import_ndjson(
+    db: AsyncSession,
+    chunks: AsyncIterable[bytes],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[ImportResultSchema], None]] = None,
+) -> ImportResultSchema:
+    """
+    NDJSON (1行1ToDo、/v1/todo/export と同じ形式) を少しずつ読んでToDoを取り込む。
+
+    chunk_size 行ごとに、タグ名の解決・ToDoのINSERT・todo_tagsのINSERTを
+    executemany で行い、1トランザクションでcommitする。
+    全体を一度にメモリに載せないので、行数によらずメモリ使用量は一定。
+    読み取りキャッシュの破棄と変更イベント (reset) の送信は、最後に1回だけ行う。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        chunks (AsyncIterable[bytes]): NDJSONのバイト列 (区切り位置は任意)。
+        chunk_size (int): 1トランザクションで書き込む行数。
+        on_progress (Callable | None): チャンクをcommitするたびに途中経過を受け取る。
+
+    Returns:
+        ImportResultSchema: 取り込んだ件数と処理速度。
+    """
+    result = ImportResultSchema()
+    tag_cache = TagNameCache()
+    started = time.perf_counter()
+    pending: List[ImportTodoSchema] = []
+    line_number = 0
+
+    async def flush():
+        await _write_chunk(db, pending, tag_cache, result)
+        pending.clear()
+        result.tags_created = tag_cache.created
+        result.seconds = round(time.perf_counter() - started, 3)
+        result.rows_per_second = round(result.rows / max(result.seconds, 1e-9), 1)
+        if on_progress is not None:
+            on_progress(result)
+
+    try:
+        async for line in _iter_lines(chunks):
+            line_number += 1
+            if not line.strip():
+                continue
+            result.rows += 1
+            try:
+                pending.append(ImportTodoSchema.model_validate_json(line))
+            except ValidationError as e:
+                result.invalid += 1
+                if len(result.errors) < IMPORT_MAX_ERRORS:
+                    result.errors.append(
+                        ImportErrorSchema(line=line_number, detail=_describe(e))
+                    )
+            if len(pending) >= chunk_size:
+                await flush()
+
+        await flush()
+    finally:
+        # 途中で失敗しても、それまでにcommitしたチャンクの分は知らせる
+        if result.created or tag_cache.created:
+            # 一覧・タグ・統計のどれにも影響するので、読み取りキャッシュはまとめて捨てる
+            response_cache.clear()
+            # 行ごとやチャンクごとのイベントは送らず、取り込みの最後に1回だけ
+            # 一覧を読み直してもらう
+            event_bus.publish(RESET, {})
+    return result
+
+
+async def _write_chunk(
+    db: AsyncSession,
+    pending: List[ImportTodoSchema],
+    tag_cache: TagNameCache,
+    result: ImportResultSchema,
+) -> None:
+    if not pending:
+        return
+
+    table = TodoModel.__table__
+    # チャンク内でcontentが重複した行は、先の行だけを取り込む
+    todos: dict[str, ImportTodoSchema] = {}
+    for todo in pending:
+        if todo.content in todos:
+            result.skipped += 1
+        else:
+            todos[todo.content] = todo
+
+    tag_ids = await tag_cache.resolve(
+        db, {name for todo in todos.values() for name in todo.tags}
+    )
+
+    rows = await db.execute(
+        sqlite_insert(table)
+        .on_conflict_do_nothing()
+        .returning(table.c.content, table.c.id),
+        [
+            {
+                "id": todo.id,
+                "content": todo.content,
+                "completed": todo.completed,
+                "deadline": todo.deadline,
+            }
+            for todo in todos.values()
+        ],
+    )
+    created = dict(tuple(row) for row in rows)
+    result.created += len(created)
+    result.skipped += len(todos) - len(created)
+
+    links = [
+        {"todo_id": todo_id, "tag_id": tag_ids[name]}
+        for content, todo_id in created.items()
+        for name in dict.fromkeys(todos[content].tags)
+    ]
+    if links:
+        await db.execute(
+            sqlite_insert(todo_tag_association_table).on_conflict_do_nothing(), links
+        )
+    result.links += len(links)
+    await db.commit()
+
+    # 読み取りキャッシュの破棄と RESET の送信は、取り込みの最後に1回だけ行う
+    tag_index.add_todos(created.values())
+    for name, tag_id in tag_cache.new_tags.items():
+        tag_names.add(tag_id, name)
+    tag_cache.new_tags.clear()
+    for link in links:
+        tag_index.add_link(link["todo_id"], link["tag_id"])
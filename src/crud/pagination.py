@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException, status
+
+
+def invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="不正なカーソルです。"
+    )
+
+
+def encode_cursor(*keys) -> str:
+    """
+    キーセットページングの位置 (最後の行のソートキー) を不透明な文字列にする。
+    """
+    values = [k.isoformat() if isinstance(k, (date, datetime)) else k for k in keys]
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    encode_cursor で作ったカーソルを元のキーのリストに戻す。
+
+    Args:
+        cursor (str): クライアントから受け取ったカーソル。
+        size (int): 期待するキーの個数。
+
+    Raises:
+        HTTPException: カーソルが壊れている場合は400を返す。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeEncodeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise invalid_cursor()
+    return values
+
+
+def check_id(value) -> int:
+    """
+    カーソルから取り出したidが整数であることを確かめる。
+    JSONとして正しくても配列やnullのままSQLに渡すと500になるため。
+
+    Raises:
+        HTTPException: 整数でない場合は400を返す。
+    """
+    # bool は int のサブクラスなので除く
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise invalid_cursor()
+    return value
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """
+    id だけを持つカーソル (encode_cursor(id)) を id に戻す。
+    """
+    (last_id,) = decode_cursor(cursor, 1)
+    return check_id(last_id)
+
+
+def parse_datetime(value) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise invalid_cursor()
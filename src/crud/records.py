@@ -0,0 +1,171 @@
+"""
+読み取り専用のクエリ (SQLAlchemy Core) と、その結果を入れる軽量なレコード。
+
+ORMのインスタンスと違い、セッションのidentity mapにも変更追跡にも載らず、
+__slots__ なので1件あたりのメモリも小さい。ORMは書き込みにだけ使う。
+属性名は TodoModel / Tag と同じにしてあるので、スキーマの from_attributes・
+app.serialization・テンプレートからはどちらも同じように読める。
+
+ToDoのタグ (タグのToDo) は相関サブクエリの json_group_array で1行にまとめ、
+一覧でも1回のクエリで読み込む。
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import Select, func, select
+
+from models.tag import Tag
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+
+todo_table = TodoModel.__table__
+tag_table = Tag.__table__
+
+# 埋め込み先のレコードが持たない側の関連 (タグに埋め込んだToDoのタグなど)
+_NONE = ()
+
+
+class TagRecord:
+    __slots__ = ("id", "name", "created_at", "updated_at", "todos")
+
+    def __init__(self, id, name, created_at, updated_at, todos=_NONE):
+        self.id = id
+        self.name = name
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.todos = todos
+
+    def __repr__(self) -> str:
+        return f"TagRecord(id={self.id!r}, name={self.name!r})"
+
+
+class TodoRecord:
+    __slots__ = (
+        "id",
+        "content",
+        "completed",
+        "deadline",
+        "created_at",
+        "updated_at",
+        "tags",
+    )
+
+    def __init__(
+        self, id, content, completed, deadline, created_at, updated_at, tags=_NONE
+    ):
+        self.id = id
+        self.content = content
+        self.completed = completed
+        self.deadline = deadline
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.tags = tags
+
+    def __repr__(self) -> str:
+        return f"TodoRecord(id={self.id!r}, content={self.content!r})"
+
+
+def _datetime(value: str | None) -> datetime | None:
+    # JSONの中の日時はSQLiteに保存された文字列 ("2025-01-02 03:04:05.000000") のまま
+    return None if value is None else datetime.fromisoformat(value)
+
+
+# json_group_array の中の並びは保証されないので、読み込んだ後にidで並べる
+def _tags(raw: str) -> list[TagRecord]:
+    tags = [
+        TagRecord(
+            tag["id"],
+            tag["name"],
+            _datetime(tag["created_at"]),
+            _datetime(tag["updated_at"]),
+        )
+        for tag in json.loads(raw)
+    ]
+    tags.sort(key=lambda tag: tag.id)
+    return tags
+
+
+def _todos(raw: str) -> list[TodoRecord]:
+    todos = [
+        TodoRecord(
+            todo["id"],
+            todo["content"],
+            bool(todo["completed"]),
+            _datetime(todo["deadline"]),
+            _datetime(todo["created_at"]),
+            _datetime(todo["updated_at"]),
+        )
+        for todo in json.loads(raw)
+    ]
+    todos.sort(key=lambda todo: todo.id)
+    return todos
+
+
+def _json_objects(table, *columns: str):
+    return func.json_group_array(
+        func.json_object(*(arg for name in columns for arg in (name, table.c[name])))
+    )
+
+
+def todo_select() -> Select:
+    """
+    ToDoの列とタグ (JSON配列の文字列) を読むSELECT。
+    絞り込み・並び替え・LIMITは呼び出し側で足す。
+    """
+    tags = (
+        select(_json_objects(tag_table, "id", "name", "created_at", "updated_at"))
+        .select_from(
+            todo_tag_association_table.join(
+                tag_table, tag_table.c.id == todo_tag_association_table.c.tag_id
+            )
+        )
+        .where(todo_tag_association_table.c.todo_id == todo_table.c.id)
+        .scalar_subquery()
+    )
+    return select(todo_table, tags.label("tags"))
+
+
+def tag_select() -> Select:
+    """
+    タグの列と紐づくToDo (JSON配列の文字列) を読むSELECT。
+    """
+    todos = (
+        select(
+            _json_objects(
+                todo_table,
+                "id",
+                "content",
+                "completed",
+                "deadline",
+                "created_at",
+                "updated_at",
+            )
+        )
+        .select_from(
+            todo_tag_association_table.join(
+                todo_table, todo_table.c.id == todo_tag_association_table.c.todo_id
+            )
+        )
+        .where(todo_tag_association_table.c.tag_id == tag_table.c.id)
+        .scalar_subquery()
+    )
+    return select(tag_table, todos.label("todos"))
+
+
+def todo_from_row(row) -> TodoRecord:
+    return TodoRecord(
+        row.id,
+        row.content,
+        row.completed,
+        row.deadline,
+        row.created_at,
+        row.updated_at,
+        _tags(row.tags),
+    )
+
+
+def tag_from_row(row) -> TagRecord:
+    return TagRecord(
+        row.id, row.name, row.created_at, row.updated_at, _todos(row.todos)
+    )
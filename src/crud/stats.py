@@ -0,0 +1,199 @@
+from datetime import datetime, time
+
+from sqlalchemy import delete as sql_delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.pagination import decode_id_cursor, encode_cursor
+from models.stats import tag_stats_table, todo_deadline_stats_table, todo_stats_table
+from models.tag import Tag
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+from schemas.schema import StatsSchema, TagStatsSchema
+
+# 集計テーブルのトリガーと同じ条件 (completed が 1 以外なら未完了として数える)
+_is_completed = TodoModel.completed.is_(True)
+_is_open = TodoModel.completed.is_not(True)
+
+
+async def get(db: AsyncSession, now: datetime | None = None) -> StatsSchema:
+    """
+    トリガーで更新している集計テーブルから件数を返す。
+
+    件数と完了件数は1行を読むだけ。期限切れは「今日より前の締切日ごとの未完了件数の合計」と
+    「今日の締切のうち now を過ぎた未完了のToDo」(インデックスの範囲検索) を足して求める。
+    タグの数に比例するタグごとの件数は get_tags でページごとに返す。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        now (datetime | None): 期限切れの判定に使う現在時刻。省略時は現在のローカル時刻。
+
+    Returns:
+        StatsSchema: 全体・完了・期限切れの件数。
+    """
+    now = now or datetime.now()
+    today_start = datetime.combine(now.date(), time.min)
+
+    totals = (
+        await db.execute(
+            select(todo_stats_table.c.total, todo_stats_table.c.completed).where(
+                todo_stats_table.c.id == 1
+            )
+        )
+    ).one_or_none()
+    overdue_before_today = await db.scalar(
+        select(
+            func.coalesce(func.sum(todo_deadline_stats_table.c.open_count), 0)
+        ).where(todo_deadline_stats_table.c.deadline_date < now.date())
+    )
+    overdue_today = await db.scalar(
+        select(func.count())
+        .select_from(TodoModel)
+        .where(
+            TodoModel.completed
+            == False,  # noqa: E712 (インデックスを使うため等号で比較する)
+            TodoModel.deadline >= today_start,
+            TodoModel.deadline < now,
+        )
+    )
+
+    total, completed = totals if totals is not None else (0, 0)
+    return StatsSchema(
+        total=total,
+        completed=completed,
+        overdue=overdue_before_today + overdue_today,
+    )
+
+
+async def get_tags(
+    db: AsyncSession, cursor: str | None = None, limit: int = 100
+) -> tuple[list[TagStatsSchema], str | None]:
+    """
+    タグごとのToDoの件数を、キーセット(カーソル)方式でタグのid順に返す。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        cursor (str | None): 前のページの最後のタグの位置。省略時は先頭から。
+        limit (int): 1ページの件数。
+
+    Returns:
+        tuple[list[TagStatsSchema], str | None]: タグごとの件数と次ページのカーソル。
+    """
+    query = select(Tag.id, Tag.name, tag_stats_table.c.todo_count).join(
+        tag_stats_table, tag_stats_table.c.tag_id == Tag.id
+    )
+    if cursor:
+        query = query.where(Tag.id > decode_id_cursor(cursor))
+
+    rows = (await db.execute(query.order_by(Tag.id).limit(limit + 1))).all()
+    tags = [TagStatsSchema.model_validate(row._mapping) for row in rows[:limit]]
+    if len(rows) <= limit:
+        return tags, None
+    return tags, encode_cursor(tags[-1].id)
+
+
+def _expected_todo_stats():
+    return select(
+        func.count().label("total"),
+        func.count().filter(_is_completed).label("completed"),
+    ).select_from(TodoModel)
+
+
+def _expected_tag_stats():
+    return (
+        select(
+            Tag.id.label("tag_id"),
+            func.count(todo_tag_association_table.c.todo_id).label("todo_count"),
+        )
+        .outerjoin(
+            todo_tag_association_table,
+            todo_tag_association_table.c.tag_id == Tag.id,
+        )
+        .group_by(Tag.id)
+    )
+
+
+def _expected_deadline_stats():
+    deadline_date = func.date(TodoModel.deadline)
+    return (
+        select(deadline_date.label("deadline_date"), func.count().label("open_count"))
+        .where(TodoModel.deadline.is_not(None), _is_open)
+        .group_by(deadline_date)
+    )
+
+
+async def verify(db: AsyncSession) -> list[str]:
+    """
+    集計テーブルを元のテーブルから数え直した値と比べ、ずれている項目を返す。
+
+    Returns:
+        list[str]: ずれの説明。ずれがなければ空のリスト。
+    """
+    drifts = []
+
+    expected = (await db.execute(_expected_todo_stats())).one()
+    actual = (
+        await db.execute(
+            select(todo_stats_table.c.total, todo_stats_table.c.completed).where(
+                todo_stats_table.c.id == 1
+            )
+        )
+    ).one_or_none()
+    if actual is None or tuple(actual) != tuple(expected):
+        drifts.append(f"todo_stats: expected {tuple(expected)}, actual {actual}")
+
+    for name, table, key, value, query in (
+        (
+            "tag_stats",
+            tag_stats_table,
+            tag_stats_table.c.tag_id,
+            tag_stats_table.c.todo_count,
+            _expected_tag_stats(),
+        ),
+        (
+            "todo_deadline_stats",
+            todo_deadline_stats_table,
+            # 日付は文字列のまま比べる
+            func.date(todo_deadline_stats_table.c.deadline_date),
+            todo_deadline_stats_table.c.open_count,
+            _expected_deadline_stats(),
+        ),
+    ):
+        expected_rows = dict(tuple(row) for row in await db.execute(query))
+        # 0件になった行は残っていてもよい
+        actual_rows = {k: v for k, v in await db.execute(select(key, value)) if v != 0}
+        expected_rows = {k: v for k, v in expected_rows.items() if v != 0}
+        for k in sorted(expected_rows.keys() | actual_rows.keys(), key=str):
+            if expected_rows.get(k, 0) != actual_rows.get(k, 0):
+                drifts.append(
+                    f"{name}[{k}]: expected {expected_rows.get(k, 0)}, "
+                    f"actual {actual_rows.get(k, 0)}"
+                )
+    return drifts
+
+
+async def rebuild(db: AsyncSession) -> None:
+    """
+    集計テーブルを元のテーブルから数え直して作り直す (1トランザクション)。
+    """
+    await db.execute(sql_delete(todo_stats_table))
+    await db.execute(
+        insert(todo_stats_table).from_select(
+            ["id", "total", "completed"],
+            select(
+                literal(1), func.count(), func.count().filter(_is_completed)
+            ).select_from(TodoModel),
+        )
+    )
+    await db.execute(sql_delete(tag_stats_table))
+    await db.execute(
+        insert(tag_stats_table).from_select(
+            ["tag_id", "todo_count"], _expected_tag_stats()
+        )
+    )
+    await db.execute(sql_delete(todo_deadline_stats_table))
+    await db.execute(
+        insert(todo_deadline_stats_table).from_select(
+            ["deadline_date", "open_count"], _expected_deadline_stats()
+        )
+    )
+    await db.commit()
@@ -1,57 +1,258 @@
-from sqlalchemy.orm import Session, joinedload
+import json
+from typing import AsyncIterator, NoReturn
 
+from fastapi import HTTPException, status
+from sqlalchemy import delete as sql_delete, func, insert, select, update as sql_update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import serialization, settings
+from app.cache import TAG_LIST_DEP, response_cache, tag_dep, todo_dep
+from app.events import event_bus
+from app.tag_index import tag_index
+from app.tag_names import tag_names
+from crud import records
+from crud.pagination import decode_id_cursor, encode_cursor
+from crud.records import TagRecord
 from models.tag import Tag
-from schemas.schema import CreateTagSchema, UpdateTagSchema
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+from schemas.schema import (
+    CreateTagSchema,
+    TagSchema,
+    TagSuggestionSchema,
+    UpdateTagSchema,
+)
+
+# エクスポートでサーバーサイドカーソルから1回に取り出す行数
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["id", "name", "created_at", "updated_at", "todo_ids"]
 
 
-def create(db: Session, create_tag_schema: CreateTagSchema) -> Tag:
-    tag_model = Tag(**create_tag_schema.model_dump(exclude_unset=True))
-    db.add(tag_model)
-    db.commit()
-    # db.refresh(tag_model)
-    return get_by_id(db, tag_model.id)
+async def create(db: AsyncSession, create_tag_schema: CreateTagSchema) -> TagSchema:
+    """
+    INSERT ... RETURNING の1往復でタグを作成する。
+    """
+    table = Tag.__table__
+    try:
+        row = (
+            await db.execute(
+                insert(table)
+                .values(**create_tag_schema.model_dump(exclude_unset=True))
+                .returning(*table.c)
+            )
+        ).one()
+    except IntegrityError:
+        await _raise_name_conflict(db)
+    await db.commit()
+    response_cache.invalidate(TAG_LIST_DEP)
+    tag_names.add(row.id, row.name)
+    event_bus.publish("tag.created", {"id": row.id, "name": row.name})
+    return TagSchema.model_validate({**row._mapping, "todos": []})
 
 
-def get_by_id(db: Session, tag_id: int) -> Tag | None:
-    return (
-        db.query(Tag)
-        .options(joinedload(Tag.todos))
-        .filter(Tag.id == tag_id)
-        .first()
+async def _raise_name_conflict(db: AsyncSession) -> NoReturn:
+    # name の一意制約違反。グループコミットではこのリクエストの SAVEPOINT だけを戻す
+    await db.rollback()
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="同じ名前のタグが既にあります。",
     )
 
 
-def get(db: Session, skip: int = 0, limit: int = 100) -> list[Tag]:
-    return (
-        db.query(Tag)
-        .options(joinedload(Tag.todos))
-        .order_by(Tag.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+async def _fetch(db: AsyncSession, query) -> list[TagRecord]:
+    return [records.tag_from_row(row) for row in await db.execute(query)]
+
+
+async def get_by_id(db: AsyncSession, tag_id: int) -> TagRecord | None:
+    tags = await _fetch(db, records.tag_select().where(Tag.id == tag_id))
+    return tags[0] if tags else None
+
+
+async def get(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[TagRecord]:
+    return await _fetch(
+        db, records.tag_select().order_by(Tag.id).offset(skip).limit(limit)
     )
 
 
-def update(
-    db: Session, tag_model_id: int, update_tag_schema: UpdateTagSchema
-) -> Tag | None:
-    tag_model = db.query(Tag).filter(Tag.id == tag_model_id).first()
-    if tag_model is None:
-        return tag_model
+async def get_page(
+    db: AsyncSession, cursor: str | None = None, limit: int = 100
+) -> tuple[list[TagRecord], str | None]:
+    """
+    キーセット(カーソル)方式でタグをid順に取得する。
+    """
+    query = records.tag_select()
+    if cursor:
+        query = query.filter(Tag.id > decode_id_cursor(cursor))
 
-    update_tag_schema_obj = update_tag_schema.model_dump(exclude_unset=True)
-    for key, value in update_tag_schema_obj.items():
-        setattr(tag_model, key, value)
-    db.add(tag_model)
-    db.commit()
-    # db.refresh(tag_model)
-    return get_by_id(db, tag_model.id)
+    tags = await _fetch(db, query.order_by(Tag.id).limit(limit + 1))
+    if len(tags) <= limit:
+        return tags, None
+
+    tags = tags[:limit]
+    return tags, encode_cursor(tags[-1].id)
+
+
+def _tag_deps(tag_record: TagRecord) -> set:
+    return {tag_dep(tag_record.id), *(todo_dep(t.id) for t in tag_record.todos)}
+
+
+async def get_by_id_json(
+    db: AsyncSession, tag_id: int, etag: str
+) -> tuple[bytes, str] | None:
+    """
+    get_by_id の結果をJSONにしたものとそのETagを、読み取りキャッシュ経由で返す。
+    ETag は crud.todo.get_by_id_json と同じく、キャッシュに保存したときの値を返す。
+    """
+    key = ("tag", tag_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = response_cache.version
+    tag_record = await get_by_id(db, tag_id)
+    if tag_record is None:
+        return None
+    body = serialization.dump_tag(tag_record)
+    response_cache.set(key, (body, etag), _tag_deps(tag_record), version)
+    return body, etag
+
+
+async def get_page_json(
+    db: AsyncSession, cursor: str | None = None, limit: int = 100, etag: str = ""
+) -> tuple[bytes, str | None, str]:
+    """
+    get_page の結果をJSONにしたものと次ページのカーソルとETagを、読み取りキャッシュ経由で返す。
+    ETag は crud.todo.get_by_id_json と同じく、キャッシュに保存したときの値を返す。
+    """
+    key = ("tag-page", cursor, limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = response_cache.version
+    tags, next_cursor = await get_page(db, cursor=cursor, limit=limit)
+    body = serialization.dump_tags(tags)
+    deps = {TAG_LIST_DEP}
+    for tag_record in tags:
+        deps |= _tag_deps(tag_record)
+    response_cache.set(key, (body, next_cursor, etag), deps, version)
+    return body, next_cursor, etag
 
 
-def delete(db: Session, tag_model_id: int) -> int | None:
-    tag_model = db.query(Tag).get(tag_model_id) # .get() は主キーでの取得
-    if tag_model is None:
+async def suggest(
+    db: AsyncSession, prefix: str, limit: int = 10
+) -> list[TagSuggestionSchema]:
+    """
+    名前が prefix で始まるタグを、紐づくToDoの多い順に返す (入力補完用)。
+
+    タグ名の索引と件数 (タグのビットマップ索引) はメモリ上にあるので、DBは読まない。
+    別のワーカーやプロセスの書き込みは TAG_SUGGEST_REFRESH_SECONDS ごとに
+    data_version を1行読んで確かめ、変わっていれば両方の索引を追いつかせる。
+    件数が同じなら名前の順に並べる。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション (索引の構築と追従にだけ使う)。
+        prefix (str): タグ名の先頭。大文字・小文字は区別しない。空なら全タグが対象。
+        limit (int): 返す件数の上限。
+
+    Returns:
+        list[TagSuggestionSchema]: 候補のタグと紐づくToDoの件数。
+    """
+    await tag_names.refresh(db, tag_index, settings.TAG_SUGGEST_REFRESH_SECONDS)
+    return [
+        TagSuggestionSchema(id=tag_id, name=name, todo_count=todo_count)
+        for tag_id, name, todo_count in tag_names.suggest(prefix, limit, tag_index)
+    ]
+
+
+async def export_rows(db: AsyncSession) -> AsyncIterator[dict]:
+    """
+    エクスポート用にタグをid順に1行ずつ返す。
+    紐づくToDoのidは (tag_id, todo_id) インデックスから相関サブクエリで集約する。
+    """
+    table = Tag.__table__
+    todo_ids = (
+        select(func.json_group_array(todo_tag_association_table.c.todo_id))
+        .where(todo_tag_association_table.c.tag_id == table.c.id)
+        .scalar_subquery()
+    )
+    result = await db.stream(
+        select(table, todo_ids.label("todo_ids"))
+        .order_by(table.c.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async for row in result:
+        yield {
+            "id": row.id,
+            "name": row.name,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "todo_ids": json.loads(row.todo_ids),
+        }
+
+
+async def update(
+    db: AsyncSession, tag_model_id: int, update_tag_schema: UpdateTagSchema
+) -> TagSchema | None:
+    """
+    UPDATE ... RETURNING で更新後の行を受け取り、紐づくToDoだけを追加で読み込む。
+    """
+    table = Tag.__table__
+    update_tag_schema_obj = update_tag_schema.model_dump(exclude_unset=True)
+    try:
+        row = (
+            await db.execute(
+                sql_update(table)
+                .where(table.c.id == tag_model_id)
+                .values(updated_at=func.now(), **update_tag_schema_obj)
+                .returning(*table.c)
+            )
+        ).one_or_none()
+    except IntegrityError:
+        await _raise_name_conflict(db)
+    if row is None:
         return None
-    db.delete(tag_model)
-    db.commit()
-    return tag_model_id
+
+    todo_table = TodoModel.__table__
+    todos = await db.execute(
+        select(todo_table)
+        .join(
+            todo_tag_association_table,
+            todo_tag_association_table.c.todo_id == todo_table.c.id,
+        )
+        .where(todo_tag_association_table.c.tag_id == tag_model_id)
+        .order_by(todo_table.c.id)
+    )
+    tag_schema = TagSchema.model_validate(
+        {**row._mapping, "todos": [todo._mapping for todo in todos]}
+    )
+    await db.commit()
+    # このタグを埋め込んだToDo側のキャッシュも tag_dep で無効化される
+    response_cache.invalidate(tag_dep(tag_model_id))
+    if "name" in update_tag_schema_obj:
+        tag_names.add(tag_model_id, row.name)
+    event_bus.publish("tag.updated", {"id": tag_model_id, **update_tag_schema_obj})
+    return tag_schema
+
+
+async def delete(db: AsyncSession, tag_model_id: int) -> int | None:
+    """
+    todo_tagsの紐付けとタグ本体を直接DELETEする (ORMでの読み込みは行わない)。
+    """
+    table = Tag.__table__
+    await db.execute(
+        sql_delete(todo_tag_association_table).where(
+            todo_tag_association_table.c.tag_id == tag_model_id
+        )
+    )
+    deleted_id = await db.scalar(
+        sql_delete(table).where(table.c.id == tag_model_id).returning(table.c.id)
+    )
+    await db.commit()
+    if deleted_id is not None:
+        response_cache.invalidate(tag_dep(deleted_id), TAG_LIST_DEP)
+        tag_index.remove_tag(deleted_id)
+        tag_names.remove(deleted_id)
+        event_bus.publish("tag.deleted", {"id": deleted_id})
+    return deleted_id
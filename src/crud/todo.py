@@ -1,127 +1,1068 @@
+import json
 import logging
+import uuid
+from collections import defaultdict
+from itertools import islice
+from datetime import datetime, time, timedelta
 
 from fastapi import HTTPException, status
 
-from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete as sql_delete,
+    exists,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+    update as sql_update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, NoReturn, Optional
+
+from app import serialization
+from app.cache import TODO_LIST_DEP, response_cache, tag_dep, todo_dep
+from app.events import event_bus
+from app.tag_index import tag_index
+from crud import records
+from crud.pagination import (
+    check_id,
+    decode_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    invalid_cursor,
+    parse_datetime,
+)
+from crud.records import TodoRecord
 
 from models.todo import TodoModel
 from models.tag import Tag
-from schemas.schema import CreateTodoSchema, UpdateTodoSchema, TagSchema
+from models.todo_fts import todo_fts_table
+from models.todo_tag import todo_tag_association_table
+from schemas.schema import (
+    BulkResultItemSchema,
+    BulkUpdateTodoItemSchema,
+    CreateTodoSchema,
+    UpdateTodoSchema,
+    TodoFilterSchema,
+    TodoSchema,
+)
+
+logger = logging.getLogger(__name__)
+
+# 一括操作で1トランザクションにまとめる件数
+BULK_CHUNK_SIZE = 500
+
+# 変更されると一覧の並び順や絞り込み結果が変わる項目
+LIST_KEYS = {"deadline", "completed"}
 
+# タグ索引で絞った候補のidを、他の条件と合わせてSQLで確認するときの1回の件数
+TAG_INDEX_BATCH_SIZE = 500
 
-def create(db: Session, create_todo_schema: CreateTodoSchema) -> TodoModel:
-    todo_model = TodoModel(**create_todo_schema.model_dump(exclude_unset=True))
-    db.add(todo_model)
-    db.commit()
-    # db.refresh(todo_model)
-    return get_by_id(db, todo_model.id)
+# エクスポートでサーバーサイドカーソルから1回に取り出す行数
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = [
+    "id",
+    "content",
+    "completed",
+    "deadline",
+    "created_at",
+    "updated_at",
+    "tags",
+]
 
+# trigramトークナイザーが索引を使えるのは3文字以上の検索語だけ
+TRIGRAM_MIN_LENGTH = 3
 
-def get_by_id(db: Session, todo_id: int) -> TodoModel | None:
-    return (
-        db.query(TodoModel)
-        .options(joinedload(TodoModel.tags))
-        .filter(TodoModel.id == todo_id)
-        .first()
+# todo.created イベントで送る項目 (一括作成でも同じ項目を送る)
+CREATED_EVENT_FIELDS = {"id", "content", "deadline", "completed"}
+
+
+async def create(db: AsyncSession, create_todo_schema: CreateTodoSchema) -> TodoSchema:
+    """
+    INSERT ... RETURNING の1往復でToDoを作成し、返ってきた行からレスポンスを組み立てる。
+    """
+    table = TodoModel.__table__
+    try:
+        row = (
+            await db.execute(
+                insert(table)
+                .values(**create_todo_schema.model_dump(exclude_unset=True))
+                .returning(*table.c)
+            )
+        ).one()
+    except IntegrityError:
+        await _raise_content_conflict(db)
+    await db.commit()
+    response_cache.invalidate(TODO_LIST_DEP)
+    tag_index.add_todos([row.id])
+    todo_schema = TodoSchema.model_validate({**row._mapping, "tags": []})
+    event_bus.publish(
+        "todo.created", todo_schema.model_dump(include=CREATED_EVENT_FIELDS)
     )
+    return todo_schema
 
 
-def get(db: Session, skip: int = 0, limit: int = 100) -> list[TodoModel]:
-    return (
-        db.query(TodoModel)
-        .options(joinedload(TodoModel.tags))
-        .order_by(TodoModel.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+async def _raise_content_conflict(db: AsyncSession) -> NoReturn:
+    # content の一意制約違反。グループコミットではこのリクエストの SAVEPOINT だけを戻す
+    await db.rollback()
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="同じ内容のToDoが既にあります。",
     )
 
 
-def update(
-    db: Session, todo_model_id: int, update_todo_schema: UpdateTodoSchema
-) -> TodoModel | None:
-    todo_model = db.query(TodoModel).filter(TodoModel.id == todo_model_id).first()
-    if todo_model is None:
-        return todo_model
+async def _fetch(db: AsyncSession, query) -> list[TodoRecord]:
+    return [records.todo_from_row(row) for row in await db.execute(query)]
 
-    update_todo_schema_obj = update_todo_schema.model_dump(exclude_unset=True)
-    for key, value in update_todo_schema_obj.items():
-        setattr(todo_model, key, value)
-    db.add(todo_model)
-    db.commit()
-    db.refresh(todo_model)
-    return todo_model
 
+async def get_by_id(db: AsyncSession, todo_id: int) -> TodoRecord | None:
+    todos = await _fetch(db, records.todo_select().where(TodoModel.id == todo_id))
+    return todos[0] if todos else None
+
+
+async def get(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[TodoRecord]:
+    return await _fetch(
+        db,
+        records.todo_select().order_by(TodoModel.id).offset(skip).limit(limit),
+    )
+
+
+def _filter_conditions(filters: TodoFilterSchema | None) -> list:
+    if filters is None:
+        return []
+
+    conditions = []
+    if filters.completed is not None:
+        conditions.append(TodoModel.completed == filters.completed)
+    if filters.deadline_from is not None:
+        conditions.append(
+            TodoModel.deadline >= datetime.combine(filters.deadline_from, time.min)
+        )
+    if filters.deadline_to is not None:
+        # 終了日は当日を含める
+        conditions.append(
+            TodoModel.deadline
+            < datetime.combine(filters.deadline_to + timedelta(days=1), time.min)
+        )
+    if filters.tag_ids:
+        conditions.append(
+            TodoModel.id.in_(
+                select(todo_tag_association_table.c.todo_id).where(
+                    todo_tag_association_table.c.tag_id.in_(filters.tag_ids)
+                )
+            )
+        )
+    return conditions
+
+
+async def get_page(
+    db: AsyncSession,
+    cursor: str | None = None,
+    limit: int = 100,
+    order_by: str = "id",
+    direction: str = "asc",
+    filters: TodoFilterSchema | None = None,
+) -> tuple[list[TodoRecord], str | None]:
+    """
+    キーセット(カーソル)方式でToDoを取得する。
+
+    OFFSETと違い、前ページ最後の行のソートキーより後ろをインデックスで
+    直接探すため、深いページでも取得コストが変わらない。
+    タグは相関サブクエリで各行にまとめるので、1ページを1回のクエリで読む。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        cursor (str | None): 前ページのレスポンスで返した next_cursor。
+        limit (int): 取得件数。
+        order_by (str): "id" または "deadline" (締切なしは昇順で末尾、降順で先頭)。
+        direction (str): "asc" または "desc"。
+        filters (TodoFilterSchema | None): 絞り込み条件。
+
+    Returns:
+        tuple[list[TodoRecord], str | None]: ToDoのリストと次ページのカーソル。
+    """
+    conditions = _filter_conditions(filters)
+    descending = direction == "desc"
+
+    if filters is not None and filters.uses_tag_index:
+        if order_by != "id":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="tags_all/tags_any/tags_none はid順でのみ指定できます。",
+            )
+        return await _get_page_by_tag_index(
+            db, filters, conditions, cursor, limit, descending
+        )
+
+    if order_by == "deadline":
+        return await _get_page_by_deadline(db, conditions, cursor, limit, descending)
+
+    query = records.todo_select().where(*conditions)
+    if cursor:
+        last_id = decode_id_cursor(cursor)
+        query = query.where(
+            TodoModel.id < last_id if descending else TodoModel.id > last_id
+        )
+    query = query.order_by(TodoModel.id.desc() if descending else TodoModel.id)
+
+    todos = await _fetch(db, query.limit(limit + 1))
+    if len(todos) <= limit:
+        return todos, None
+
+    todos = todos[:limit]
+    return todos, encode_cursor(todos[-1].id)
+
+
+async def _get_page_by_tag_index(
+    db: AsyncSession,
+    filters: TodoFilterSchema,
+    conditions: list,
+    cursor: str | None,
+    limit: int,
+    descending: bool,
+) -> tuple[list[TodoRecord], str | None]:
+    """
+    タグ条件をタグ索引のビット演算で解決し、候補のidを順に読み出して
+    残りの条件 (完了状態・締切など) はSQLで確認する。
+    他の条件がなければ、候補の先頭 limit + 1 件を主キーで引くだけで済む。
+    """
+    await tag_index.ensure_loaded(db)
+    bitmap = tag_index.query(filters.tags_all, filters.tags_any, filters.tags_none)
+
+    last_id = None
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int) or last_id < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="不正なカーソルです。"
+            )
+    candidates = tag_index.iter_ids(bitmap, after=last_id, descending=descending)
+    batch_size = max(limit + 1, TAG_INDEX_BATCH_SIZE) if conditions else limit + 1
+
+    todos: list[TodoRecord] = []
+    while len(todos) <= limit:
+        batch = list(islice(candidates, batch_size))
+        if not batch:
+            break
+        query = (
+            records.todo_select()
+            .where(TodoModel.id.in_(batch), *conditions)
+            .order_by(TodoModel.id.desc() if descending else TodoModel.id)
+        )
+        todos.extend(await _fetch(db, query.limit(limit + 1 - len(todos))))
+
+    if len(todos) <= limit:
+        return todos, None
+
+    todos = todos[:limit]
+    return todos, encode_cursor(todos[-1].id)
+
+
+async def _get_page_by_deadline(
+    db: AsyncSession,
+    conditions: list,
+    cursor: str | None,
+    limit: int,
+    descending: bool,
+) -> tuple[list[TodoRecord], str | None]:
+    """
+    締切あり・締切なしの2区間に分けて、それぞれを (deadline, id) / id の
+    インデックス順に読む。NULLの位置を式で並べ替えるとインデックスが使えず
+    一時B-treeでのソートになるため、区間ごとのクエリにしている。
+    """
+    segments = ["dated", "undated"]
+    if descending:
+        segments.reverse()
+
+    last_deadline = last_id = None
+    if cursor:
+        last_deadline, last_id = decode_cursor(cursor, 2)
+        # 締切は ISO 8601 の文字列か null、id は整数でなければ400にする
+        last_deadline = parse_datetime(last_deadline)
+        check_id(last_id)
+        current = "undated" if last_deadline is None else "dated"
+        segments = segments[segments.index(current) :]
+
+    todos: list[TodoRecord] = []
+    for segment in segments:
+        query = records.todo_select().where(*conditions)
+        resume = cursor and segment == ("undated" if last_deadline is None else "dated")
+        if segment == "dated":
+            query = query.where(TodoModel.deadline.is_not(None))
+            keys = tuple_(TodoModel.deadline, TodoModel.id)
+            if resume:
+                bound = tuple_(
+                    literal(last_deadline, TodoModel.deadline.type), literal(last_id)
+                )
+                query = query.where(keys < bound if descending else keys > bound)
+            if descending:
+                query = query.order_by(TodoModel.deadline.desc(), TodoModel.id.desc())
+            else:
+                query = query.order_by(TodoModel.deadline, TodoModel.id)
+        else:
+            query = query.where(TodoModel.deadline.is_(None))
+            if resume:
+                query = query.where(
+                    TodoModel.id < last_id if descending else TodoModel.id > last_id
+                )
+            query = query.order_by(TodoModel.id.desc() if descending else TodoModel.id)
 
-def delete(db: Session, todo_model_id: int) -> int | None:
-    todo_model = db.query(TodoModel).get(todo_model_id)
-    if todo_model is None:
+        todos.extend(await _fetch(db, query.limit(limit + 1 - len(todos))))
+        if len(todos) > limit:
+            break
+
+    if len(todos) <= limit:
+        return todos, None
+
+    todos = todos[:limit]
+    last = todos[-1]
+    return todos, encode_cursor(last.deadline, last.id)
+
+
+async def search(
+    db: AsyncSession, q: str, cursor: str | None = None, limit: int = 100
+) -> tuple[list[TodoRecord], str | None]:
+    """
+    ToDoのcontentを全文検索する。
+
+    3文字以上は todo_fts (FTS5 trigram) で検索し、bm25スコアの良い順に並べる。
+    ページングは (スコア, id) のキーセットで行う。
+    2文字以下は索引が使えないため LIKE による部分一致でid順に返す。
+
+    Returns:
+        tuple[list[TodoRecord], str | None]: ToDoのリストと次ページのカーソル。
+    """
+    if len(q) < TRIGRAM_MIN_LENGTH:
+        return await _search_like(db, q, cursor, limit)
+
+    fts = literal_column("todo_fts")
+    score = func.bm25(fts)
+    # 検索語全体を1つのフレーズとして扱い、FTS5の演算子として解釈させない
+    phrase = '"' + q.replace('"', '""') + '"'
+    query = select(todo_fts_table.c.rowid, score).where(fts.match(phrase))
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        check_id(last_id)
+        # bm25 のスコアは数値 (bool は int のサブクラスなので除く)
+        if not isinstance(last_score, (int, float)) or isinstance(last_score, bool):
+            raise invalid_cursor()
+        query = query.where(
+            or_(
+                score > last_score,
+                and_(score == last_score, todo_fts_table.c.rowid > last_id),
+            )
+        )
+    hits = (
+        await db.execute(query.order_by(score, todo_fts_table.c.rowid).limit(limit + 1))
+    ).all()
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor(hits[-1][1], hits[-1][0])
+
+    ids = [todo_id for todo_id, _ in hits]
+    todos_by_id = {
+        todo_record.id: todo_record
+        for todo_record in await _fetch(
+            db, records.todo_select().where(TodoModel.id.in_(ids))
+        )
+    }
+    return [todos_by_id[i] for i in ids if i in todos_by_id], next_cursor
+
+
+async def _search_like(
+    db: AsyncSession, q: str, cursor: str | None, limit: int
+) -> tuple[list[TodoRecord], str | None]:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    query = records.todo_select().where(
+        TodoModel.content.like(f"%{escaped}%", escape="\\")
+    )
+    if cursor:
+        query = query.where(TodoModel.id > decode_id_cursor(cursor))
+
+    todos = await _fetch(db, query.order_by(TodoModel.id).limit(limit + 1))
+    if len(todos) <= limit:
+        return todos, None
+    todos = todos[:limit]
+    return todos, encode_cursor(todos[-1].id)
+
+
+def _todo_deps(todo_record: TodoRecord) -> set:
+    return {todo_dep(todo_record.id), *(tag_dep(t.id) for t in todo_record.tags)}
+
+
+async def get_by_id_json(
+    db: AsyncSession, todo_id: int, etag: str
+) -> tuple[bytes, str] | None:
+    """
+    get_by_id の結果をJSONにしたものとそのETagを、読み取りキャッシュ経由で返す。
+
+    etag は読み込みと同じトランザクションで求めた現在のETag。キャッシュには本文と一緒に保存し、
+    キャッシュから返すときは保存したときのETagを返す (他のワーカーが書き込んだ後でも、
+    古い本文が新しいETagで返らないようにする)。
+    """
+    key = ("todo", todo_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = response_cache.version
+    todo_record = await get_by_id(db, todo_id)
+    if todo_record is None:
+        return None
+    body = serialization.dump_todo(todo_record)
+    response_cache.set(key, (body, etag), _todo_deps(todo_record), version)
+    return body, etag
+
+
+async def get_page_json(
+    db: AsyncSession,
+    cursor: str | None = None,
+    limit: int = 100,
+    order_by: str = "id",
+    direction: str = "asc",
+    filters: TodoFilterSchema | None = None,
+    etag: str = "",
+) -> tuple[bytes, str | None, str]:
+    """
+    get_page の結果をJSONにしたものと次ページのカーソルとETagを、読み取りキャッシュ経由で返す。
+    ETag は get_by_id_json と同じく、キャッシュに保存したときの値を返す。
+    """
+    key = ("todo-page", cursor, limit, order_by, direction, filters)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = response_cache.version
+    todos, next_cursor = await get_page(
+        db,
+        cursor=cursor,
+        limit=limit,
+        order_by=order_by,
+        direction=direction,
+        filters=filters,
+    )
+    body = serialization.dump_todos(todos)
+    deps = {TODO_LIST_DEP}
+    if filters is not None:
+        # タグの付け外しで絞り込み結果に入る・外れるToDoがあるため
+        deps |= {tag_dep(tag_id) for tag_id in filters.tag_id_set}
+    for todo_record in todos:
+        deps |= _todo_deps(todo_record)
+    response_cache.set(key, (body, next_cursor, etag), deps, version)
+    return body, next_cursor, etag
+
+
+async def update(
+    db: AsyncSession, todo_model_id: int, update_todo_schema: UpdateTodoSchema
+) -> TodoSchema | None:
+    """
+    UPDATE ... RETURNING で更新後の行を受け取り、タグだけを追加で読み込む。
+    """
+    table = TodoModel.__table__
+    update_todo_schema_obj = update_todo_schema.model_dump(exclude_unset=True)
+    try:
+        row = (
+            await db.execute(
+                sql_update(table)
+                .where(table.c.id == todo_model_id)
+                # 空の更新でもupdated_atを進めてRETURNINGを得る
+                .values(updated_at=func.now(), **update_todo_schema_obj)
+                .returning(*table.c)
+            )
+        ).one_or_none()
+    except IntegrityError:
+        await _raise_content_conflict(db)
+    if row is None:
         return None
-    db.delete(todo_model)
-    db.commit()
-    return todo_model_id
+
+    tags = await _get_tags_of_todo(db, todo_model_id)
+    await db.commit()
+    # タグ側に埋め込まれたこのToDoも todo_dep で無効化される
+    response_cache.invalidate(
+        todo_dep(todo_model_id),
+        *((TODO_LIST_DEP,) if LIST_KEYS & update_todo_schema_obj.keys() else ()),
+    )
+    event_bus.publish("todo.updated", {"id": todo_model_id, **update_todo_schema_obj})
+    return TodoSchema.model_validate({**row._mapping, "tags": tags})
+
+
+async def delete(db: AsyncSession, todo_model_id: int) -> int | None:
+    """
+    todo_tagsの紐付けとToDo本体を直接DELETEする (ORMでの読み込みは行わない)。
+    """
+    table = TodoModel.__table__
+    await db.execute(
+        sql_delete(todo_tag_association_table).where(
+            todo_tag_association_table.c.todo_id == todo_model_id
+        )
+    )
+    deleted_id = await db.scalar(
+        sql_delete(table).where(table.c.id == todo_model_id).returning(table.c.id)
+    )
+    await db.commit()
+    if deleted_id is not None:
+        response_cache.invalidate(todo_dep(deleted_id), TODO_LIST_DEP)
+        tag_index.remove_todos([deleted_id])
+        event_bus.publish("todo.deleted", {"id": deleted_id})
+    return deleted_id
+
+
+async def _get_tags_of_todo(db: AsyncSession, todo_id: int) -> list:
+    tag_table = Tag.__table__
+    rows = await db.execute(
+        select(tag_table)
+        .join(
+            todo_tag_association_table,
+            todo_tag_association_table.c.tag_id == tag_table.c.id,
+        )
+        .where(todo_tag_association_table.c.todo_id == todo_id)
+        .order_by(tag_table.c.id)
+    )
+    return [row._mapping for row in rows]
 
 
-def add_tag_to_todo(db: Session, todo: TodoModel, tag: Tag) -> Optional[TodoModel]:
+async def _touch(db: AsyncSession, todo_id: int) -> TodoSchema:
+    """
+    タグの付け外しでToDoのupdated_atを進め、その行と現在のタグからレスポンスを作る。
+    """
+    table = TodoModel.__table__
+    row = (
+        await db.execute(
+            sql_update(table)
+            .where(table.c.id == todo_id)
+            .values(updated_at=func.now())
+            .returning(*table.c)
+        )
+    ).one()
+    tags = await _get_tags_of_todo(db, todo_id)
+    return TodoSchema.model_validate({**row._mapping, "tags": tags})
+
+
+async def _raise_link_target_not_found(db: AsyncSession, todo_id: int, tag_id: int):
+    if await db.get(TodoModel, todo_id) is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    if await db.get(Tag, tag_id) is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+
+
+async def add_tag_to_todo(db: AsyncSession, todo_id: int, tag_id: int) -> TodoSchema:
     """
     指定されたToDoにTagを紐づける
+
+    todo_tagsへ直接INSERTし、ToDoとTagの存在確認も同じ文のEXISTSで行う。
+    行が返らなかった場合だけ、原因(404か409か)を調べる。
     """
-    tag_ids_on_todo = [t.id for t in todo.tags]
-    # logging.info(f"Checking if tag {tag.id} is in todo {todo.id}'s tags: {tag_ids_on_todo}") # ← 削除
-
-    if tag.id not in tag_ids_on_todo:
-        # logging.info(f"★★★ ADDING TAG {tag.id} TO TODO {todo.id} ★★★") # ← 削除
-        todo.tags.append(tag)
-        db.add(todo)
-        db.commit()
-        # logging.info(f"★★★ COMMIT SUCCESSFUL for adding tag {tag.id} to todo {todo.id} ★★★") # ← 削除
-    # else: # elseブロック自体も不要なら削除して良い
-    # logging.warning(f"Tag {tag.id} ({tag.name}) is ALREADY associated with todo {todo.id} ({todo.content}). Skipping add.") # ← 削除
-    else:
+    todo_table = TodoModel.__table__
+    tag_table = Tag.__table__
+    stmt = (
+        sqlite_insert(todo_tag_association_table)
+        .from_select(
+            ["todo_id", "tag_id"],
+            select(literal(todo_id), literal(tag_id)).where(
+                exists().where(todo_table.c.id == todo_id),
+                exists().where(tag_table.c.id == tag_id),
+            ),
+        )
+        .on_conflict_do_nothing()
+        .returning(todo_tag_association_table.c.todo_id)
+    )
+    inserted = await db.scalar(stmt)
+
+    if inserted is None:
+        await db.rollback()
+        await _raise_link_target_not_found(db, todo_id, tag_id)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="そのタグは既にこのtodoに追加されています。",
         )
-    # 最終的に最新のTodoオブジェクトを返す
-    return get_by_id(db, todo.id)
 
+    # 最終的に最新のTodoを返す
+    todo_schema = await _touch(db, todo_id)
+    await db.commit()
+    response_cache.invalidate(todo_dep(todo_id), tag_dep(tag_id))
+    tag_index.add_link(todo_id, tag_id)
+    event_bus.publish("todo.tag_added", {"todo_id": todo_id, "tag_id": tag_id})
+    return todo_schema
 
-def remove_tag_from_todo(db: Session, todo_id: int, tag_id: int) -> Optional[TodoModel]:
+
+async def remove_tag_from_todo(
+    db: AsyncSession, todo_id: int, tag_id: int
+) -> Optional[TodoSchema]:
     """
     指定されたToDoから指定されたTagの紐付けを解除する。
-    中間テーブル (todo_tags) から対応する行を削除する。
+    中間テーブル (todo_tags) から対応する行を直接削除する。
 
     Args:
-        db (Session): SQLAlchemyデータベースセッション。
+        db (AsyncSession): SQLAlchemyデータベースセッション。
         todo_id (int): 対象となるToDoのID。
         tag_id (int): 削除するTagのID。
 
     Returns:
-        Optional[TodoModel]: 更新後のToDoオブジェクト。ToDoまたはTagが見つからない場合はNone。
+        Optional[TodoSchema]: 更新後のToDo。ToDoまたはTagが見つからない場合はNone。
     """
-    todo_item = get_by_id(db, todo_id)
-    if not todo_item:
-        print(f"ToDo not found with id: {todo_id}")
-        return None
+    deleted = await db.scalar(
+        sql_delete(todo_tag_association_table)
+        .where(
+            todo_tag_association_table.c.todo_id == todo_id,
+            todo_tag_association_table.c.tag_id == tag_id,
+        )
+        .returning(todo_tag_association_table.c.todo_id)
+    )
+
+    if deleted is None:
+        await db.rollback()
+        todo_table = TodoModel.__table__
+        row = (
+            await db.execute(select(todo_table).where(todo_table.c.id == todo_id))
+        ).one_or_none()
+        if row is None:
+            logger.info("ToDo not found with id: %d", todo_id)
+            return None
+        if await db.get(Tag, tag_id) is None:
+            logger.info("Tag not found with id: %d", tag_id)
+            return None
+        logger.info(
+            "Tag %d is not associated with todo %d. No action taken.", tag_id, todo_id
+        )
+        tags = await _get_tags_of_todo(db, todo_id)
+        return TodoSchema.model_validate({**row._mapping, "tags": tags})
 
-    tag_item = db.query(Tag).filter(Tag.id == tag_id).first()
-    if not tag_item:
-        print(f"Tag not found with id: {tag_id}")
+    logger.debug("Removing tag %d from todo %d", tag_id, todo_id)
+    todo_schema = await _touch(db, todo_id)
+    await db.commit()
+    response_cache.invalidate(todo_dep(todo_id), tag_dep(tag_id))
+    tag_index.remove_link(todo_id, tag_id)
+    event_bus.publish("todo.tag_removed", {"todo_id": todo_id, "tag_id": tag_id})
+    return todo_schema
+
+
+async def export_rows(db: AsyncSession) -> AsyncIterator[dict]:
+    """
+    エクスポート用にToDoをid順に1行ずつ返す。
+
+    ORMを通さずCoreのselectを yield_per で少しずつ読むので、アイデンティティマップに
+    行が溜まらず、件数によらずメモリ使用量は一定になる。
+    タグ名は相関サブクエリの json_group_array で同じ文の中で集約する (N+1にならない)。
+    """
+    table = TodoModel.__table__
+    tag_table = Tag.__table__
+    tag_names = (
+        select(func.json_group_array(tag_table.c.name))
+        .select_from(
+            todo_tag_association_table.join(
+                tag_table, tag_table.c.id == todo_tag_association_table.c.tag_id
+            )
+        )
+        .where(todo_tag_association_table.c.todo_id == table.c.id)
+        .scalar_subquery()
+    )
+    result = await db.stream(
+        select(table, tag_names.label("tags"))
+        .order_by(table.c.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async for row in result:
+        yield {
+            "id": row.id,
+            "content": row.content,
+            "completed": row.completed,
+            # APIのレスポンスと同じく締切は日付で出力する
+            "deadline": row.deadline.date() if row.deadline else None,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "tags": json.loads(row.tags),
+        }
+
+
+async def index_rows(
+    db: AsyncSession, after_id: int | None, limit: int
+) -> AsyncIterator[dict]:
+    """
+    トップページ用に、id順のToDoを after_id より後ろから limit 件まで1行ずつ返す。
+
+    export_rows と同じく yield_per で少しずつ読むので、最初の行は件数によらず
+    すぐに返り、描画を始められる。タグは id と name を json_group_array で集約する。
+
+    Args:
+        db (AsyncSession): SQLAlchemyデータベースセッション。
+        after_id (int | None): 前ページの最後のToDoのID。
+        limit (int): 返す件数の上限。
+
+    Returns:
+        AsyncIterator[dict]: ToDoの行 (tags は {"id", "name"} のリスト)。
+    """
+    table = TodoModel.__table__
+    query = _index_select().order_by(table.c.id).limit(limit)
+    if after_id is not None:
+        query = query.where(table.c.id > after_id)
+    result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for row in result:
+        yield {**row._mapping, "tags": json.loads(row.tags)}
+
+
+async def index_row(db: AsyncSession, todo_id: int) -> dict | None:
+    """
+    トップページの1行ぶんのToDoを index_rows と同じ形で返す。
+    変更イベントを受け取ったクライアントが、その行だけを描画し直すのに使う。
+    """
+    table = TodoModel.__table__
+    row = (await db.execute(_index_select().where(table.c.id == todo_id))).one_or_none()
+    if row is None:
         return None
+    return {**row._mapping, "tags": json.loads(row.tags)}
+
+
+def _index_select():
+    # タグは id と name だけを json_group_array で集約する
+    table = TodoModel.__table__
+    tag_table = Tag.__table__
+    tags = (
+        select(
+            func.json_group_array(
+                func.json_object("id", tag_table.c.id, "name", tag_table.c.name)
+            )
+        )
+        .select_from(
+            todo_tag_association_table.join(
+                tag_table, tag_table.c.id == todo_tag_association_table.c.tag_id
+            )
+        )
+        .where(todo_tag_association_table.c.todo_id == table.c.id)
+        .scalar_subquery()
+    )
+    return select(table, tags.label("tags"))
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield start, items[start : start + size]
+
+
+async def bulk_create(
+    db: AsyncSession,
+    create_todo_schemas: List[CreateTodoSchema],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> List[BulkResultItemSchema]:
+    """
+    ToDoを一括作成する。
+
+    チャンクごとに INSERT ... ON CONFLICT DO NOTHING RETURNING を1回だけ発行してcommitする。
+    contentが既存のToDo、またはリクエスト内の先の要素と重複した要素は conflict になる。
+
+    Returns:
+        List[BulkResultItemSchema]: リクエストと同じ順番の要素ごとの結果。
+    """
+    table = TodoModel.__table__
+    results: List[Optional[BulkResultItemSchema]] = [None] * len(create_todo_schemas)
+    seen_contents = set()
+
+    for start, chunk in _chunks(create_todo_schemas, chunk_size):
+        rows = []
+        index_by_content = {}
+        for offset, create_todo_schema in enumerate(chunk):
+            index = start + offset
+            content = create_todo_schema.content
+            if content in seen_contents:
+                results[index] = BulkResultItemSchema(
+                    index=index,
+                    status="conflict",
+                    detail="リクエスト内でcontentが重複しています。",
+                )
+                continue
+            seen_contents.add(content)
+            index_by_content[content] = index
+            rows.append(
+                {
+                    "content": content,
+                    "deadline": create_todo_schema.deadline,
+                    "completed": False,
+                }
+            )
+
+        if rows:
+            stmt = (
+                sqlite_insert(table)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[table.c.content])
+                .returning(table.c.id, table.c.content)
+            )
+            created = {content: todo_id for todo_id, content in await db.execute(stmt)}
+            await db.commit()
+            response_cache.invalidate(TODO_LIST_DEP)
+            tag_index.add_todos(created.values())
+
+            for content, index in index_by_content.items():
+                if content in created:
+                    results[index] = BulkResultItemSchema(
+                        index=index, id=created[content], status="created"
+                    )
+                    event_bus.publish(
+                        "todo.created",
+                        {
+                            "id": created[content],
+                            "content": content,
+                            "deadline": create_todo_schemas[index].deadline,
+                            "completed": False,
+                        },
+                    )
+                else:
+                    results[index] = BulkResultItemSchema(
+                        index=index,
+                        status="conflict",
+                        detail="同じcontentのToDoが既に存在します。",
+                    )
+
+    return results
+
+
+async def bulk_update(
+    db: AsyncSession,
+    update_todo_schemas: List[BulkUpdateTodoItemSchema],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> List[BulkResultItemSchema]:
+    """
+    ToDoを一括更新する。
+
+    更新する項目の組み合わせごとに UPDATE を executemany でまとめ、全体を1回のcommitで適用する。
+    存在しないidは not_found、リクエスト内で重複したidの2つ目以降と、
+    すべて適用した後に他のToDoとcontentが重複する要素は conflict になる。
+    contentの一意性は適用後の状態で判定するので、ToDoどうしでcontentを入れ替えられる。
+    """
+    table = TodoModel.__table__
+    results: List[Optional[BulkResultItemSchema]] = [None] * len(update_todo_schemas)
+
+    current_contents = {}
+    for _, chunk in _chunks(
+        list({item.id for item in update_todo_schemas}), chunk_size
+    ):
+        current_contents.update(
+            (
+                await db.execute(
+                    select(table.c.id, table.c.content).where(table.c.id.in_(chunk))
+                )
+            ).all()
+        )
+    new_contents = list(
+        {item.content for item in update_todo_schemas if item.content is not None}
+    )
+    content_owner = {}
+    for _, chunk in _chunks(new_contents, chunk_size):
+        content_owner.update(
+            (
+                await db.execute(
+                    select(table.c.content, table.c.id).where(
+                        table.c.content.in_(chunk)
+                    )
+                )
+            ).all()
+        )
+
+    pending = {}
+    claimed_ids = set()
+    for index, item in enumerate(update_todo_schemas):
+        if item.id not in current_contents:
+            results[index] = BulkResultItemSchema(
+                index=index, id=item.id, status="not_found"
+            )
+        elif item.id in claimed_ids:
+            results[index] = BulkResultItemSchema(
+                index=index,
+                id=item.id,
+                status="conflict",
+                detail="リクエスト内でidが重複しています。",
+            )
+        else:
+            claimed_ids.add(item.id)
+            pending[index] = (
+                item.id,
+                item.model_dump(exclude_unset=True, exclude={"id"}),
+            )
+
+    moving = _reject_content_conflicts(
+        pending, current_contents, content_owner, results
+    )
+    pending = [(index, todo_id, values) for index, (todo_id, values) in pending.items()]
+
+    try:
+        # SQLiteは一意制約を1行ごとに確かめるので、入れ替えなどで移動先のcontentを
+        # まだ他の要素が持っている場合は、先に移動する行をすべて仮の値に退避させる。
+        # 仮の値はcontentの上限 (30文字) より長いので、実際のcontentとは重複しない
+        if any(content_owner.get(content) in moving for content in moving.values()):
+            placeholder = uuid.uuid4().hex
+            for _, chunk in _chunks(list(moving), chunk_size):
+                await db.execute(
+                    sql_update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values(content=bindparam("v_content")),
+                    [
+                        {"b_id": todo_id, "v_content": f"{placeholder}:{todo_id}"}
+                        for todo_id in chunk
+                    ],
+                )
+
+        groups = defaultdict(list)
+        for index, todo_id, values in pending:
+            if values:
+                params = {f"v_{key}": value for key, value in values.items()}
+                groups[tuple(sorted(values))].append({"b_id": todo_id, **params})
+        for keys, group in groups.items():
+            stmt = (
+                sql_update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values({key: bindparam(f"v_{key}") for key in keys})
+            )
+            for _, params in _chunks(group, chunk_size):
+                await db.execute(stmt, params)
+        await db.commit()
+    except IntegrityError:
+        # 事前チェックをすり抜けた制約違反は、要素ごとに適用し直して該当要素だけを失敗させる
+        await db.rollback()
+        pending = await _update_one_by_one(db, pending, results)
+
+    for index, todo_id, values in pending:
+        results[index] = BulkResultItemSchema(index=index, id=todo_id, status="updated")
+        if values:
+            event_bus.publish("todo.updated", {"id": todo_id, **values})
+    response_cache.invalidate(
+        *(todo_dep(todo_id) for _, todo_id, _ in pending),
+        *(
+            (TODO_LIST_DEP,)
+            if any(LIST_KEYS & values.keys() for _, _, values in pending)
+            else ()
+        ),
+    )
 
-    if tag_item in todo_item.tags:
-        print(
-            f"Removing tag {tag_id} ({tag_item.name}) from todo {todo_id} ({todo_item.content})"
-        )  # ログ出力
-        todo_item.tags.remove(tag_item)
-        db.add(todo_item)
-        db.commit()
-        print("Commit successful.")
-    else:
-        print(
-            f"Tag {tag_id} ({tag_item.name}) is not associated with todo {todo_id} ({todo_item.content}). No action taken."
-        )
-        pass
-
-    return get_by_id(db, todo_id)
+    return results
+
+
+def _reject_content_conflicts(
+    pending: dict,
+    current_contents: dict[int, str],
+    content_owner: dict[str, int],
+    results: List[Optional[BulkResultItemSchema]],
+) -> dict[int, str]:
+    """
+    すべて適用した後にcontentが他のToDoと重複する要素を conflict にし、pending から除く。
+
+    contentを変えないToDoは今のcontentを持ち続けるので、そのcontentへ変える要素が負ける。
+    同じcontentへ変える要素どうしでは、リクエストの先の要素が勝つ。
+    負けた要素のToDoは元のcontentのまま残り、それが別の要素の衝突になることがあるので、
+    負ける要素がなくなるまで繰り返す。
+
+    Args:
+        pending (dict): 要素の位置 → (id, 更新する値)。
+        current_contents (dict[int, str]): id → 今のcontent。
+        content_owner (dict[str, int]): 変更先のcontent → 今そのcontentを持つToDoのid。
+        results (List[BulkResultItemSchema | None]): conflict を書き込む要素ごとの結果。
+
+    Returns:
+        dict[int, str]: contentが変わるToDoのid → 変更後のcontent。
+    """
+    while True:
+        moving = {}
+        for index, (todo_id, values) in pending.items():
+            content = values.get("content")
+            if content is not None and content != current_contents[todo_id]:
+                moving[todo_id] = (index, content)
+
+        rejected = []
+        claimed = set()
+        for todo_id, (index, content) in moving.items():
+            owner = content_owner.get(content)
+            if (owner is not None and owner not in moving) or content in claimed:
+                rejected.append(index)
+            else:
+                claimed.add(content)
+        if not rejected:
+            return {todo_id: content for todo_id, (_, content) in moving.items()}
+
+        for index in rejected:
+            todo_id, _ = pending.pop(index)
+            results[index] = BulkResultItemSchema(
+                index=index,
+                id=todo_id,
+                status="conflict",
+                detail="同じcontentのToDoが既に存在します。",
+            )
+
+
+async def _update_one_by_one(
+    db: AsyncSession, pending: list, results: List[Optional[BulkResultItemSchema]]
+) -> list:
+    table = TodoModel.__table__
+    applied = []
+    for index, todo_id, values in pending:
+        try:
+            if values:
+                await db.execute(
+                    sql_update(table).where(table.c.id == todo_id).values(**values)
+                )
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            results[index] = BulkResultItemSchema(
+                index=index, id=todo_id, status="conflict", detail=str(e.orig)
+            )
+        else:
+            applied.append((index, todo_id, values))
+    return applied
+
+
+async def bulk_delete(
+    db: AsyncSession, todo_ids: List[int], chunk_size: int = BULK_CHUNK_SIZE
+) -> List[BulkResultItemSchema]:
+    """
+    ToDoを一括削除する。紐づくtodo_tagsの行も同じトランザクションで削除する。
+
+    DELETE はチャンクごとに発行するが、commitは最後の1回だけなので、
+    途中で失敗した場合はどのToDoも削除されない。
+    リクエスト内で重複したidは、最初の要素だけが deleted で2つ目以降は not_found になる。
+    """
+    table = TodoModel.__table__
+    deleted_ids = set()
+
+    for _, chunk in _chunks(todo_ids, chunk_size):
+        # 先のチャンクで削除したidは、同じトランザクション内なのでもう見つからない
+        existing_ids = set(
+            await db.scalars(select(table.c.id).where(table.c.id.in_(chunk)))
+        )
+        if existing_ids:
+            await db.execute(
+                sql_delete(todo_tag_association_table).where(
+                    todo_tag_association_table.c.todo_id.in_(existing_ids)
+                )
+            )
+            await db.execute(sql_delete(table).where(table.c.id.in_(existing_ids)))
+            deleted_ids |= existing_ids
+
+    if deleted_ids:
+        await db.commit()
+        response_cache.invalidate(
+            TODO_LIST_DEP, *(todo_dep(todo_id) for todo_id in deleted_ids)
+        )
+        tag_index.remove_todos(deleted_ids)
+        for todo_id in sorted(deleted_ids):
+            event_bus.publish("todo.deleted", {"id": todo_id})
+
+    results = []
+    reported = set()
+    for index, todo_id in enumerate(todo_ids):
+        deleted = todo_id in deleted_ids and todo_id not in reported
+        reported.add(todo_id)
+        results.append(
+            BulkResultItemSchema(
+                index=index,
+                id=todo_id,
+                status="deleted" if deleted else "not_found",
+            )
+        )
+    return results
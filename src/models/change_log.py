@@ -0,0 +1,43 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    String,
+    Table,
+    func,
+)
+from app.database import Base
+
+# ↓ 差分同期 (/v1/todo/changes) 用の変更履歴。todo / tags / todo_tags のトリガーで書き込む
+
+# 対象 (ToDo・タグ・ToDoとタグの紐づけ) ごとに最後の変更の1行だけを持つ。
+# 変更のたびに古い行を消して新しい seq で入れ直すので、seq より後の行を読めば差分になる。
+# seq は AUTOINCREMENT なので、行を消しても番号は再利用されず単調に増える。
+# 削除された対象は deleted を立てた行 (トゥームストーン) として残し、古いものは圧縮で消す。
+change_log_table = Table(
+    "change_log",
+    Base.metadata,
+    Column("seq", Integer, primary_key=True),
+    # "todo" / "tag" / "todo_tag"
+    Column("entity", String, nullable=False),
+    # 対象でない側は0 (UNIQUEで重複を防ぐため NULL にしない)
+    Column("todo_id", Integer, nullable=False, server_default="0"),
+    Column("tag_id", Integer, nullable=False, server_default="0"),
+    Column("deleted", Boolean, nullable=False, server_default="0"),
+    Column(
+        "changed_at", DateTime, nullable=False, server_default=func.current_timestamp()
+    ),
+    Index("ix_change_log_entity", "entity", "todo_id", "tag_id", unique=True),
+    sqlite_autoincrement=True,
+)
+
+# 圧縮で消したトゥームストーンの seq の上限 (1行だけ)。
+# これより前の seq から同期しようとしたクライアントは、削除を取りこぼすので全件を取り直す
+change_log_state_table = Table(
+    "change_log_state",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("compacted_seq", Integer, nullable=False, server_default="0"),
+)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, Table
+from app.database import Base
+
+# todo / tags / todo_tags のいずれかが変更されるたびにトリガーで1ずつ増える1行だけのテーブル。
+# ETagの計算に使い、行を読まずに「変更があったか」を判定する。
+data_version_table = Table(
+    "data_version",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False, server_default="0"),
+)
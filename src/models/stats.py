@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Date, Integer, Table
+from app.database import Base
+
+# ↓ /v1/stats 用の集計テーブル。いずれも todo / tags / todo_tags のトリガーで更新する
+
+# ToDo全体の件数と完了件数 (1行だけ)
+todo_stats_table = Table(
+    "todo_stats",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("total", Integer, nullable=False, server_default="0"),
+    Column("completed", Integer, nullable=False, server_default="0"),
+)
+
+# タグごとの紐づくToDoの件数
+tag_stats_table = Table(
+    "tag_stats",
+    Base.metadata,
+    Column("tag_id", Integer, primary_key=True),
+    Column("todo_count", Integer, nullable=False, server_default="0"),
+)
+
+# 締切日ごとの未完了ToDoの件数。期限切れは時間とともに増えるので件数そのものは持てず、
+# 今日より前の日の合計 + 今日の分だけを数えて求める
+todo_deadline_stats_table = Table(
+    "todo_deadline_stats",
+    Base.metadata,
+    Column("deadline_date", Date, primary_key=True),
+    Column("open_count", Integer, nullable=False, server_default="0"),
+)
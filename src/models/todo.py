@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Boolean, DateTime, Integer, String, TIMESTAMP
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -14,6 +14,12 @@ from models.todo_tag import todo_tag_association_table
 
 class TodoModel(Base):
     __tablename__ = "todo"
+    # 一覧の絞り込み(完了状態・締切)と並び替えをインデックス順で読むための複合インデックス
+    __table_args__ = (
+        Index("ix_todo_completed_deadline_id", "completed", "deadline", "id"),
+        Index("ix_todo_completed_id", "completed", "id"),
+        Index("ix_todo_deadline_id", "deadline", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     # todo名の一意制約
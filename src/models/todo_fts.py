@@ -0,0 +1,9 @@
+from sqlalchemy import Integer, String, column, table
+
+# todo.content のFTS5 (trigram) 索引。仮想テーブルなのでBase.metadataには載せず、
+# 作成とtodoとの同期はマイグレーション内のトリガーで行う。
+todo_fts_table = table(
+    "todo_fts",
+    column("rowid", Integer),
+    column("content", String),
+)
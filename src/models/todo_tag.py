@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, Table
+from sqlalchemy import Column, ForeignKey, Index, Integer, Table
 from app.database import Base
 
 todo_tag_association_table = Table(
@@ -6,4 +6,6 @@ todo_tag_association_table = Table(
     Base.metadata,
     Column("todo_id", Integer, ForeignKey("todo.id"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+    # 主キー(todo_id, tag_id)の逆順。タグからToDoを引くときに使う
+    Index("ix_todo_tags_tag_id_todo_id", "tag_id", "todo_id"),
 )
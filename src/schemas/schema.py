@@ -2,7 +2,7 @@ from datetime import datetime, date
 
 # Fieldのimportを追加
 from pydantic import BaseModel, ConfigDict, Field
-from typing import List, Optional
+from typing import Annotated, List, Optional, Tuple
 
 
 class TagBase(BaseModel):
@@ -72,3 +72,131 @@ class TodoSchema(TodoBase):
     tags: List[TagForTodoResponse] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class TodoFilterSchema(BaseModel):
+    # ↓ 一覧の絞り込み条件。キャッシュのキーに使うため変更不可(ハッシュ可能)にする
+    completed: Optional[bool] = None
+    deadline_from: Optional[date] = None
+    deadline_to: Optional[date] = None
+    # いずれかのタグが付いているToDoに絞り込む
+    tag_ids: Tuple[int, ...] = ()
+    # ↓ タグ索引(ビットマップ)で解決するタグ条件。すべて付いている/いずれか付いている/どれも付いていない
+    tags_all: Tuple[int, ...] = ()
+    tags_any: Tuple[int, ...] = ()
+    tags_none: Tuple[int, ...] = ()
+
+    model_config = ConfigDict(frozen=True)
+
+    @property
+    def uses_tag_index(self) -> bool:
+        return bool(self.tags_all or self.tags_any or self.tags_none)
+
+    @property
+    def tag_id_set(self) -> set:
+        # 絞り込みに関わるすべてのタグid
+        return {*self.tag_ids, *self.tags_all, *self.tags_any, *self.tags_none}
+
+
+# ↓ 件数の集計(/v1/stats)用のスキーマ
+class TagStatsSchema(BaseModel):
+    id: int
+    name: str
+    todo_count: int
+
+
+class TagSuggestionSchema(BaseModel):
+    id: int
+    name: str
+    todo_count: int
+
+
+class StatsSchema(BaseModel):
+    total: int
+    completed: int
+    # 未完了で締切を過ぎたToDoの件数
+    overdue: int
+
+
+# ↓ インポート(/v1/import)用のスキーマ。エクスポートしたNDJSONの1行をそのまま読めるようにする
+class ImportTodoSchema(TodoBase):
+    # 指定された場合はidも復元する
+    id: Optional[int] = Field(None, ge=1)
+    completed: bool = False
+    # タグ名。存在しないタグは作成する
+    tags: List[Annotated[str, Field(min_length=1, max_length=30)]] = []
+
+
+class ImportErrorSchema(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportResultSchema(BaseModel):
+    rows: int = 0
+    created: int = 0
+    # content または id が既存のToDoと重複したため取り込まなかった行
+    skipped: int = 0
+    invalid: int = 0
+    tags_created: int = 0
+    links: int = 0
+    seconds: float = 0
+    rows_per_second: float = 0
+    # 最初の IMPORT_MAX_ERRORS 件だけ返す
+    errors: List[ImportErrorSchema] = []
+
+
+# ↓ 一括操作(/v1/todo/bulk)用のスキーマ
+BULK_MAX_ITEMS = 10000
+
+
+class BulkCreateTodoSchema(BaseModel):
+    items: List[CreateTodoSchema] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkUpdateTodoItemSchema(UpdateTodoSchema):
+    id: int
+
+
+class BulkUpdateTodoSchema(BaseModel):
+    items: List[BulkUpdateTodoItemSchema] = Field(
+        ..., min_length=1, max_length=BULK_MAX_ITEMS
+    )
+
+
+class BulkDeleteTodoSchema(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class BulkResultItemSchema(BaseModel):
+    # リクエスト内での位置 (0始まり)
+    index: int
+    id: Optional[int] = None
+    # "created" / "updated" / "deleted" / "conflict" / "not_found"
+    status: str
+    detail: Optional[str] = None
+
+
+class BulkResultSchema(BaseModel):
+    results: List[BulkResultItemSchema]
+
+
+# ↓ 差分同期(/v1/todo/changes)用のスキーマ
+class TodoTagLinkSchema(BaseModel):
+    todo_id: int
+    tag_id: int
+
+
+class ChangesSchema(BaseModel):
+    # 作成・更新されたもの (現在の値)
+    todos: List[TodoForTagResponse] = []
+    tags: List[TagForTodoResponse] = []
+    todo_tags: List[TodoTagLinkSchema] = []
+    # 削除されたもの (トゥームストーン)
+    deleted_todos: List[int] = []
+    deleted_tags: List[int] = []
+    deleted_todo_tags: List[TodoTagLinkSchema] = []
+    # 次の since に渡すトークン
+    next_token: str
+    # true なら続きがあるので、すぐに next_token で取得する
+    has_more: bool
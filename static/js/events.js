@@ -0,0 +1,19 @@
+/**
+ * サーバーからの変更イベント (Server-Sent Events) の受信を担当するモジュール
+ */
+
+/**
+ * [API] ToDo・タグの変更イベントを購読する
+ * API: GET /v1/events
+ * 接続が切れた場合はEventSourceが自動で再接続し、Last-Event-ID の続きから受け取る。
+ * @param {Object} handlers - イベント名 ("todo.updated" など) → data を受け取る関数
+ * @returns {EventSource|null} EventSourceに対応していないブラウザでは null
+ */
+export function subscribeToChanges(handlers) {
+    if (typeof EventSource === 'undefined') return null;
+    const source = new EventSource('/v1/events');
+    Object.entries(handlers).forEach(([type, handler]) => {
+        source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+    });
+    return source;
+}
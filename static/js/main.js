@@ -5,25 +5,25 @@
 
 // APIモジュールから関数をインポート
 import { addTagToTodo, removeTagFromTodo, deleteTodo, toggleTodoStatus } from './todo.js';
-import { fetchTags, createTag, deleteTag } from './tag.js';
+import { fetchTags, suggestTags, createTag, deleteTag } from './tag.js';
 
 // UIモジュールから関数をインポート
-import { populateTagDropdowns, populateTagManagementList } from './ui.js';
+import { populateTagSuggestions, populateTagManagementList } from './ui.js';
+import { subscribeToChanges } from './events.js';
 
-// グローバル変数として、利用可能なタグのリストを保持する
+// グローバル変数として、利用可能なタグのリストを保持する (タグ管理リスト用)
 let availableTags = [];
 
 /**
  * ページ読み込み完了時に実行されるメイン関数
  * タグ一覧を取得し、UIを更新する
+ * (タグ管理リストは全タグを表示する。タグ追加欄の候補は入力に合わせて /v1/tag/suggest から引く)
  */
 async function loadInitialData() {
     try {
         availableTags = await fetchTags(); // API経由でタグを取得
         console.log('Available tags loaded:', availableTags);
         
-        // 取得したタグで、UIを更新
-        populateTagDropdowns(availableTags);
         // タグ管理リストを更新 (削除ハンドラを渡す)
         populateTagManagementList(availableTags, handleTagDelete); 
         
@@ -47,14 +47,19 @@ async function loadInitialData() {
  * [HTML onclick] ToDoにタグを追加
  */
 window.addTag = async function(todoId) {
-    const selectElement = document.getElementById(`tag-select-${todoId}`);
-    const tagId = selectElement.value;
-    if (!tagId) {
-        alert('追加するタグを選択してください。');
+    const inputElement = document.getElementById(`tag-input-${todoId}`);
+    const tagName = inputElement.value.trim();
+    if (!tagName) {
+        alert('追加するタグの名前を入力してください。');
         return;
     }
     try {
-        await addTagToTodo(todoId, tagId); // API呼び出し
+        const tag = await findTagByName(tagName);
+        if (!tag) {
+            alert(`タグ「${tagName}」はありません。先にタグを作成してください。`);
+            return;
+        }
+        await addTagToTodo(todoId, tag.id); // API呼び出し
         alert('タグが追加されました！');
         window.location.reload(); // 成功したらリロード (一番簡単なUI更新)
     } catch (error) {
@@ -124,7 +129,6 @@ async function handleTagDelete(tagId, tagName) {
 
         // UIを動的に更新 (リロードの代わり)
         availableTags = availableTags.filter(tag => tag.id !== tagId); // グローバルリストから削除
-        populateTagDropdowns(availableTags); // 全てのドロップダウンを更新
         populateTagManagementList(availableTags, handleTagDelete); // タグ管理リストを更新
         
     } catch (error) {
@@ -154,5 +158,170 @@ window.createTag = async function(event) {
 };
 
 
+// -----------------------------------------------------------------
+// タグ追加欄の入力候補
+// -----------------------------------------------------------------
+// 入力のたびに /v1/tag/suggest から、使われている順の候補を datalist に入れる。
+// 全タグを読み込んでおく必要はない。
+
+const SUGGEST_DELAY_MS = 100;
+// 最後に表示した候補 (名前 → タグ)。候補から選んだ名前はここでidが分かる
+let lastSuggestions = new Map();
+let suggestTimer = null;
+let suggestRequest = 0;
+
+async function showTagSuggestions(prefix) {
+    const request = ++suggestRequest;
+    try {
+        const tags = await suggestTags(prefix);
+        // 後から送った入力の候補が先に届いていれば、古い候補では上書きしない
+        if (request !== suggestRequest) return;
+        lastSuggestions = new Map(tags.map(tag => [tag.name, tag]));
+        populateTagSuggestions(tags);
+    } catch (error) {
+        console.error('Error suggesting tags:', error);
+    }
+}
+
+/**
+ * 入力されたタグ名のタグを探す。候補から選ばれていなければ、その名前で候補を引き直す
+ */
+async function findTagByName(tagName) {
+    if (lastSuggestions.has(tagName)) return lastSuggestions.get(tagName);
+    const tags = await suggestTags(tagName, 100);
+    return tags.find(tag => tag.name === tagName) ?? null;
+}
+
+function isTagInput(element) {
+    return element instanceof HTMLInputElement && element.name === 'tag_name';
+}
+
+document.addEventListener('input', (event) => {
+    if (!isTagInput(event.target)) return;
+    clearTimeout(suggestTimer);
+    const prefix = event.target.value.trim();
+    suggestTimer = setTimeout(() => showTagSuggestions(prefix), SUGGEST_DELAY_MS);
+});
+
+// 何も入力していなくても、よく使われているタグを候補に出す
+document.addEventListener('focusin', (event) => {
+    if (isTagInput(event.target)) showTagSuggestions(event.target.value.trim());
+});
+
+
+// -----------------------------------------------------------------
+// 無限スクロール
+// -----------------------------------------------------------------
+// 一覧の末尾の「次のページ」リンクが見えたら、次のページの行だけを
+// /todo/rows から受け取って一覧に追加する。JavaScriptが無効な場合は通常のリンクとして動く。
+
+const nextPageObserver = new IntersectionObserver(async (entries) => {
+    for (const entry of entries) {
+        if (!entry.isIntersecting) continue;
+        nextPageObserver.unobserve(entry.target);
+        await loadNextPage(entry.target);
+    }
+}, { rootMargin: '400px' });
+
+/**
+ * 次のページの行を読み込み、「次のページ」リンクの位置に差し込む
+ */
+async function loadNextPage(link) {
+    const sentinel = link.closest('li');
+    try {
+        const response = await fetch(`/todo/rows?cursor=${encodeURIComponent(link.dataset.cursor)}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const template = document.createElement('template');
+        template.innerHTML = await response.text();
+        sentinel.replaceWith(template.content);
+        observeNextPageLink();
+    } catch (error) {
+        // 失敗したらリンクを残し、クリックで通常のページ遷移ができるようにする
+        console.error('Error loading next page:', error);
+    }
+}
+
+function observeNextPageLink() {
+    const link = document.querySelector('#todo-list .next-page-link');
+    if (link) nextPageObserver.observe(link);
+}
+
+
+// -----------------------------------------------------------------
+// 他の画面での変更を反映する
+// -----------------------------------------------------------------
+// /v1/events から届いた変更だけをページに反映し、一覧全体は読み直さない。
+
+function findTodoRow(todoId) {
+    return document.querySelector(`#todo-list li[data-todo-id="${todoId}"]`);
+}
+
+/**
+ * ToDoの行を /todo/{id}/row で描画し直す。
+ * ページにない行は、一覧を末尾まで読み込み済みの場合だけ追加する
+ * (次のページが残っていれば、そのページを読み込んだときに表示される)。
+ */
+async function refreshTodoRow(todoId, { append = false } = {}) {
+    const list = document.getElementById('todo-list');
+    if (!list) return;
+    if (!findTodoRow(todoId) && (!append || list.querySelector('.next-page'))) return;
+    try {
+        const response = await fetch(`/todo/${todoId}/row`);
+        if (response.status === 404) {
+            findTodoRow(todoId)?.remove();
+            return;
+        }
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const template = document.createElement('template');
+        template.innerHTML = await response.text();
+        // 待っている間に行が追加・削除されていることがあるので、ここで探し直す
+        const row = findTodoRow(todoId);
+        if (row) {
+            row.replaceWith(template.content);
+        } else {
+            list.querySelector('li:not([data-todo-id])')?.remove(); // 「まだTodoはありません。」
+            list.appendChild(template.content);
+        }
+    } catch (error) {
+        console.error('Error refreshing todo row:', error);
+    }
+}
+
+function updateTagLists() {
+    populateTagManagementList(availableTags, handleTagDelete);
+}
+
+function subscribeToServerChanges() {
+    subscribeToChanges({
+        'todo.created': (todo) => refreshTodoRow(todo.id, { append: true }),
+        'todo.updated': (todo) => refreshTodoRow(todo.id),
+        'todo.deleted': (todo) => findTodoRow(todo.id)?.remove(),
+        'todo.tag_added': (link) => refreshTodoRow(link.todo_id),
+        'todo.tag_removed': (link) => refreshTodoRow(link.todo_id),
+        'tag.created': (tag) => {
+            if (availableTags.some(t => t.id === tag.id)) return;
+            availableTags = [...availableTags, tag].sort((a, b) => a.id - b.id);
+            updateTagLists();
+        },
+        'tag.updated': (tag) => {
+            if (tag.name === undefined) return;
+            availableTags = availableTags.map(t => (t.id === tag.id ? { ...t, name: tag.name } : t));
+            updateTagLists();
+            document.querySelectorAll(`#todo-list .tag[data-tag-id="${tag.id}"] .tag-name`)
+                .forEach(span => { span.textContent = tag.name; });
+        },
+        'tag.deleted': (tag) => {
+            availableTags = availableTags.filter(t => t.id !== tag.id);
+            updateTagLists();
+            document.querySelectorAll(`#todo-list .tag[data-tag-id="${tag.id}"]`)
+                .forEach(span => span.remove());
+        },
+        // 取りこぼしがあった (またはインポートで大量に変わった) ので、ページごと読み直す
+        'reset': () => window.location.reload(),
+    });
+}
+
 // ページのHTMLが読み込み終わったら、`loadInitialData` を実行して初期データを取得する
 document.addEventListener('DOMContentLoaded', loadInitialData);
+document.addEventListener('DOMContentLoaded', observeNextPageLink);
+document.addEventListener('DOMContentLoaded', subscribeToServerChanges);
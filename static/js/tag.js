@@ -19,6 +19,20 @@ export async function fetchTags() {
     }
 }
 
+/**
+ * [API] 名前が prefix で始まるタグを、使われている (紐づくToDoの多い) 順に取得する
+ * API: GET /v1/tag/suggest?prefix=&limit=
+ * サーバーのメモリ上の索引から引くので、入力のたびに呼んでもよい
+ */
+export async function suggestTags(prefix, limit = 10) {
+    const params = new URLSearchParams({ prefix, limit });
+    const response = await fetch(`/v1/tag/suggest?${params}`);
+    if (!response.ok) {
+        throw new Error(`Failed to suggest tags: ${response.statusText}`);
+    }
+    return await response.json(); // [{id, name, todo_count}, ...]
+}
+
 /**
  * [API] 新しいタグを作成する
  * API: POST /v1/tag/
@@ -3,24 +3,18 @@
  */
 
 /**
- * 取得したタグ一覧を使って、
- * ToDo一覧ページにある全てのタグ選択ドロップダウンの中身を生成する
+ * タグの候補で、タグ追加欄が共有する入力候補 (datalist#tag-suggestions) の中身を作り直す
+ * @param {Array} tags - /v1/tag/suggest が返したタグの配列
  */
-export function populateTagDropdowns(tags) {
-    const selects = document.querySelectorAll('select[name="tag_id"]');
-    selects.forEach(select => {
-        // 既存のオプションをクリア (「選択してください」の最初のオプションは残す)
-        while (select.options.length > 1) {
-            select.remove(1);
-        }
-        // タグの配列からオプションを追加
-        tags.forEach(tag => {
-            const option = document.createElement('option');
-            option.value = tag.id;
-            option.textContent = tag.name;
-            select.appendChild(option);
-        });
-    });
+export function populateTagSuggestions(tags) {
+    const datalist = document.getElementById('tag-suggestions');
+    if (!datalist) return;
+    datalist.replaceChildren(...tags.map(tag => {
+        const option = document.createElement('option');
+        option.value = tag.name;
+        option.label = `${tag.name} (${tag.todo_count})`;
+        return option;
+    }));
 }
 
 /**
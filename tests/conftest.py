@@ -0,0 +1,102 @@
+"""
+テスト用の設定。
+
+アプリの設定はimport時に環境変数から読むので、アプリのモジュールより先に環境変数を設定する。
+マイグレーションはテストの最初に1回だけ流し、できたDBファイルをテストごとにコピーして使う。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="todo-test-"))
+# アプリ本体 (app.database のエンジン) が使うDB。開発用の todo.db には触らない
+APP_DB = _TMP_DIR / "app.db"
+TEMPLATE_DB = _TMP_DIR / "template.db"
+
+os.environ["DATABASE_URL"] = f"sqlite:///{APP_DB}"
+os.environ.setdefault("API_VER_STR", "/v1")
+os.environ.setdefault("PROJECT_NAME", "todo-test")
+os.environ.setdefault("LOGGING_CONF", str(ROOT / "logging.json"))
+sys.path.insert(0, str(ROOT / "src"))
+# seed / bench / tool はリポジトリ直下のパッケージ
+sys.path.insert(1, str(ROOT))
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy.ext.asyncio import (  # noqa: E402
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.cache import response_cache  # noqa: E402
+from app.tag_index import tag_index  # noqa: E402
+from app.tag_names import tag_names  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def template_db() -> Path:
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "migration"))
+    command.upgrade(config, "head")
+    shutil.copy(APP_DB, TEMPLATE_DB)
+    return TEMPLATE_DB
+
+
+@pytest.fixture(autouse=True)
+def reset_in_process_state():
+    # プロセス内のキャッシュと索引は前のテストのDBの内容を持っているので捨てる
+    response_cache.clear()
+    tag_index.loaded = False
+    tag_names.loaded = False
+
+
+@pytest.fixture
+def db_path(template_db: Path, tmp_path: Path) -> Path:
+    path = tmp_path / "todo.db"
+    shutil.copy(template_db, path)
+    return path
+
+
+@pytest.fixture
+async def session_factory(db_path: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    yield async_sessionmaker(
+        bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(session_factory):
+    async with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+def client(template_db: Path):
+    """
+    アプリ本体を通したテスト用のクライアント。DBは空の状態から始まる。
+    """
+    from fastapi.testclient import TestClient
+
+    from app import database
+    from app.main import app
+
+    shutil.copy(template_db, APP_DB)
+    with TestClient(app) as test_client:
+        yield test_client
+        # プールの接続はこのクライアントのイベントループで作られたので、ここで閉じておく
+        test_client.portal.call(database.async_engine.dispose)
+        test_client.portal.call(database.read_async_engine.dispose)
@@ -0,0 +1,80 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app import assets
+from tool import build_static
+
+
+def test_hash_changes_with_imported_modules():
+    sources = {
+        "js/main.js": b"import { f } from './util.js';\nf();\n",
+        "js/util.js": b"export function f() {}\n",
+    }
+    outputs = build_static.hash_assets(sources)
+    main_name, main_content = outputs["js/main.js"]
+    util_name, _ = outputs["js/util.js"]
+
+    assert util_name.startswith("js/util.") and util_name.endswith(".js")
+    assert f"./{util_name.split('/')[-1]}" in main_content.decode()
+
+    sources["js/util.js"] = b"export function f() { return 1; }\n"
+    changed = build_static.hash_assets(sources)
+    assert changed["js/util.js"][0] != util_name
+    assert changed["js/main.js"][0] != main_name
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", ["br", "gzip"]),
+        ("gzip;q=0, br", ["br"]),
+        ("gzip;q=0.5", ["gzip"]),
+        ("*", ["br", "gzip"]),
+        ("identity", []),
+    ],
+)
+def test_accepted_encodings(header, expected):
+    scope = {"type": "http", "headers": [(b"accept-encoding", header.encode())]}
+    assert [name for name, _ in assets._accepted_encodings(scope)] == expected
+
+
+@pytest.fixture
+def static_client(tmp_path):
+    dist = tmp_path / "dist" / "js"
+    dist.mkdir(parents=True)
+    (dist / "main.abc.js").write_text("plain();\n")
+    (dist / "main.abc.js.gz").write_bytes(gzip.compress(b"compressed();\n"))
+    (tmp_path / "style.css").write_text("body {}\n")
+    app = Starlette(
+        routes=[Mount("/static", assets.PrecompressedStaticFiles(directory=tmp_path))]
+    )
+    with TestClient(app) as client:
+        yield client
+
+
+def test_serves_precompressed_files_with_immutable_caching(static_client):
+    response = static_client.get(
+        "/static/dist/js/main.abc.js", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "compressed();\n"
+    # 圧縮版でも元のファイルの種類を返す (mimetypes によって text/ か application/)
+    assert "javascript; charset=utf-8" in response.headers["content-type"]
+    assert response.headers["cache-control"] == assets.IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = static_client.get(
+        "/static/dist/js/main.abc.js", headers={"Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    assert response.text == "plain();\n"
+
+
+def test_files_outside_dist_are_revalidated(static_client):
+    response = static_client.get("/static/style.css")
+    assert response.status_code == 200
+    assert response.headers.get("cache-control") != assets.IMMUTABLE_CACHE_CONTROL
@@ -0,0 +1,59 @@
+import argparse
+import json
+
+import pytest
+
+from bench import __main__ as bench
+
+
+def _result(p95_ms: float, throughput_rps: float, statements: float) -> dict:
+    return {
+        "p95_ms": p95_ms,
+        "throughput_rps": throughput_rps,
+        "statements_per_request": statements,
+    }
+
+
+def _compare(tmp_path, baseline: dict, current: dict, threshold: float = 0.2) -> int:
+    paths = []
+    for name, results in (("baseline", baseline), ("current", current)):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps({"results": results}), encoding="utf-8")
+        paths.append(str(path))
+    return bench.compare(
+        argparse.Namespace(baseline=paths[0], current=paths[1], threshold=threshold)
+    )
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert bench.percentile(values, 0.5) == 51.0
+    assert bench.percentile(values, 0.99) == 99.0
+    assert bench.percentile([3.0], 0.95) == 3.0
+
+
+def test_compare_passes_within_threshold(tmp_path, capsys):
+    baseline = {"todo_list": _result(10, 100, 2)}
+    current = {"todo_list": _result(11.9, 81, 2), "new": _result(1, 1, 1)}
+
+    assert _compare(tmp_path, baseline, current) == 0
+    assert "0 regression(s)" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "current",
+    [_result(12.1, 100, 2), _result(10, 79, 2), _result(10, 100, 3)],
+    ids=["p95", "throughput", "statements"],
+)
+def test_compare_fails_on_regression(tmp_path, capsys, current):
+    baseline = {"todo_list": _result(10, 100, 2)}
+
+    assert _compare(tmp_path, baseline, {"todo_list": current}) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+def test_compare_lists_missing_scenarios(tmp_path, capsys):
+    baseline = {"todo_list": _result(10, 100, 2), "tag_list": _result(10, 100, 2)}
+
+    assert _compare(tmp_path, baseline, {"todo_list": _result(10, 100, 2)}) == 0
+    assert "missing    tag_list" in capsys.readouterr().out
@@ -0,0 +1,153 @@
+import pytest
+from sqlalchemy import select
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from models.todo import TodoModel
+from models.todo_tag import todo_tag_association_table
+from schemas.schema import BulkUpdateTodoItemSchema, CreateTagSchema, CreateTodoSchema
+
+pytestmark = pytest.mark.anyio
+
+
+def _statuses(results) -> list:
+    return [(result.index, result.id, result.status) for result in results]
+
+
+async def _contents(db) -> dict:
+    return dict((await db.execute(select(TodoModel.id, TodoModel.content))).all())
+
+
+async def _create(db, *contents: str) -> list[int]:
+    results = await todo_crud.bulk_create(
+        db, [CreateTodoSchema(content=content) for content in contents]
+    )
+    return [result.id for result in results]
+
+
+async def test_bulk_create_reports_conflicts_per_item(db):
+    await todo_crud.create(db, CreateTodoSchema(content="existing"))
+
+    results = await todo_crud.bulk_create(
+        db,
+        [
+            CreateTodoSchema(content="a"),
+            CreateTodoSchema(content="existing"),
+            CreateTodoSchema(content="b"),
+            CreateTodoSchema(content="a"),
+        ],
+        chunk_size=2,
+    )
+
+    assert [result.status for result in results] == [
+        "created",
+        "conflict",
+        "created",
+        "conflict",
+    ]
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    assert sorted((await _contents(db)).values()) == ["a", "b", "existing"]
+
+
+async def test_bulk_update_reports_not_found_and_duplicate_ids(db):
+    a, b = await _create(db, "a", "b")
+
+    results = await todo_crud.bulk_update(
+        db,
+        [
+            BulkUpdateTodoItemSchema(id=a, completed=True),
+            BulkUpdateTodoItemSchema(id=999, completed=True),
+            BulkUpdateTodoItemSchema(id=a, content="again"),
+            BulkUpdateTodoItemSchema(id=b, content="a"),
+        ],
+    )
+
+    assert _statuses(results) == [
+        (0, a, "updated"),
+        (1, 999, "not_found"),
+        (2, a, "conflict"),
+        (3, b, "conflict"),
+    ]
+    assert await _contents(db) == {a: "a", b: "b"}
+    todo = await todo_crud.get_by_id(db, a)
+    assert todo.completed
+
+
+async def test_bulk_delete_removes_links(db):
+    a, b = await _create(db, "a", "b")
+    tag = await tag_crud.create(db, CreateTagSchema(name="tag"))
+    for todo_id in (a, b):
+        await todo_crud.add_tag_to_todo(db, todo_id, tag.id)
+
+    results = await todo_crud.bulk_delete(db, [a, 999])
+
+    assert _statuses(results) == [(0, a, "deleted"), (1, 999, "not_found")]
+    assert await _contents(db) == {b: "b"}
+    links = await db.execute(
+        select(
+            todo_tag_association_table.c.todo_id, todo_tag_association_table.c.tag_id
+        )
+    )
+    assert links.all() == [(b, tag.id)]
+
+
+async def test_bulk_update_swaps_contents(db):
+    a, b, c = await _create(db, "a", "b", "c")
+
+    results = await todo_crud.bulk_update(
+        db,
+        [
+            BulkUpdateTodoItemSchema(id=a, content="b"),
+            BulkUpdateTodoItemSchema(id=b, content="c"),
+            BulkUpdateTodoItemSchema(id=c, content="a"),
+        ],
+    )
+
+    assert [result.status for result in results] == ["updated"] * 3
+    assert await _contents(db) == {a: "b", b: "c", c: "a"}
+
+
+async def test_bulk_update_conflict_keeps_the_loser_in_place(db):
+    # b が "c" になれない (c は動かない) ので b は "b" のまま残り、"b" への変更も負ける
+    a, b, c = await _create(db, "a", "b", "c")
+
+    results = await todo_crud.bulk_update(
+        db,
+        [
+            BulkUpdateTodoItemSchema(id=a, content="b"),
+            BulkUpdateTodoItemSchema(id=b, content="c"),
+        ],
+    )
+
+    assert [result.status for result in results] == ["conflict", "conflict"]
+    assert await _contents(db) == {a: "a", b: "b", c: "c"}
+
+
+async def test_bulk_update_first_item_wins_the_same_content(db):
+    a, b = await _create(db, "a", "b")
+
+    results = await todo_crud.bulk_update(
+        db,
+        [
+            BulkUpdateTodoItemSchema(id=a, content="new"),
+            BulkUpdateTodoItemSchema(id=b, content="new"),
+        ],
+    )
+
+    assert [result.status for result in results] == ["updated", "conflict"]
+    assert await _contents(db) == {a: "new", b: "b"}
+
+
+async def test_bulk_delete_reports_duplicate_ids_once(db):
+    a, b = await _create(db, "a", "b")
+
+    results = await todo_crud.bulk_delete(db, [a, b, a, 999, b], chunk_size=2)
+
+    assert _statuses(results) == [
+        (0, a, "deleted"),
+        (1, b, "deleted"),
+        (2, a, "not_found"),
+        (3, 999, "not_found"),
+        (4, b, "not_found"),
+    ]
+    assert await _contents(db) == {}
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from app.cache import ResponseCache, response_cache, tag_dep, todo_dep
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema, UpdateTagSchema
+
+
+def test_invalidate_removes_entries_of_the_dep():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    cache.set("todo", 1, [todo_dep(1), tag_dep(1)], cache.version)
+    cache.set("tag", 2, [tag_dep(1)], cache.version)
+    cache.set("other", 3, [todo_dep(2)], cache.version)
+
+    cache.invalidate(tag_dep(1))
+
+    assert cache.get("todo") is None
+    assert cache.get("tag") is None
+    assert cache.get("other") == 3
+
+
+def test_set_skips_values_read_before_an_invalidation():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    version = cache.version
+    cache.invalidate(todo_dep(1))
+
+    cache.set("todo", 1, [todo_dep(1)], version)
+
+    assert cache.get("todo") is None
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1, [], cache.version)
+    cache.set("b", 2, [], cache.version)
+    cache.get("a")
+    cache.set("c", 3, [], cache.version)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=10, ttl_seconds=5)
+    cache.set("a", 1, [], cache.version)
+
+    now[0] += 6
+
+    assert cache.get("a") is None
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = ResponseCache(max_entries=0, ttl_seconds=60)
+    cache.set("a", 1, [], cache.version)
+    assert cache.get("a") is None
+
+
+@pytest.mark.anyio
+async def test_todo_body_is_refreshed_when_its_tag_is_renamed(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+    tag = await tag_crud.create(db, CreateTagSchema(name="old"))
+    await todo_crud.add_tag_to_todo(db, todo.id, tag.id)
+
+    body, _ = await todo_crud.get_by_id_json(db, todo.id, '"v1"')
+    assert [t["name"] for t in json.loads(body)["tags"]] == ["old"]
+    assert response_cache.get(("todo", todo.id)) is not None
+
+    await tag_crud.update(db, tag.id, UpdateTagSchema(name="new"))
+
+    body, _ = await todo_crud.get_by_id_json(db, todo.id, '"v2"')
+    assert [t["name"] for t in json.loads(body)["tags"]] == ["new"]
+
+
+@pytest.mark.anyio
+async def test_cached_body_keeps_the_etag_it_was_stored_with(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+    await todo_crud.get_by_id_json(db, todo.id, '"v1"')
+
+    # 他のワーカーの書き込みで data_version だけが進んだ場合
+    _, etag = await todo_crud.get_by_id_json(db, todo.id, '"v2"')
+    assert etag == '"v1"'
+
+    _, _, etag = await todo_crud.get_page_json(db, etag='"v1"')
+    _, _, etag = await todo_crud.get_page_json(db, etag='"v2"')
+    assert etag == '"v1"'
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal
+from crud import changes
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema, UpdateTodoSchema
+
+
+async def _age_tombstones(db) -> None:
+    await db.execute(
+        text("UPDATE change_log SET changed_at = '2000-01-01 00:00:00' WHERE deleted")
+    )
+    await db.commit()
+
+
+@pytest.mark.anyio
+async def test_returns_upserts_and_tombstones_since_a_token(db):
+    tag = await tag_crud.create(db, CreateTagSchema(name="家"))
+    kept = await todo_crud.create(db, CreateTodoSchema(content="掃除"))
+    gone = await todo_crud.create(db, CreateTodoSchema(content="洗濯"))
+    await todo_crud.add_tag_to_todo(db, kept.id, tag.id)
+
+    first = await changes.get(db, since=None, limit=100)
+    assert [todo.content for todo in first.todos] == ["掃除", "洗濯"]
+    assert [tag.name for tag in first.tags] == ["家"]
+    assert [(link.todo_id, link.tag_id) for link in first.todo_tags] == [
+        (kept.id, tag.id)
+    ]
+    assert not first.has_more
+
+    await todo_crud.update(db, kept.id, UpdateTodoSchema(completed=True))
+    await todo_crud.remove_tag_from_todo(db, kept.id, tag.id)
+    await todo_crud.delete(db, gone.id)
+
+    second = await changes.get(db, since=first.next_token, limit=100)
+    # 同じ対象は最後の状態の1回だけ返る
+    assert [(todo.id, todo.completed) for todo in second.todos] == [(kept.id, True)]
+    assert second.deleted_todos == [gone.id]
+    assert [(link.todo_id, link.tag_id) for link in second.deleted_todo_tags] == [
+        (kept.id, tag.id)
+    ]
+    assert second.tags == [] and second.todo_tags == []
+
+    third = await changes.get(db, since=second.next_token, limit=100)
+    assert third.todos == [] and third.deleted_todos == []
+    assert third.next_token == second.next_token
+
+
+@pytest.mark.anyio
+async def test_pages_with_has_more(db):
+    for content in "abc":
+        await todo_crud.create(db, CreateTodoSchema(content=content))
+
+    contents, token, has_more = [], None, True
+    while has_more:
+        page = await changes.get(db, since=token, limit=2)
+        contents += [todo.content for todo in page.todos]
+        token, has_more = page.next_token, page.has_more
+
+    assert contents == ["a", "b", "c"]
+
+
+@pytest.mark.anyio
+async def test_compaction_makes_older_tokens_gone(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+    old_token = (await changes.get(db, since=None, limit=100)).next_token
+    await todo_crud.delete(db, todo.id)
+    # 削除を読み終えたトークンは、圧縮後も使える
+    current_token = (await changes.get(db, since=old_token, limit=100)).next_token
+
+    assert await changes.compact(db, timedelta(days=7)) == 0
+    await _age_tombstones(db)
+    assert await changes.compact(db, timedelta(days=7)) == 1
+
+    with pytest.raises(HTTPException) as e:
+        await changes.get(db, since=old_token, limit=100)
+    assert e.value.status_code == 410
+    assert (await changes.get(db, since=current_token, limit=100)).deleted_todos == []
+    # 全件を取り直せば、新しいトークンで続けられる
+    fresh = await changes.get(db, since=None, limit=100)
+    assert fresh.todos == [] and fresh.deleted_todos == []
+    await changes.get(db, since=fresh.next_token, limit=100)
+
+
+def test_api_rejects_bad_and_stale_tokens(client):
+    todo_id = client.post("/v1/todo/", json={"content": "a"}).json()["id"]
+    token = client.get("/v1/todo/changes").json()["next_token"]
+    client.delete(f"/v1/todo/{todo_id}")
+
+    assert client.get("/v1/todo/changes", params={"since": "broken"}).status_code == 400
+
+    async def compact():
+        async with AsyncSessionLocal() as db:
+            await _age_tombstones(db)
+            await changes.compact(db, timedelta(days=7))
+
+    client.portal.call(compact)
+    response = client.get("/v1/todo/changes", params={"since": token})
+    assert response.status_code == 410
@@ -0,0 +1,48 @@
+import pytest
+
+from crud import data_version
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema, UpdateTodoSchema
+
+
+@pytest.mark.anyio
+async def test_data_version_moves_on_every_table(db):
+    versions = [await data_version.get(db)]
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+    versions.append(await data_version.get(db))
+    tag = await tag_crud.create(db, CreateTagSchema(name="tag"))
+    versions.append(await data_version.get(db))
+    await todo_crud.add_tag_to_todo(db, todo.id, tag.id)
+    versions.append(await data_version.get(db))
+    await todo_crud.remove_tag_from_todo(db, todo.id, tag.id)
+    versions.append(await data_version.get(db))
+    await todo_crud.update(db, todo.id, UpdateTodoSchema(completed=True))
+    versions.append(await data_version.get(db))
+
+    assert versions == sorted(set(versions))
+
+
+@pytest.mark.parametrize("path", ["/v1/todo/", "/v1/todo/1", "/v1/tag/", "/v1/tag/1"])
+def test_get_answers_304_until_something_changes(client, path):
+    client.post("/v1/todo/", json={"content": "a"})
+    client.post("/v1/tag/", json={"name": "tag"})
+
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get(path, headers={"If-None-Match": f'W/{etag}, "x"'})
+    assert response.status_code == 304
+
+    client.post("/v1/todo/1/tags/1")
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from app.events import _EPOCH, RESET, EventBus, event_bus
+from crud import importer
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema, UpdateTodoSchema
+
+
+def _events(frames: list[bytes]) -> list[tuple[str, dict]]:
+    events = []
+    for frame in frames:
+        fields = dict(
+            line.split(": ", 1) for line in frame.decode().strip().splitlines()
+        )
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def subscriber():
+    subscriber = event_bus.subscribe()
+    yield subscriber
+    event_bus.unsubscribe(subscriber)
+
+
+def test_frames_are_shared_and_replayed_after_last_event_id():
+    bus = EventBus(queue_size=10, history_size=3, max_subscribers=2)
+    first, second = bus.subscribe(), bus.subscribe()
+    assert bus.full
+
+    for n in range(4):
+        bus.publish("todo.updated", {"id": n})
+
+    # 全購読者に同じバイト列を配る
+    assert first.frames[0] is second.frames[0]
+    resumed = bus.subscribe(f"{_EPOCH}-2")
+    assert _events(resumed.drain()) == [
+        ("todo.updated", {"id": 2}),
+        ("todo.updated", {"id": 3}),
+    ]
+    assert not resumed.overflowed
+
+    # 覚えている範囲より古いIDや、前のプロセスのIDからは再開できない
+    assert bus.subscribe(f"{_EPOCH}-0").overflowed
+    assert bus.subscribe("0-3").overflowed
+    assert not bus.subscribe(f"{_EPOCH}-4").frames
+
+
+def test_slow_subscriber_switches_to_reset():
+    bus = EventBus(queue_size=2, history_size=10, max_subscribers=10)
+    subscriber = bus.subscribe()
+
+    for n in range(3):
+        bus.publish("todo.deleted", {"id": n})
+
+    assert subscriber.overflowed
+    assert subscriber.drain() == []
+    # overflowed の間は新しいイベントもため込まない
+    bus.publish("todo.deleted", {"id": 4})
+    assert subscriber.drain() == []
+    assert _events([bus.reset_frame()]) == [(RESET, {})]
+
+
+@pytest.mark.anyio
+async def test_crud_publishes_changes(db, subscriber):
+    tag = await tag_crud.create(db, CreateTagSchema(name="家"))
+    todo = await todo_crud.create(db, CreateTodoSchema(content="掃除"))
+    await todo_crud.update(db, todo.id, UpdateTodoSchema(completed=True))
+    await todo_crud.add_tag_to_todo(db, todo.id, tag.id)
+    await todo_crud.remove_tag_from_todo(db, todo.id, tag.id)
+    await todo_crud.delete(db, todo.id)
+    await tag_crud.delete(db, tag.id)
+
+    events = _events(subscriber.drain())
+    assert [type for type, _ in events] == [
+        "tag.created",
+        "todo.created",
+        "todo.updated",
+        "todo.tag_added",
+        "todo.tag_removed",
+        "todo.deleted",
+        "tag.deleted",
+    ]
+    # data は変更された項目だけ
+    assert events[2][1] == {"id": todo.id, "completed": True}
+    assert events[5][1] == {"id": todo.id}
+
+
+@pytest.mark.anyio
+async def test_import_publishes_a_single_reset(db, subscriber):
+    async def chunks():
+        for n in range(5):
+            yield json.dumps({"content": f"todo {n}", "tags": ["a"]}).encode() + b"\n"
+
+    await importer.import_ndjson(db, chunks(), chunk_size=2)
+
+    assert _events(subscriber.drain()) == [(RESET, {})]
+
+    # 何も作らなかった取り込みは知らせない
+    await importer.import_ndjson(db, chunks(), chunk_size=2)
+    assert subscriber.drain() == []
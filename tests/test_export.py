@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema
+
+
+@pytest.mark.anyio
+async def test_export_rows_in_id_order_with_tags(db):
+    first = await todo_crud.create(
+        db, CreateTodoSchema(content="a", deadline=date(2025, 1, 2))
+    )
+    second = await todo_crud.create(db, CreateTodoSchema(content="b"))
+    tag = await tag_crud.create(db, CreateTagSchema(name="タグ"))
+    await todo_crud.add_tag_to_todo(db, first.id, tag.id)
+
+    todos = [row async for row in todo_crud.export_rows(db)]
+    tags = [row async for row in tag_crud.export_rows(db)]
+
+    assert [list(row) for row in todos] == [todo_crud.EXPORT_FIELDS] * 2
+    assert [(row["id"], row["deadline"], row["tags"]) for row in todos] == [
+        (first.id, date(2025, 1, 2), ["タグ"]),
+        (second.id, None, []),
+    ]
+    assert [list(row) for row in tags] == [tag_crud.EXPORT_FIELDS]
+    assert tags[0]["todo_ids"] == [first.id]
+
+
+def _seed(client, count: int):
+    client.post("/v1/tag/", json={"name": "work"})
+    for i in range(count):
+        client.post(
+            "/v1/todo/", json={"content": f"todo,{i}", "deadline": "2025-01-02"}
+        )
+    client.post("/v1/todo/1/tags/1")
+
+
+def test_export_ndjson(client, monkeypatch):
+    # 送信のまとまりを小さくして、複数のチャンクに分かれても行が壊れないことを見る
+    monkeypatch.setattr("api.streaming.FLUSH_BYTES", 64)
+    _seed(client, 5)
+
+    response = client.get("/v1/todo/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "todos" in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["content"] for row in rows] == [f"todo,{i}" for i in range(5)]
+    assert rows[0]["tags"] == ["work"]
+    assert rows[0]["deadline"] == "2025-01-02"
+
+
+def test_export_csv(client):
+    _seed(client, 2)
+
+    response = client.get("/v1/todo/export?format=csv")
+
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == todo_crud.EXPORT_FIELDS
+    row = dict(zip(header, rows[0]))
+    assert (row["content"], row["completed"], row["tags"]) == (
+        "todo,0",
+        "false",
+        '["work"]',
+    )
+    assert len(rows) == 2
+
+    response = client.get("/v1/tag/export?format=csv")
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == tag_crud.EXPORT_FIELDS
+    assert dict(zip(header, rows[0]))["todo_ids"] == "[1]"
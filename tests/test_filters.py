@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from crud.pagination import encode_cursor
+from schemas.schema import (
+    CreateTagSchema,
+    CreateTodoSchema,
+    TodoFilterSchema,
+    UpdateTodoSchema,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def todos(db) -> dict[str, int]:
+    # content → id
+    deadlines = {
+        "jan": date(2025, 1, 31),
+        "feb": date(2025, 2, 1),
+        "mar": date(2025, 3, 1),
+        "none": None,
+    }
+    ids = {}
+    for content, deadline in deadlines.items():
+        todo = await todo_crud.create(
+            db, CreateTodoSchema(content=content, deadline=deadline)
+        )
+        ids[content] = todo.id
+    await todo_crud.update(db, ids["feb"], UpdateTodoSchema(completed=True))
+    return ids
+
+
+async def _contents(db, **filters) -> list[str]:
+    todos, _ = await todo_crud.get_page(db, filters=TodoFilterSchema(**filters))
+    return [todo.content for todo in todos]
+
+
+async def test_filter_by_completed(db, todos):
+    assert await _contents(db, completed=True) == ["feb"]
+    assert await _contents(db, completed=False) == ["jan", "mar", "none"]
+
+
+async def test_deadline_range_includes_both_days(db, todos):
+    assert await _contents(
+        db, deadline_from=date(2025, 1, 31), deadline_to=date(2025, 2, 1)
+    ) == ["jan", "feb"]
+    assert await _contents(db, deadline_from=date(2025, 2, 2)) == ["mar"]
+
+
+async def test_filter_by_any_of_tag_ids(db, todos):
+    work = await tag_crud.create(db, CreateTagSchema(name="work"))
+    home = await tag_crud.create(db, CreateTagSchema(name="home"))
+    await todo_crud.add_tag_to_todo(db, todos["jan"], work.id)
+    await todo_crud.add_tag_to_todo(db, todos["mar"], home.id)
+    await todo_crud.add_tag_to_todo(db, todos["mar"], work.id)
+
+    assert await _contents(db, tag_ids=(work.id,)) == ["jan", "mar"]
+    assert await _contents(db, tag_ids=(home.id, work.id), completed=False) == [
+        "jan",
+        "mar",
+    ]
+
+
+async def test_filters_combine_with_deadline_order(db, todos):
+    todos_page, _ = await todo_crud.get_page(
+        db,
+        order_by="deadline",
+        direction="desc",
+        filters=TodoFilterSchema(completed=False),
+    )
+    assert [todo.content for todo in todos_page] == ["none", "mar", "jan"]
+
+
+async def test_tag_index_filters_need_id_order(db, todos):
+    with pytest.raises(HTTPException) as excinfo:
+        await todo_crud.get_page(
+            db, order_by="deadline", filters=TodoFilterSchema(tags_all=(1,))
+        )
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "keys",
+    [
+        ("2026-01-01T00:00:00", [1]),
+        ("2026-01-01T00:00:00", None),
+        (None, "1"),
+        ([2026], 1),
+        ("not a date", 1),
+    ],
+)
+async def test_deadline_cursor_with_wrong_types_is_rejected(db, todos, keys):
+    with pytest.raises(HTTPException) as excinfo:
+        await todo_crud.get_page(db, cursor=encode_cursor(*keys), order_by="deadline")
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,69 @@
+import re
+
+import pytest
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from crud.pagination import encode_cursor
+from schemas.schema import CreateTagSchema, CreateTodoSchema
+
+
+@pytest.mark.anyio
+async def test_index_rows_page_by_id_with_tags(db):
+    for i in range(3):
+        await todo_crud.create(db, CreateTodoSchema(content=f"todo{i}"))
+    tag = await tag_crud.create(db, CreateTagSchema(name="work"))
+    await todo_crud.add_tag_to_todo(db, 2, tag.id)
+
+    rows = [row async for row in todo_crud.index_rows(db, after_id=1, limit=10)]
+
+    assert [(row["id"], row["tags"]) for row in rows] == [
+        (2, [{"id": tag.id, "name": "work"}]),
+        (3, []),
+    ]
+    assert (await todo_crud.index_row(db, 2))["tags"] == rows[0]["tags"]
+    assert await todo_crud.index_row(db, 99) is None
+
+
+def _todo_ids(html: str) -> list[int]:
+    return [int(todo_id) for todo_id in re.findall(r'data-todo-id="(\d+)"', html)]
+
+
+def test_index_streams_pages_with_a_next_cursor(client, monkeypatch):
+    monkeypatch.setattr("api.frontend.INDEX_PAGE_SIZE", 2)
+    for i in range(3):
+        client.post("/v1/todo/", json={"content": f"todo{i}"})
+
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert _todo_ids(response.text) == [1, 2]
+    (cursor,) = re.findall(r'data-cursor="([^"]+)"', response.text)
+
+    response = client.get(f"/todo/rows?cursor={cursor}")
+    assert _todo_ids(response.text) == [3]
+    assert "next-page" not in response.text
+    assert "<html" not in response.text
+    # タグ追加欄は全タグの一覧を持たず、入力候補 (/v1/tag/suggest) を使う
+    assert 'list="tag-suggestions"' in response.text
+
+
+@pytest.mark.parametrize("path", ["/", "/todo/rows"])
+@pytest.mark.parametrize("cursor", ["zzz", encode_cursor([1]), encode_cursor(None)])
+def test_bad_cursor_is_rejected_before_streaming(client, path, cursor):
+    # 送り始めた後に失敗すると、200のまま途中で切れたページになる
+    response = client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_cached_row_is_redrawn_after_a_tag_rename(client):
+    client.post("/v1/todo/", json={"content": "a"})
+    client.post("/v1/tag/", json={"name": "before"})
+    client.post("/v1/todo/1/tags/1")
+    assert "before" in client.get("/todo/1/row").text
+
+    client.put("/v1/tag/1", json={"name": "after"})
+
+    html = client.get("/todo/1/row").text
+    assert "after" in html and "before" not in html
+    assert client.get("/todo/99/row").status_code == 404
@@ -0,0 +1,74 @@
+import argparse
+import random
+import sqlite3
+from datetime import date
+
+import pytest
+
+from crud import stats as stats_crud
+from seed import generator
+
+
+def _generate(monkeypatch, db_path, *args: str) -> None:
+    monkeypatch.setattr(generator, "DATABASE_URL", f"sqlite:///{db_path}")
+    monkeypatch.setattr("sys.argv", ["generator", "--base-date", "2025-01-01", *args])
+    generator.main()
+
+
+def _dump(db_path) -> tuple[list, list, list]:
+    with sqlite3.connect(db_path) as conn:
+        return tuple(
+            conn.execute(f"SELECT {columns} FROM {table} ORDER BY 1, 2").fetchall()
+            for table, columns in (
+                ("tags", "id, name"),
+                ("todo", "id, content, completed, deadline"),
+                ("todo_tags", "todo_id, tag_id"),
+            )
+        )
+
+
+def test_todos_fit_the_schema():
+    args = argparse.Namespace(
+        todos=2000,
+        deadline_ratio=0.7,
+        deadline_spread_days=60,
+        completed_ratio=0.4,
+        japanese_ratio=0.7,
+        tags_per_todo=1.5,
+        base_date=date(2025, 1, 1),
+    )
+    tag_ids = list(range(1, 51))
+    rows = list(
+        generator.generate_todos(
+            random.Random(1), args, 1, tag_ids, generator.zipf_cum_weights(50, 1.1)
+        )
+    )
+
+    contents = [todo["content"] for todo, _ in rows]
+    assert len(set(contents)) == len(contents)
+    assert max(map(len, contents)) <= generator.CONTENT_MAX_LENGTH
+    assert all(set(links) <= set(tag_ids) for _, links in rows)
+
+
+def test_same_arguments_give_the_same_data(monkeypatch, tmp_path, template_db):
+    dumps = []
+    for name in ("a.db", "b.db"):
+        db_path = tmp_path / name
+        db_path.write_bytes(template_db.read_bytes())
+        _generate(monkeypatch, db_path, "--todos", "300", "--tags", "20")
+        dumps.append(_dump(db_path))
+
+    tags, todos, links = dumps[0]
+    assert (len(tags), len(todos)) == (20, 300)
+    assert links
+    assert dumps[0] == dumps[1]
+
+
+@pytest.mark.anyio
+async def test_generated_rows_keep_the_stats_in_sync(monkeypatch, db_path, db):
+    _generate(monkeypatch, db_path, "--todos", "300", "--tags", "20")
+    # 既存のデータの後ろに追加できる
+    _generate(monkeypatch, db_path, "--todos", "10", "--tags", "2")
+
+    assert await stats_crud.verify(db) == []
+    assert (await stats_crud.get(db)).total == 310
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, text
+
+from app import settings
+from app.group_commit import GroupCommitter
+from crud import todo as todo_crud
+from schemas.schema import CreateTodoSchema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def commits(session_factory) -> list[int]:
+    """
+    session_factory のエンジンでのCOMMITの回数を数える。
+    """
+    commits = []
+
+    def on_commit(conn):
+        commits.append(1)
+
+    engine = session_factory.kw["bind"].sync_engine
+    event.listen(engine, "commit", on_commit)
+    yield commits
+    event.remove(engine, "commit", on_commit)
+
+
+async def _create(committer: GroupCommitter, content: str) -> int:
+    async with committer.session() as db:
+        return (await todo_crud.create(db, CreateTodoSchema(content=content))).id
+
+
+async def _contents(session_factory) -> list[str]:
+    async with session_factory() as db:
+        return list(await db.scalars(text("SELECT content FROM todo ORDER BY id")))
+
+
+async def test_concurrent_writes_share_one_commit(session_factory, commits):
+    committer = GroupCommitter(session_factory, max_batch=64, window=0)
+
+    ids = await asyncio.gather(*(_create(committer, f"todo {n}") for n in range(10)))
+
+    assert len(set(ids)) == 10
+    assert len(commits) == 1
+    assert await _contents(session_factory) == [f"todo {n}" for n in range(10)]
+
+
+async def test_batches_are_split_at_max_batch(session_factory, commits):
+    committer = GroupCommitter(session_factory, max_batch=3, window=0)
+
+    await asyncio.gather(*(_create(committer, f"todo {n}") for n in range(7)))
+
+    assert len(commits) == 3
+    assert len(await _contents(session_factory)) == 7
+
+
+async def test_window_waits_for_later_writes(session_factory, commits):
+    # max_batch に達すれば window の終わりを待たずにcommitする
+    committer = GroupCommitter(session_factory, max_batch=2, window=10)
+
+    async def later():
+        await asyncio.sleep(0.05)
+        return await _create(committer, "b")
+
+    await asyncio.wait_for(asyncio.gather(_create(committer, "a"), later()), timeout=5)
+
+    assert len(commits) == 1
+    assert await _contents(session_factory) == ["a", "b"]
+
+
+async def test_failed_write_does_not_affect_the_batch(session_factory, commits):
+    committer = GroupCommitter(session_factory, max_batch=64, window=0)
+
+    results = await asyncio.gather(
+        _create(committer, "a"),
+        _create(committer, "dup"),
+        _create(committer, "dup"),
+        _create(committer, "b"),
+        return_exceptions=True,
+    )
+
+    # 失敗したリクエストは自分の SAVEPOINT まで戻して409にするだけ
+    assert isinstance(results[2], HTTPException)
+    assert results[2].status_code == 409
+    assert len(commits) == 1
+    assert await _contents(session_factory) == ["a", "dup", "b"]
+
+
+async def test_uncommitted_and_rolled_back_changes_are_discarded(session_factory):
+    committer = GroupCommitter(session_factory, max_batch=64, window=0)
+
+    async def rolled_back():
+        async with committer.session() as db:
+            await db.execute(text("INSERT INTO todo (content) VALUES ('undone')"))
+            await db.rollback()
+            # rollback の後も続けて書き込める
+            await db.execute(text("INSERT INTO todo (content) VALUES ('redone')"))
+            await db.commit()
+
+    async def abandoned():
+        async with committer.session() as db:
+            await db.execute(text("INSERT INTO todo (content) VALUES ('abandoned')"))
+
+    await asyncio.gather(rolled_back(), abandoned(), _create(committer, "a"))
+
+    assert await _contents(session_factory) == ["redone", "a"]
+
+
+async def test_session_cannot_be_used_after_commit(session_factory):
+    committer = GroupCommitter(session_factory, max_batch=64, window=0)
+
+    async with committer.session() as db:
+        await db.commit()
+        with pytest.raises(RuntimeError):
+            await db.commit()
+        with pytest.raises(RuntimeError):
+            db.execute
+
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_duplicates_answer_409(client, monkeypatch, group_commit):
+    monkeypatch.setattr(settings, "GROUP_COMMIT", group_commit)
+    for path, body in [("/v1/todo/", {"content": "a"}), ("/v1/tag/", {"name": "a"})]:
+        assert client.post(path, json=body).status_code == 200
+        assert client.post(path, json=body).status_code == 409
+    client.post("/v1/todo/", json={"content": "b"})
+    client.post("/v1/tag/", json={"name": "b"})
+
+    assert client.put("/v1/todo/2", json={"content": "a"}).status_code == 409
+    assert client.put("/v1/tag/2", json={"name": "a"}).status_code == 409
+    # 失敗した書き込みの後も、同じセッション・バッチの書き込みは続けられる
+    assert client.put("/v1/todo/2", json={"content": "c"}).status_code == 200
+    assert [todo["content"] for todo in client.get("/v1/todo/").json()] == ["a", "c"]
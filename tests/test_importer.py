@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from sqlalchemy import select, text
+
+from app.tag_index import tag_index
+from app.tag_names import tag_names
+from crud import importer
+from crud import todo as todo_crud
+from models.tag import Tag
+from schemas.schema import CreateTodoSchema
+
+pytestmark = pytest.mark.anyio
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def _ndjson(*rows) -> bytes:
+    return "".join(
+        json.dumps(row, ensure_ascii=False) + "\n" if isinstance(row, dict) else row
+        for row in rows
+    ).encode("utf-8")
+
+
+async def _contents(db) -> list[tuple]:
+    todos, _ = await todo_crud.get_page(db)
+    return [
+        (todo.id, todo.content, sorted(t.name for t in todo.tags)) for todo in todos
+    ]
+
+
+async def test_imports_rows_split_at_any_byte(db):
+    data = _ndjson(
+        {"content": "牛乳", "tags": ["買い物", "家"]},
+        {"id": 10, "content": "掃除", "completed": True, "tags": ["家"]},
+        "\n",
+        {"content": "本", "deadline": "2025-01-02"},
+    )
+
+    # 3バイトごとに区切ると、マルチバイト文字の途中でも切れる
+    result = await importer.import_ndjson(db, _chunks(data, 3), chunk_size=2)
+
+    assert (result.rows, result.created, result.skipped, result.invalid) == (3, 3, 0, 0)
+    assert (result.tags_created, result.links) == (2, 3)
+    assert await _contents(db) == [
+        (1, "牛乳", ["家", "買い物"]),
+        (10, "掃除", ["家"]),
+        (11, "本", []),
+    ]
+
+
+async def test_reports_invalid_lines_and_skips_duplicates(db):
+    await todo_crud.create(db, CreateTodoSchema(content="existing"))
+    data = _ndjson(
+        {"content": "a"},
+        "not json\n",
+        {"content": ""},
+        {"content": "a"},
+        {"content": "existing"},
+        {"id": 1, "content": "same id"},
+    )
+
+    result = await importer.import_ndjson(db, _chunks(data, 1024), chunk_size=10)
+
+    assert (result.rows, result.created, result.skipped, result.invalid) == (6, 1, 3, 2)
+    assert [error.line for error in result.errors] == [2, 3]
+    assert "content" in result.errors[1].detail
+
+
+async def test_updates_the_in_process_indexes(db):
+    await tag_index.ensure_loaded(db)
+    await tag_names.ensure_loaded(db)
+    data = _ndjson(
+        {"content": "a", "tags": ["work"]}, {"content": "b", "tags": ["work"]}
+    )
+
+    await importer.import_ndjson(db, _chunks(data, 1024), chunk_size=1)
+
+    (work_id,) = await db.scalars(select(Tag.id).where(Tag.name == "work"))
+    assert list(tag_index.iter_ids(tag_index.query([work_id]))) == [1, 2]
+    assert tag_names.suggest("wo", 10, tag_index) == [(work_id, "work", 2)]
+
+
+async def test_tag_cache_reselects_names_created_concurrently(db, session_factory):
+    cache = importer.TagNameCache()
+    execute = db.execute
+    calls = []
+
+    async def execute_with_race(statement, *args, **kwargs):
+        result = await execute(statement, *args, **kwargs)
+        calls.append(statement)
+        if len(calls) == 1:
+            # 最初のSELECTの直後に、別の接続が同じ名前のタグを作る
+            async with session_factory() as other:
+                await other.execute(text("INSERT INTO tags (name) VALUES ('raced')"))
+                await other.commit()
+        return result
+
+    db.execute = execute_with_race
+    ids = await cache.resolve(db, ["raced", "fresh"])
+
+    assert set(ids) == {"raced", "fresh"}
+    assert cache.created == 1
+    names = dict((await db.execute(select(Tag.name, Tag.id))).all())
+    assert ids == names
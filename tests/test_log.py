@@ -0,0 +1,70 @@
+import json
+import logging
+import sys
+
+from app import log
+
+
+def _record(name: str = "app", level: int = logging.INFO, **extra):
+    record = logging.makeLogRecord(
+        {"name": name, "levelno": level, "levelname": logging.getLevelName(level)}
+    )
+    record.msg = "hello %s"
+    record.args = ("world",)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_writes_one_line_with_extra_fields():
+    record = _record(request_id="abc", todo_id=3)
+
+    entry = json.loads(log.JsonFormatter().format(record))
+
+    assert entry["message"] == "hello world"
+    assert (entry["level"], entry["logger"]) == ("INFO", "app")
+    assert (entry["request_id"], entry["todo_id"]) == ("abc", 3)
+
+
+def test_json_formatter_includes_the_traceback():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record()
+        record.exc_info = sys.exc_info()
+
+    entry = json.loads(log.JsonFormatter().format(record))
+
+    assert "ValueError: boom" in entry["exc_info"]
+
+
+def test_sampling_uses_the_longest_matching_rule():
+    sampling = log.SamplingFilter(
+        {"sqlalchemy": {"sample_rate": 1.0}, "sqlalchemy.engine": {"sample_rate": 0}}
+    )
+
+    assert not sampling.filter(_record("sqlalchemy.engine.Engine"))
+    assert sampling.filter(_record("sqlalchemy.pool"))
+    assert sampling.filter(_record("sqlalchemyx"))
+    # WARNING以上は間引かない
+    assert sampling.filter(_record("sqlalchemy.engine", logging.WARNING))
+
+
+def test_rate_limit_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(log.time, "monotonic", lambda: now[0])
+    sampling = log.SamplingFilter({"noisy": {"rate_limit": 2}})
+
+    assert [sampling.filter(_record("noisy")) for _ in range(3)] == [True, True, False]
+    now[0] += 0.5
+    assert [sampling.filter(_record("noisy")) for _ in range(2)] == [True, False]
+
+
+def test_request_id_is_echoed_or_generated(client):
+    response = client.get("/v1/tag/", headers={"X-Request-ID": "req-1"})
+    assert response.headers["x-request-id"] == "req-1"
+
+    response = client.get("/v1/tag/", headers={"X-Request-ID": "x" * 200})
+    assert len(response.headers["x-request-id"]) == 32
+
+    first = client.get("/v1/tag/").headers["x-request-id"]
+    assert first != client.get("/v1/tag/").headers["x-request-id"]
@@ -0,0 +1,49 @@
+from app import metrics
+
+
+def test_normalize_ignores_in_list_length_and_spaces():
+    assert metrics._normalize(
+        "SELECT *\n  FROM todo WHERE id IN (?, ?, ?)"
+    ) == metrics._normalize("SELECT * FROM todo WHERE id IN (?,?)")
+
+
+def test_histogram_samples_are_cumulative():
+    histogram = metrics.Histogram("h", "help", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, "/x")
+
+    assert list(histogram.samples()) == [
+        'h_bucket{route="/x",le="0.1"} 1',
+        'h_bucket{route="/x",le="1.0"} 2',
+        'h_bucket{route="/x",le="+Inf"} 3',
+        'h_sum{route="/x"} 5.55',
+        'h_count{route="/x"} 3',
+    ]
+
+
+def test_repeated_statements_count_as_n_plus_one(monkeypatch):
+    monkeypatch.setattr(metrics.settings, "N_PLUS_ONE_THRESHOLD", 3)
+    stats = metrics.RequestStats()
+    stats.by_statement.update({"SELECT a": 3, "SELECT b": 2})
+    scope = {"method": "GET", "path": "/x"}
+
+    before = dict(metrics.N_PLUS_ONE._values)
+    metrics.MetricsMiddleware._record(scope, stats, 200, 0.01)
+
+    assert stats.repeated(3) == [("SELECT a", 3)]
+    key = ("GET", "other")
+    assert metrics.N_PLUS_ONE._values[key] == before.get(key, 0) + 1
+
+
+def test_requests_report_server_timing_and_metrics(client):
+    client.post("/v1/todo/", json={"content": "a"})
+
+    response = client.get("/v1/todo/1")
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "statements" in timing
+
+    text = client.get("/metrics").text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert 'route="/v1/todo/{todo_id}"' in text
+    assert 'db_statements_total{method="GET",route="/v1/todo/{todo_id}"}' in text
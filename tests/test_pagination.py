@@ -0,0 +1,142 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from crud.pagination import (
+    decode_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    parse_datetime,
+)
+from schemas.schema import CreateTagSchema, CreateTodoSchema
+
+
+async def _walk(get_page, limit: int, **kwargs) -> list:
+    # カーソルをたどって全ページを読む
+    rows, cursor = await get_page(limit=limit, **kwargs)
+    while cursor:
+        page, cursor = await get_page(cursor=cursor, limit=limit, **kwargs)
+        assert page
+        rows += page
+    return rows
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(datetime(2025, 1, 2, 3, 4, 5), 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ["2025-01-02T03:04:05", 42]
+    assert decode_cursor(encode_cursor(date(2025, 1, 2)), 1) == ["2025-01-02"]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "zzz",
+        "!!!!",
+        "あ",
+        # JSONとしては正しいが配列でない ({"a":1})
+        "eyJhIjoxfQ",
+    ],
+)
+def test_decode_cursor_rejects_broken_cursor(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor, 1)
+    assert excinfo.value.status_code == 400
+
+
+def test_decode_cursor_rejects_wrong_key_count():
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(encode_cursor(1, 2), 1)
+    assert excinfo.value.status_code == 400
+
+
+def test_parse_datetime():
+    assert parse_datetime(None) is None
+    assert parse_datetime("2025-01-02T00:00:00") == datetime(2025, 1, 2)
+    with pytest.raises(HTTPException) as excinfo:
+        parse_datetime(12)
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+async def test_todo_pages_by_id(db, direction):
+    for i in range(7):
+        await todo_crud.create(db, CreateTodoSchema(content=f"todo{i}"))
+
+    async def get_page(**kwargs):
+        return await todo_crud.get_page(db, direction=direction, **kwargs)
+
+    ids = [todo.id for todo in await _walk(get_page, 3)]
+    assert ids == sorted(ids, reverse=direction == "desc")
+    assert len(ids) == 7
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+async def test_todo_pages_by_deadline_put_undated_last(db, direction):
+    deadlines = [date(2025, 3, 1), None, date(2025, 1, 1), None, date(2025, 3, 1)]
+    for i, deadline in enumerate(deadlines):
+        await todo_crud.create(
+            db, CreateTodoSchema(content=f"todo{i}", deadline=deadline)
+        )
+
+    async def get_page(**kwargs):
+        return await todo_crud.get_page(
+            db, order_by="deadline", direction=direction, **kwargs
+        )
+
+    rows = [(todo.deadline, todo.id) for todo in await _walk(get_page, 2)]
+    dated = sorted(row for row in rows if row[0] is not None)
+    undated = sorted(row for row in rows if row[0] is None)
+    expected = dated + undated
+    if direction == "desc":
+        expected.reverse()
+    assert rows == expected
+
+
+@pytest.mark.anyio
+async def test_tag_pages(db):
+    for i in range(5):
+        await tag_crud.create(db, CreateTagSchema(name=f"tag{i}"))
+
+    async def get_page(**kwargs):
+        return await tag_crud.get_page(db, **kwargs)
+
+    assert [tag.name for tag in await _walk(get_page, 2)] == [
+        f"tag{i}" for i in range(5)
+    ]
+
+
+def test_list_returns_next_cursor_header_and_rejects_broken_cursor(client):
+    for i in range(3):
+        client.post("/v1/todo/", json={"content": f"todo{i}"})
+
+    response = client.get("/v1/todo/?limit=2")
+    assert [todo["content"] for todo in response.json()] == ["todo0", "todo1"]
+    cursor = response.headers["x-next-cursor"]
+
+    response = client.get(f"/v1/todo/?limit=2&cursor={cursor}")
+    assert [todo["content"] for todo in response.json()] == ["todo2"]
+    assert "x-next-cursor" not in response.headers
+
+    assert client.get("/v1/todo/?cursor=zzz").status_code == 400
+    assert client.get("/v1/tag/?cursor=zzz").status_code == 400
+
+
+@pytest.mark.parametrize("key", [[1], {"a": 1}, None, True, "1", 1.5])
+def test_decode_id_cursor_rejects_non_integer_ids(key):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_id_cursor(encode_cursor(key))
+    assert excinfo.value.status_code == 400
+    assert decode_id_cursor(encode_cursor(7)) == 7
+
+
+@pytest.mark.parametrize("path", ["/v1/todo/", "/v1/tag/"])
+@pytest.mark.parametrize("key", [[1], {"a": 1}, None])
+def test_list_rejects_cursor_with_wrong_types(client, path, key):
+    response = client.get(path, params={"cursor": encode_cursor(key)})
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from models.tag import Tag
+from models.todo import TodoModel
+from schemas.schema import (
+    CreateTagSchema,
+    CreateTodoSchema,
+    TagSchema,
+    TodoSchema,
+    UpdateTodoSchema,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def linked(db) -> dict[str, int]:
+    """
+    a: 完了・期限あり, タグ z, y (idの逆順に紐づける) / b: タグなし
+    """
+    ids = {}
+    for name in "yz":
+        ids[name] = (await tag_crud.create(db, CreateTagSchema(name=name))).id
+    ids["a"] = (
+        await todo_crud.create(
+            db,
+            CreateTodoSchema(content="a", deadline=date(2025, 1, 2)),
+        )
+    ).id
+    ids["b"] = (await todo_crud.create(db, CreateTodoSchema(content="b"))).id
+    await todo_crud.update(db, ids["a"], UpdateTodoSchema(completed=True))
+    for name in "zy":
+        await todo_crud.add_tag_to_todo(db, ids["a"], ids[name])
+    return ids
+
+
+async def test_todo_record_matches_the_orm(db, linked):
+    record = await todo_crud.get_by_id(db, linked["a"])
+    model = await db.scalar(
+        select(TodoModel)
+        .options(selectinload(TodoModel.tags))
+        .where(TodoModel.id == linked["a"])
+    )
+
+    assert TodoSchema.model_validate(record) == TodoSchema.model_validate(model)
+    assert [tag.id for tag in record.tags] == [linked["y"], linked["z"]]
+    assert isinstance(record.tags[0].created_at, datetime)
+    assert record.deadline == datetime(2025, 1, 2)
+
+
+async def test_tag_record_matches_the_orm(db, linked):
+    record = await tag_crud.get_by_id(db, linked["y"])
+    model = await db.scalar(
+        select(Tag).options(selectinload(Tag.todos)).where(Tag.id == linked["y"])
+    )
+
+    assert TagSchema.model_validate(record) == TagSchema.model_validate(model)
+    (todo,) = record.todos
+    # JSONの中では 0/1 の整数なので、boolに戻っていること
+    assert todo.completed is True
+    assert todo.deadline == datetime(2025, 1, 2)
+
+
+async def test_empty_relations_and_missing_rows(db, linked):
+    assert (await todo_crud.get_by_id(db, linked["b"])).tags == []
+    tag = await tag_crud.create(db, CreateTagSchema(name="x"))
+    assert (await tag_crud.get_by_id(db, tag.id)).todos == []
+    assert await todo_crud.get_by_id(db, 10**9) is None
+    assert await tag_crud.get_by_id(db, 10**9) is None
+
+
+async def test_records_are_not_tracked_by_the_session(db, linked):
+    records = await todo_crud.get(db)
+
+    assert [record.content for record in records] == ["a", "b"]
+    assert not hasattr(records[0], "__dict__")
+    assert not hasattr(records[0].tags[0], "__dict__")
+    assert len(db.identity_map) == 0
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+
+from crud import todo as todo_crud
+from crud.pagination import encode_cursor
+from schemas.schema import CreateTodoSchema, UpdateTodoSchema
+
+pytestmark = pytest.mark.anyio
+
+
+async def _create(db, *contents: str) -> list[int]:
+    return [
+        (await todo_crud.create(db, CreateTodoSchema(content=content))).id
+        for content in contents
+    ]
+
+
+async def _search(db, q: str, limit: int = 100) -> list[str]:
+    todos, cursor = await todo_crud.search(db, q, limit=limit)
+    while cursor:
+        page, cursor = await todo_crud.search(db, q, cursor=cursor, limit=limit)
+        todos += page
+    return [todo.content for todo in todos]
+
+
+async def test_trigram_search_matches_substrings(db):
+    await _create(db, "牛乳を買う", "買い物リスト", "write report", "Report bug")
+
+    assert await _search(db, "買い物") == ["買い物リスト"]
+    # trigram は大文字・小文字を区別しない
+    assert sorted(await _search(db, "report")) == ["Report bug", "write report"]
+    assert await _search(db, "nothing") == []
+
+
+async def test_short_query_falls_back_to_like(db):
+    await _create(db, "牛乳を買う", "買い物", "100%", "a_b", "axb")
+
+    assert await _search(db, "買") == ["牛乳を買う", "買い物"]
+    # LIKE のワイルドカードは文字どおりに扱う
+    assert await _search(db, "%") == ["100%"]
+    assert await _search(db, "_") == ["a_b"]
+
+
+async def test_search_pages_with_cursor(db):
+    await _create(db, *(f"task {i}" for i in range(5)), "ta")
+
+    assert sorted(await _search(db, "task", limit=2)) == [f"task {i}" for i in range(5)]
+    assert await _search(db, "ta", limit=2) == [f"task {i}" for i in range(5)] + ["ta"]
+
+
+async def test_fts_operators_are_taken_literally(db):
+    await _create(db, 'say "hello" OR', "hello world")
+
+    assert await _search(db, '"hello" OR') == ['say "hello" OR']
+    assert await _search(db, "hello*") == []
+
+
+async def test_index_follows_updates_and_deletes(db):
+    first, second = await _create(db, "old content", "keep content")
+
+    await todo_crud.update(db, first, UpdateTodoSchema(content="new content"))
+    await todo_crud.delete(db, second)
+
+    assert await _search(db, "old") == []
+    assert await _search(db, "content") == ["new content"]
+
+
+@pytest.mark.parametrize(
+    "q, keys",
+    [
+        ("milk", ([1], 1)),
+        ("milk", (-1.5, None)),
+        ("milk", (True, 1)),
+        ("milk", ("1", 1)),
+        ("mi", ([1],)),
+    ],
+)
+async def test_cursor_with_wrong_types_is_rejected(db, q, keys):
+    with pytest.raises(HTTPException) as excinfo:
+        await todo_crud.search(db, q, cursor=encode_cursor(*keys))
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+from app import serialization
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def records(db):
+    todo = await todo_crud.create(
+        db, CreateTodoSchema(content="締切あり", deadline=date(2025, 1, 2))
+    )
+    await todo_crud.create(db, CreateTodoSchema(content="plain"))
+    tag = await tag_crud.create(db, CreateTagSchema(name="タグ"))
+    await todo_crud.add_tag_to_todo(db, todo.id, tag.id)
+    todos, _ = await todo_crud.get_page(db)
+    tags, _ = await tag_crud.get_page(db)
+    return todos, tags
+
+
+def _dumps(todos, tags) -> list[bytes]:
+    return [
+        serialization.dump_todo(todos[0]),
+        serialization.dump_todos(todos),
+        serialization.dump_tag(tags[0]),
+        serialization.dump_tags(tags),
+    ]
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+async def test_fast_path_matches_validated_output(records, monkeypatch, with_orjson):
+    todos, tags = records
+    monkeypatch.setattr(serialization.settings, "FAST_JSON", False)
+    validated = _dumps(todos, tags)
+
+    monkeypatch.setattr(serialization.settings, "FAST_JSON", True)
+    if not with_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+
+    assert _dumps(todos, tags) == validated
+    assert b'"deadline":"2025-01-02"' in validated[0]
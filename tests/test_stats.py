@@ -0,0 +1,99 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from crud import stats as stats_crud
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from crud.pagination import encode_cursor
+from schemas.schema import (
+    BulkUpdateTodoItemSchema,
+    CreateTagSchema,
+    CreateTodoSchema,
+    UpdateTodoSchema,
+)
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2025, 3, 10, 12, 0)
+
+
+async def _create(db, content: str, deadline: date | None = None) -> int:
+    todo = await todo_crud.create(
+        db, CreateTodoSchema(content=content, deadline=deadline)
+    )
+    return todo.id
+
+
+async def test_triggers_keep_counts_through_writes(db):
+    past = await _create(db, "past", date(2025, 3, 1))
+    today = await _create(db, "today", date(2025, 3, 10))
+    future = await _create(db, "future", date(2025, 4, 1))
+    await _create(db, "undated")
+    assert await stats_crud.verify(db) == []
+
+    stats = await stats_crud.get(db, now=NOW)
+    # 今日の締切 (00:00) は NOW (12:00) を過ぎている
+    assert (stats.total, stats.completed, stats.overdue) == (4, 0, 2)
+
+    await todo_crud.update(db, past, UpdateTodoSchema(completed=True))
+    await todo_crud.update(db, future, UpdateTodoSchema(deadline=date(2025, 3, 2)))
+    await todo_crud.delete(db, today)
+    await todo_crud.bulk_update(
+        db, [BulkUpdateTodoItemSchema(id=past, completed=False, deadline=None)]
+    )
+    await todo_crud.bulk_create(db, [CreateTodoSchema(content="bulk")])
+    assert await stats_crud.verify(db) == []
+
+    stats = await stats_crud.get(db, now=NOW)
+    assert (stats.total, stats.completed, stats.overdue) == (4, 0, 1)
+
+
+async def test_tag_counts_follow_links(db):
+    todos = [await _create(db, f"todo{i}") for i in range(3)]
+    tags = [
+        (await tag_crud.create(db, CreateTagSchema(name=name))).id
+        for name in ("a", "b", "c")
+    ]
+    for todo_id in todos:
+        await todo_crud.add_tag_to_todo(db, todo_id, tags[0])
+    await todo_crud.add_tag_to_todo(db, todos[0], tags[1])
+    await todo_crud.remove_tag_from_todo(db, todos[1], tags[0])
+    await todo_crud.delete(db, todos[2])
+    await todo_crud.add_tag_to_todo(db, todos[1], tags[2])
+    await tag_crud.delete(db, tags[2])
+    assert await stats_crud.verify(db) == []
+
+    page, cursor = await stats_crud.get_tags(db, limit=1)
+    rest, last = await stats_crud.get_tags(db, cursor=cursor, limit=1)
+    assert [(t.name, t.todo_count) for t in page + rest] == [("a", 1), ("b", 1)]
+    assert last is None
+
+    await todo_crud.bulk_delete(db, [todos[0]])
+    assert await stats_crud.verify(db) == []
+    page, _ = await stats_crud.get_tags(db)
+    assert [(t.name, t.todo_count) for t in page] == [("a", 0), ("b", 0)]
+
+
+async def test_verify_reports_drift_and_rebuild_fixes_it(db):
+    await _create(db, "a", date(2025, 3, 1))
+    await db.execute(text("UPDATE todo_stats SET total = 5"))
+    await db.execute(text("DELETE FROM todo_deadline_stats"))
+    await db.commit()
+
+    drifts = await stats_crud.verify(db)
+    assert len(drifts) == 2
+    assert drifts[0].startswith("todo_stats")
+
+    await stats_crud.rebuild(db)
+    assert await stats_crud.verify(db) == []
+    assert (await stats_crud.get(db, now=NOW)).overdue == 1
+
+
+@pytest.mark.parametrize("key", [[1], {"a": 1}, None])
+async def test_tag_counts_reject_cursor_with_wrong_types(db, key):
+    with pytest.raises(HTTPException) as excinfo:
+        await stats_crud.get_tags(db, cursor=encode_cursor(key))
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,194 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app import tag_index as tag_index_module
+from app.tag_index import TagBitmapIndex, tag_index
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import (
+    CreateTagSchema,
+    CreateTodoSchema,
+    TodoFilterSchema,
+    UpdateTodoSchema,
+)
+
+
+def _ids(bitmap: int) -> list[int]:
+    return list(TagBitmapIndex.iter_ids(bitmap))
+
+
+def test_iter_ids_after_and_descending():
+    bitmap = sum(1 << i for i in (1, 8, 9, 64, 700))
+
+    assert _ids(bitmap) == [1, 8, 9, 64, 700]
+    assert list(TagBitmapIndex.iter_ids(bitmap, after=8)) == [9, 64, 700]
+    assert list(TagBitmapIndex.iter_ids(bitmap, descending=True)) == [
+        700,
+        64,
+        9,
+        8,
+        1,
+    ]
+    assert list(TagBitmapIndex.iter_ids(bitmap, after=64, descending=True)) == [
+        9,
+        8,
+        1,
+    ]
+
+
+@pytest.mark.parametrize("dense_ratio", [1, 1 / 16])
+def test_matches_a_naive_model(monkeypatch, dense_ratio):
+    # dense_ratio が小さいと、多くのタグがsetとビットマップの間を行き来する
+    monkeypatch.setattr(tag_index_module, "DENSE_RATIO", dense_ratio)
+    rng = random.Random(1)
+    index = TagBitmapIndex()
+    todos, links = set(), set()
+
+    for step in range(5000):
+        todo_id, tag_id = rng.randrange(1, 200), rng.randrange(1, 8)
+        action = rng.random()
+        if action < 0.2:
+            index.add_todos([todo_id])
+            todos.add(todo_id)
+        elif action < 0.25:
+            index.remove_todos([todo_id])
+            todos.discard(todo_id)
+            links = {link for link in links if link[0] != todo_id}
+        elif action < 0.6:
+            if todo_id in todos:
+                index.add_link(todo_id, tag_id)
+                links.add((todo_id, tag_id))
+        elif action < 0.95:
+            index.remove_link(todo_id, tag_id)
+            links.discard((todo_id, tag_id))
+        else:
+            index.remove_tag(tag_id)
+            links = {link for link in links if link[1] != tag_id}
+
+        if step % 50:
+            continue
+        all_of, none_of = rng.sample(range(1, 8), 2), rng.randrange(1, 8)
+        assert _ids(index.query(all_of, (), [none_of])) == sorted(
+            t
+            for t in todos
+            if all((t, g) in links for g in all_of) and (t, none_of) not in links
+        )
+        assert _ids(index.query((), all_of)) == sorted(
+            t for t in todos if any((t, g) in links for g in all_of)
+        )
+        assert index.counts(range(1, 8)) == [
+            sum(1 for link in links if link[1] == g) for g in range(1, 8)
+        ]
+
+
+@pytest.fixture
+async def tagged(db) -> dict[str, int]:
+    """
+    a: x, y / b: x / c: y / d: なし
+    """
+    ids = {}
+    for name in "xy":
+        ids[name] = (await tag_crud.create(db, CreateTagSchema(name=name))).id
+    for content in "abcd":
+        ids[content] = (
+            await todo_crud.create(db, CreateTodoSchema(content=content))
+        ).id
+    for content, tag in [("a", "x"), ("a", "y"), ("b", "x"), ("c", "y")]:
+        await todo_crud.add_tag_to_todo(db, ids[content], ids[tag])
+    return ids
+
+
+async def _contents(db, cursor=None, limit=100, direction="asc", **filters):
+    todos, next_cursor = await todo_crud.get_page(
+        db,
+        cursor=cursor,
+        limit=limit,
+        direction=direction,
+        filters=TodoFilterSchema(**filters),
+    )
+    return [todo.content for todo in todos], next_cursor
+
+
+@pytest.mark.anyio
+async def test_get_page_by_tag_conditions(db, tagged):
+    x, y = tagged["x"], tagged["y"]
+
+    assert (await _contents(db, tags_all=(x, y)))[0] == ["a"]
+    assert (await _contents(db, tags_any=(x, y)))[0] == ["a", "b", "c"]
+    assert (await _contents(db, tags_none=(x,)))[0] == ["c", "d"]
+    assert (await _contents(db, tags_any=(y,), tags_none=(x,)))[0] == ["c"]
+
+    await todo_crud.update(db, tagged["c"], UpdateTodoSchema(completed=True))
+    assert (await _contents(db, tags_none=(x,), completed=True))[0] == ["c"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+async def test_tag_conditions_page_with_cursor(db, tagged, direction):
+    filters = {"direction": direction, "tags_none": (tagged["y"],)}
+    contents, cursor = await _contents(db, limit=1, **filters)
+    while cursor:
+        page, cursor = await _contents(db, cursor=cursor, limit=1, **filters)
+        contents += page
+
+    assert contents == (["b", "d"] if direction == "asc" else ["d", "b"])
+
+
+@pytest.mark.anyio
+async def test_index_follows_deletes(db, tagged):
+    x = tagged["x"]
+    await todo_crud.delete(db, tagged["a"])
+    assert (await _contents(db, tags_all=(x,)))[0] == ["b"]
+
+    await tag_crud.delete(db, x)
+    assert (await _contents(db, tags_any=(x,)))[0] == []
+    assert tag_index.counts([x]) == [0]
+
+
+@pytest.mark.anyio
+async def test_catches_up_with_writes_from_other_processes(db, session_factory, tagged):
+    x, y = tagged["x"], tagged["y"]
+    assert (await _contents(db, tags_all=(x,)))[0] == ["a", "b"]
+
+    # 別のプロセスの書き込み (このプロセスの索引は更新されない)
+    async with session_factory() as other:
+        await other.execute(
+            text("INSERT INTO todo_tags (todo_id, tag_id) VALUES (:todo, :tag)"),
+            {"todo": tagged["d"], "tag": x},
+        )
+        await other.execute(
+            text("DELETE FROM todo WHERE id = :id"), {"id": tagged["a"]}
+        )
+        await other.execute(text("DELETE FROM tags WHERE id = :id"), {"id": y})
+        await other.commit()
+
+    version = tag_index.version
+    assert (await _contents(db, tags_all=(x,)))[0] == ["b", "d"]
+    assert (await _contents(db, tags_any=(y,)))[0] == []
+    assert tag_index.version == version + 1
+
+    # 変更がなければ索引は読み直さない
+    await _contents(db, tags_all=(x,))
+    assert tag_index.version == version + 1
+
+
+@pytest.mark.anyio
+async def test_rebuilds_when_tombstones_were_compacted(db, session_factory, tagged):
+    x = tagged["x"]
+    assert (await _contents(db, tags_all=(x,)))[0] == ["a", "b"]
+
+    async with session_factory() as other:
+        await other.execute(
+            text("DELETE FROM todo WHERE id = :id"), {"id": tagged["b"]}
+        )
+        await other.execute(
+            text(
+                "UPDATE change_log_state"
+                " SET compacted_seq = (SELECT max(seq) FROM change_log)"
+            )
+        )
+        await other.commit()
+
+    assert (await _contents(db, tags_all=(x,)))[0] == ["a"]
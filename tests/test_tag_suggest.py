@@ -0,0 +1,157 @@
+import pytest
+from sqlalchemy import event, text
+
+from app import settings
+from app import tag_names as tag_names_module
+from app.tag_names import tag_names
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import CreateTagSchema, CreateTodoSchema, UpdateTagSchema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def tags(db) -> dict[str, int]:
+    """
+    ToDoの件数 pytest: 2 / Python: 2 / perl: 1 / PHP: 0 / Ruby: 0
+    """
+    ids = {}
+    for name in ["pytest", "Ruby", "Python", "perl", "PHP"]:
+        ids[name] = (await tag_crud.create(db, CreateTagSchema(name=name))).id
+    for content, names in [("a", ["Python", "pytest"]), ("b", ["Python", "perl"])]:
+        todo = await todo_crud.create(db, CreateTodoSchema(content=content))
+        for name in names:
+            await todo_crud.add_tag_to_todo(db, todo.id, ids[name])
+    todo = await todo_crud.create(db, CreateTodoSchema(content="c"))
+    await todo_crud.add_tag_to_todo(db, todo.id, ids["pytest"])
+    return ids
+
+
+async def _suggest(db, prefix: str, limit: int = 10) -> list[tuple[str, int]]:
+    return [
+        (tag.name, tag.todo_count) for tag in await tag_crud.suggest(db, prefix, limit)
+    ]
+
+
+async def test_orders_by_count_then_name(db, tags):
+    assert await _suggest(db, "p") == [
+        ("pytest", 2),
+        ("Python", 2),
+        ("perl", 1),
+        ("PHP", 0),
+    ]
+    assert await _suggest(db, "PY") == [("pytest", 2), ("Python", 2)]
+    assert await _suggest(db, "p", limit=3) == [
+        ("pytest", 2),
+        ("Python", 2),
+        ("perl", 1),
+    ]
+    assert await _suggest(db, "") == [
+        ("pytest", 2),
+        ("Python", 2),
+        ("perl", 1),
+        ("PHP", 0),
+        ("Ruby", 0),
+    ]
+    assert await _suggest(db, "x") == []
+
+
+async def test_follows_renames_deletes_and_links(db, tags):
+    await tag_crud.update(db, tags["Ruby"], UpdateTagSchema(name="pandas"))
+    await tag_crud.delete(db, tags["perl"])
+    todo = await todo_crud.create(db, CreateTodoSchema(content="d"))
+    await todo_crud.add_tag_to_todo(db, todo.id, tags["PHP"])
+
+    assert await _suggest(db, "p") == [
+        ("pytest", 2),
+        ("Python", 2),
+        ("PHP", 1),
+        ("pandas", 0),
+    ]
+    assert await _suggest(db, "r") == []
+
+
+async def test_memo_is_invalidated_by_changes(db, tags, monkeypatch):
+    # 短い接頭辞の結果を覚えさせる
+    monkeypatch.setattr(tag_names_module, "MEMO_MIN_MATCHES", 1)
+    assert (await _suggest(db, "py"))[0] == ("pytest", 2)
+    assert tag_names._memo
+
+    todo = await todo_crud.create(db, CreateTodoSchema(content="d"))
+    await todo_crud.add_tag_to_todo(db, todo.id, tags["Python"])
+    assert (await _suggest(db, "py"))[0] == ("Python", 3)
+
+    await tag_crud.update(db, tags["Python"], UpdateTagSchema(name="CPython"))
+    assert await _suggest(db, "py") == [("pytest", 2)]
+
+    await tag_names.rebuild(db)
+    assert not tag_names._memo
+
+
+async def test_catches_up_with_writes_from_other_processes(
+    db, session_factory, tags, monkeypatch
+):
+    monkeypatch.setattr(settings, "TAG_SUGGEST_REFRESH_SECONDS", 0)
+    assert await _suggest(db, "p", limit=1) == [("pytest", 2)]
+
+    # 別のプロセスの書き込み (このプロセスの索引は更新されない)
+    async with session_factory() as other:
+        await other.execute(
+            text("UPDATE tags SET name = 'Perl' WHERE id = :id"), {"id": tags["perl"]}
+        )
+        await other.execute(
+            text("DELETE FROM tags WHERE id = :id"), {"id": tags["PHP"]}
+        )
+        await other.execute(text("INSERT INTO tags (name) VALUES ('pip')"))
+        await other.commit()
+
+    version = tag_names.version
+    assert await _suggest(db, "p") == [
+        ("pytest", 2),
+        ("Python", 2),
+        ("Perl", 1),
+        ("pip", 0),
+    ]
+    assert tag_names.version == version + 1
+
+    # 変更がなければ読み直さない
+    await _suggest(db, "p")
+    assert tag_names.version == version + 1
+
+
+async def test_reads_nothing_until_the_refresh_interval(
+    db, session_factory, tags, monkeypatch
+):
+    monkeypatch.setattr(settings, "TAG_SUGGEST_REFRESH_SECONDS", 3600)
+    await _suggest(db, "p")
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        # 同じプロセスの書き込みは、DBを読まずにすぐ候補に出る
+        tag = await tag_crud.create(db, CreateTagSchema(name="pip"))
+        statements.clear()
+        assert ("pip", 0) in await _suggest(db, "p")
+        assert statements == []
+
+        # 別のプロセスの書き込みは、間隔が過ぎるまで読みに行かない
+        async with session_factory() as other:
+            await other.execute(text("DELETE FROM tags WHERE id = :id"), {"id": tag.id})
+            await other.commit()
+        statements.clear()
+        assert ("pip", 0) in await _suggest(db, "p")
+        assert statements == []
+
+        # 間隔が過ぎたら、data_version を1回だけ読んで両方の索引を追いつかせる
+        monkeypatch.setattr(settings, "TAG_SUGGEST_REFRESH_SECONDS", 0)
+        assert ("pip", 0) not in await _suggest(db, "p")
+        statements.clear()
+        await _suggest(db, "p")
+        assert len(statements) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
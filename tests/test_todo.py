@@ -0,0 +1,50 @@
+import pytest
+
+from crud import tag as tag_crud
+from crud import todo as todo_crud
+from schemas.schema import (
+    CreateTagSchema,
+    CreateTodoSchema,
+    UpdateTagSchema,
+    UpdateTodoSchema,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_create_returns_the_inserted_row(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+
+    assert todo.id
+    assert todo.completed is False
+    assert todo.created_at is not None
+    assert todo.tags == []
+    assert (await todo_crud.get_by_id(db, todo.id)).content == "a"
+
+
+async def test_update_returns_the_row_with_its_tags(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+    tag = await tag_crud.create(db, CreateTagSchema(name="tag"))
+    await todo_crud.add_tag_to_todo(db, todo.id, tag.id)
+
+    updated = await todo_crud.update(
+        db, todo.id, UpdateTodoSchema(content="b", completed=True)
+    )
+
+    assert (updated.content, updated.completed) == ("b", True)
+    assert [t.name for t in updated.tags] == ["tag"]
+    assert updated.updated_at >= todo.updated_at
+
+
+async def test_update_and_delete_of_missing_rows(db):
+    assert await todo_crud.update(db, 999, UpdateTodoSchema(content="b")) is None
+    assert await todo_crud.delete(db, 999) is None
+    assert await tag_crud.update(db, 999, UpdateTagSchema(name="b")) is None
+    assert await tag_crud.delete(db, 999) is None
+
+
+async def test_delete_returns_the_id(db):
+    todo = await todo_crud.create(db, CreateTodoSchema(content="a"))
+
+    assert await todo_crud.delete(db, todo.id) == todo.id
+    assert await todo_crud.get_by_id(db, todo.id) is None
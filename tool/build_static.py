@@ -0,0 +1,223 @@
+"""
+static/ のファイルに内容のハッシュを付けて static/dist/ に書き出し、gzip/brotli で事前圧縮する。
+テンプレートは static_url() で static/dist/manifest.json を引き、ハッシュ付きのファイルを参照する。
+
+    export PYTHONPATH=./src:$PYTHONPATH
+    python -m tool.build_static            # ESモジュールのまま (import先もハッシュ付きに書き換える)
+    python -m tool.build_static --bundle   # エントリーごとに、importしているモジュールを1ファイルにまとめる
+
+brotli パッケージがなければ .br は作らず .gz だけにする。
+static/ のファイルを変更したら、ビルドし直すか static/dist/ を消す (消すと元のファイルを参照する)。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import posixpath
+import re
+import shutil
+import sys
+
+from app.assets import DIST_DIR, MANIFEST_PATH, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH_LENGTH = 10
+# 画像などは圧縮しても小さくならないので、圧縮版はテキストだけ作る
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+# テンプレートから <script type="module"> で読み込むファイル
+ENTRY_POINTS = ["js/main.js", "js/createTodoPage.js", "js/editTodoPage.js"]
+
+# 相対パスの名前付きimport (このアプリのモジュールはすべてこの形) だけを扱う
+IMPORT = re.compile(
+    r"^import\s*\{(?P<names>[^}]*)\}\s*from\s*"
+    r"['\"](?P<specifier>\.{1,2}/[^'\"]+)['\"];?[ \t]*$",
+    re.MULTILINE,
+)
+EXPORT = re.compile(
+    r"^export\s+(?:(?:async\s+)?function\*?|const|let|var|class)\s+(?P<name>[\w$]+)",
+    re.MULTILINE,
+)
+MODULE_SYNTAX = re.compile(r"^\s*(?:import|export)\b", re.MULTILINE)
+
+
+def read_sources() -> dict[str, bytes]:
+    """
+    static/ のファイル (dist/ を除く) を static/ からの相対パス → 内容で返す。
+    """
+    sources = {}
+    for path in sorted(STATIC_DIR.rglob("*")):
+        relative = path.relative_to(STATIC_DIR).as_posix()
+        if path.is_file() and relative.split("/")[0] != DIST_DIR:
+            sources[relative] = path.read_bytes()
+    return sources
+
+
+def hashed_name(path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, suffix = posixpath.splitext(path)
+    return f"{stem}.{digest}{suffix}"
+
+
+def resolve(importer: str, specifier: str) -> str:
+    return posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+
+
+def relative_specifier(importer: str, target: str) -> str:
+    specifier = posixpath.relpath(target, posixpath.dirname(importer))
+    return specifier if specifier.startswith("../") else "./" + specifier
+
+
+def dependencies(path: str, sources: dict[str, bytes]) -> list[str]:
+    text = sources[path].decode("utf-8")
+    return [resolve(path, m["specifier"]) for m in IMPORT.finditer(text)]
+
+
+def module_order(entry: str, sources: dict[str, bytes]) -> list[str]:
+    """
+    entry とそこからimportしているモジュールを、依存されるものが先になる順で返す。
+    """
+    order: list[str] = []
+    visiting: set[str] = set()
+
+    def visit(path: str) -> None:
+        if path in order:
+            return
+        if path in visiting:
+            sys.exit(f"循環importはビルドできません: {path}")
+        if path not in sources:
+            sys.exit(f"importしているファイルがありません: {path}")
+        visiting.add(path)
+        for dependency in dependencies(path, sources):
+            visit(dependency)
+        visiting.discard(path)
+        order.append(path)
+
+    visit(entry)
+    return order
+
+
+def hash_assets(sources: dict[str, bytes]) -> dict[str, tuple[str, bytes]]:
+    """
+    ファイルごとにハッシュ付きの名前を決める。
+    JSは import先をハッシュ付きの名前に書き換えてからハッシュを取るので、
+    依存先が変われば依存元の名前も変わる。
+    """
+    outputs: dict[str, tuple[str, bytes]] = {}
+    for path in sources:
+        if not path.endswith(".js"):
+            outputs[path] = (hashed_name(path, sources[path]), sources[path])
+            continue
+        for module in module_order(path, sources):
+            if module in outputs:
+                continue
+
+            def rewrite(match, module=module):
+                target = outputs[resolve(module, match["specifier"])][0]
+                specifier = relative_specifier(module, target)
+                return match[0].replace(match["specifier"], specifier)
+
+            content = IMPORT.sub(rewrite, sources[module].decode("utf-8")).encode()
+            outputs[module] = (hashed_name(module, content), content)
+    return outputs
+
+
+def _destructure(names: str, module_variable: str) -> str:
+    bindings = []
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        imported, _, local = name.partition(" as ")
+        local = local.strip()
+        bindings.append(f"{imported.strip()}: {local}" if local else imported.strip())
+    return f"const {{ {', '.join(bindings)} }} = {module_variable};"
+
+
+def _module_variable(path: str) -> str:
+    return "__module_" + re.sub(r"\W", "_", path)
+
+
+def bundle(entry: str, sources: dict[str, bytes]) -> bytes:
+    """
+    entry がimportしているモジュールを、それぞれ関数のスコープに包んで1ファイルにまとめる。
+    モジュール間で同じ名前のトップレベル宣言があっても衝突しない。
+    """
+    parts = [f"// bundled by tool.build_static from {entry}"]
+    for path in module_order(entry, sources):
+        text = sources[path].decode("utf-8")
+        text = IMPORT.sub(
+            lambda m, path=path: _destructure(
+                m["names"], _module_variable(resolve(path, m["specifier"]))
+            ),
+            text,
+        )
+        if path == entry:
+            parts.append(text)
+            continue
+
+        exports = [m["name"] for m in EXPORT.finditer(text)]
+        text = EXPORT.sub(lambda m: m[0].removeprefix("export").lstrip(), text)
+        if MODULE_SYNTAX.search(text):
+            sys.exit(f"バンドルできない import/export の書き方があります: {path}")
+        parts.append(
+            f"const {_module_variable(path)} = (() => {{\n{text}\n"
+            f"return {{ {', '.join(exports)} }};\n}})();"
+        )
+    return "\n".join(parts).encode("utf-8")
+
+
+def write(path: str, content: bytes) -> list[str]:
+    """
+    static/dist/ にファイルと、小さくなる場合は圧縮版を書き出す。書き出した形式を返す。
+    """
+    target = STATIC_DIR / DIST_DIR / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(content)
+    written = [f"{len(content)}B"]
+    if posixpath.splitext(path)[1] not in COMPRESSIBLE_SUFFIXES:
+        return written
+
+    variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            target.with_name(target.name + suffix).write_bytes(compressed)
+            written.append(f"{suffix[1:]} {len(compressed)}B")
+    return written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="エントリーのモジュールを1ファイルにまとめる",
+    )
+    args = parser.parse_args()
+
+    sources = read_sources()
+    outputs = hash_assets(sources)
+    if args.bundle:
+        for entry in ENTRY_POINTS:
+            content = bundle(entry, sources)
+            outputs[entry] = (hashed_name(entry, content), content)
+
+    shutil.rmtree(STATIC_DIR / DIST_DIR, ignore_errors=True)
+    manifest = {}
+    for path, (name, content) in sorted(outputs.items()):
+        written = write(name, content)
+        manifest[path] = f"{DIST_DIR}/{name}"
+        print(f"{path} -> {manifest[path]} ({', '.join(written)})")
+    MANIFEST_PATH.write_text(
+        json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+    if brotli is None:
+        print("brotli がインストールされていないため .br は作りませんでした。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
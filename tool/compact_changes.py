@@ -0,0 +1,36 @@
+"""
+差分同期 (/v1/todo/changes) の変更履歴から、古いトゥームストーン (削除の記録) を消す。
+cron などで定期的に実行する。
+
+    export PYTHONPATH=./src:$PYTHONPATH
+    python -m tool.compact_changes              # CHANGE_LOG_RETENTION_DAYS より古いものを消す
+    python -m tool.compact_changes --days 7     # 7日より古いものを消す
+
+消した範囲より前のトークンで同期しようとしたクライアントには410を返し、全件を取り直させる。
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import timedelta
+
+from app import settings
+from app.database import AsyncSessionLocal, async_engine
+from crud import changes
+
+
+async def main(days: float) -> int:
+    async with AsyncSessionLocal() as db:
+        purged = await changes.compact(db, timedelta(days=days))
+    await async_engine.dispose()
+    print(f"{purged} tombstone(s) purged")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--days", type=float, default=settings.CHANGE_LOG_RETENTION_DAYS
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.days)))
@@ -0,0 +1,118 @@
+"""
+GET /v1/todo/ の絞り込み・並び替えの全組み合わせについて、
+crud.todo.get_page が発行するSQLの EXPLAIN QUERY PLAN を表示する。
+
+インデックスを使わない todo / todo_tags の全件走査があれば終了コード1で終わる。
+数十件程度のデータベースでは統計上全件走査が最安になるため、
+本番相当の件数を入れて ANALYZE した後に実行すること。
+
+    export PYTHONPATH=./src:$PYTHONPATH
+    python -m tool.explain_todo_filters
+"""
+
+import asyncio
+import itertools
+import re
+import sys
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from app.database import AsyncSessionLocal, async_engine
+from crud import todo
+from crud.pagination import encode_cursor
+from schemas.schema import TodoFilterSchema
+
+COMPLETED = (None, True, False)
+DEADLINE_RANGES = (
+    (None, None),
+    (date(2025, 1, 1), None),
+    (None, date(2025, 12, 31)),
+    (date(2025, 1, 1), date(2025, 12, 31)),
+)
+TAG_IDS = ((), (1,), (1, 2, 3))
+ORDERS = (("id", "asc"), ("id", "desc"), ("deadline", "asc"), ("deadline", "desc"))
+
+# "SCAN todo USING INDEX ..." はインデックス順の読み取りなので許容する
+FULL_SCAN = re.compile(r"\bSCAN (todo|todo_tags)\b(?! USING)")
+# id順ではテーブル本体(rowidのB-tree)を主キー順に読み、LIMIT件で止まるので許容する
+ROWID_ORDER_SCAN = "SCAN todo"
+
+
+def _cursors(order_by: str) -> list[str | None]:
+    if order_by == "id":
+        return [None, encode_cursor(1)]
+    return [
+        None,
+        encode_cursor(datetime(2025, 6, 1), 1),
+        encode_cursor(None, 1),
+    ]
+
+
+async def main() -> int:
+    statements: list[tuple[str, tuple]] = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # selectinloadのタグ読み込みではなく、一覧本体のクエリだけを対象にする
+        if statement.lstrip().startswith("SELECT todo.id"):
+            statements.append((statement, parameters))
+
+    failures = 0
+    async with AsyncSessionLocal() as db:
+        for (
+            completed,
+            (deadline_from, deadline_to),
+            tag_ids,
+            (
+                order_by,
+                direction,
+            ),
+        ) in itertools.product(COMPLETED, DEADLINE_RANGES, TAG_IDS, ORDERS):
+            filters = TodoFilterSchema(
+                completed=completed,
+                deadline_from=deadline_from,
+                deadline_to=deadline_to,
+                tag_ids=tag_ids,
+            )
+            for cursor in _cursors(order_by):
+                statements.clear()
+                await todo.get_page(
+                    db,
+                    cursor=cursor,
+                    limit=20,
+                    order_by=order_by,
+                    direction=direction,
+                    filters=filters,
+                )
+                for statement, parameters in list(statements):
+                    conn = await db.connection()
+                    plan = (
+                        await conn.exec_driver_sql(
+                            f"EXPLAIN QUERY PLAN {statement}", parameters
+                        )
+                    ).all()
+                    details = [row[-1] for row in plan]
+                    scans = [
+                        d
+                        for d in details
+                        if FULL_SCAN.search(d)
+                        and not (order_by == "id" and d == ROWID_ORDER_SCAN)
+                    ]
+                    failures += bool(scans)
+                    print(
+                        f"{'NG' if scans else 'OK'} "
+                        f"{order_by} {direction} completed={completed} "
+                        f"deadline={deadline_from}..{deadline_to} tags={tag_ids} "
+                        f"cursor={'yes' if cursor else 'no'}"
+                    )
+                    for detail in details:
+                        print(f"    {detail}")
+
+    await async_engine.dispose()
+    print(f"{failures} plan(s) with a full table scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,36 @@
+"""
+/v1/stats の集計テーブルを検証・再構築する。
+
+    export PYTHONPATH=./src:$PYTHONPATH
+    python -m tool.stats verify   # ずれがあれば表示して終了コード1
+    python -m tool.stats rebuild  # 元のテーブルから数え直す
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.database import AsyncSessionLocal, async_engine
+from crud import stats
+
+
+async def main(command: str) -> int:
+    async with AsyncSessionLocal() as db:
+        if command == "rebuild":
+            await stats.rebuild(db)
+            print("rebuilt")
+            drifts = []
+        else:
+            drifts = await stats.verify(db)
+            for drift in drifts:
+                print(drift)
+            print(f"{len(drifts)} drift(s)")
+    await async_engine.dispose()
+    return 1 if drifts else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))